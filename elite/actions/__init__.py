@@ -4,10 +4,14 @@ import os
 import pickle
 import pwd
 import shutil
+import stat
 import subprocess
+import tempfile
 from collections import namedtuple
 
 from ..constants import FLAGS
+# The function is imported directly as the files action module shadows the files library here
+from ..libraries.files import write as write_file
 
 
 # Open /dev/null for our run method
@@ -26,12 +30,28 @@ class Action:
     The action base class which actions may inherit from.
 
     :param cache_base_dir: the base directory containing the Elite cache or None to disable caching
+    :param persistent_cache_base_dir: the base directory containing the Elite cache which is
+                                      retained between runs or None to disable persistent caching
     :param preexec_fn: the function to call prior exec of commands that are run
+    :param document_store: the store of parsed configuration files shared by actions during a
+                           run or None to read and write files directly
+    :param progress_fn: a function which is called with a short message describing the progress
+                        of a long-running action or None to disable progress reporting
     """
 
-    def __init__(self, cache_base_dir=None, preexec_fn=None):
+    # Whether the action reads and writes files exclusively via the document store, allowing
+    # writes to be deferred until the store is flushed
+    uses_document_store = False
+
+    def __init__(
+        self, cache_base_dir=None, persistent_cache_base_dir=None, preexec_fn=None,
+        document_store=None, progress_fn=None
+    ):
         self.cache_base_dir = cache_base_dir
+        self.persistent_cache_base_dir = persistent_cache_base_dir
         self.preexec_fn = preexec_fn
+        self.document_store = document_store
+        self.progress_fn = progress_fn
 
     @property
     def cache_dir(self):
@@ -40,6 +60,76 @@ class Action:
         else:
             return None
 
+    @property
+    def persistent_cache_dir(self):
+        if self.persistent_cache_base_dir:
+            return os.path.join(self.persistent_cache_base_dir, self.__class__.__name__)
+        else:
+            return None
+
+    def _persistent_cache_path(self, key):
+        key_bytes = repr(key).encode('utf-8')
+        return os.path.join(self.persistent_cache_dir, hashlib.md5(key_bytes).hexdigest())
+
+    def persistent_cache_get(self, key):
+        """
+        Obtains an item from the persistent cache.
+
+        :param key: a tuple which uniquely identifies the item (e.g. a path and its stat details)
+
+        :return: the cached item or None if persistent caching is disabled or no item was found
+        """
+        if not self.persistent_cache_dir:
+            return None
+
+        try:
+            with open(self._persistent_cache_path(key), 'rb') as fp:
+                cached_key, value = pickle.load(fp)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+
+        # Guard against the unlikely event of a hash collision
+        return value if cached_key == key else None
+
+    def persistent_cache_set(self, key, value):
+        """
+        Stores an item in the persistent cache (if enabled).
+
+        :param key: a tuple which uniquely identifies the item (e.g. a path and its stat details)
+        :param value: the item to be cached
+        """
+        if not self.persistent_cache_dir:
+            return
+
+        cache_path = self._persistent_cache_path(key)
+
+        # Write to a temporary file and move it into place so that readers never encounter a
+        # partially written item (failures are ignored as the cache is only an optimisation)
+        try:
+            os.makedirs(self.persistent_cache_dir, exist_ok=True)
+            fp = tempfile.NamedTemporaryFile(dir=self.persistent_cache_dir, delete=False)
+        except OSError:
+            return
+
+        try:
+            with fp:
+                pickle.dump((key, value), fp)
+            os.replace(fp.name, cache_path)
+        except OSError:
+            try:
+                os.remove(fp.name)
+            except OSError:
+                pass
+
+    def progress(self, message):
+        """
+        Reports the progress of the action (if progress reporting is enabled).
+
+        :param message: a short message describing the progress of the action
+        """
+        if self.progress_fn:
+            self.progress_fn(message)
+
     def ok(self, **data):
         return ActionResponse(changed=False, data=data)
 
@@ -108,69 +198,119 @@ class FileAction(Action):
     :param owner: the username which should own the file being written
     :param group: the group that should own the file being written
     :param flags: any BSD flags that should be applied to the file being written
+    :param recurse: whether to also apply the mode, owner, group and flags to everything
+                    contained in directories
     """
 
-    def __init__(self, mode=None, owner=None, group=None, flags=None, **kwargs):
+    def __init__(self, mode=None, owner=None, group=None, flags=None, recurse=False, **kwargs):
         self.mode = mode
         self.owner = owner
         self.group = group
         self.flags = flags
+        self.recurse = recurse
         super().__init__(**kwargs)
 
     def set_file_attributes(self, path):
+        """
+        Sets the requested mode, owner, group and flags on a path (and everything it contains
+        when recursion is enabled).
+
+        :param path: the path to update
+
+        :return: a boolean indicating whether any changes were made
+        """
+        return self.set_file_attributes_recursive(path) > 0
+
+    def set_file_attributes_recursive(self, path):
+        """
+        Sets the requested mode, owner, group and flags on a path and, when recursion is enabled
+        and the path is a directory, on every entry in the tree beneath it.  Entries are only
+        updated when their current attributes differ.
+
+        :param path: the path to update
+
+        :return: the number of entries which were changed
+        """
         # No file attributes have been set, so we bail and advise that no changes were made
         if not any([self.mode, self.owner, self.group]) and self.flags is None:
-            return False
+            return 0
+
+        # Deferred writes must be made before the attributes of the file may be set
+        if self.document_store and self.document_store.flush(path):
+            raise ActionError('unable to write the requested path')
 
-        changed = False
         try:
-            stat = os.stat(path)
+            path_stat = os.stat(path)
         except OSError:
             raise ActionError('unable to find the requested path specified')
 
-        # Set the file mode if required
-        if self.mode and oct(stat.st_mode)[-4:] != self.mode:
-            changed = True
+        # Resolve the attributes requested once for all entries
+        attributes = self._file_attributes()
+
+        if not self.recurse or not stat.S_ISDIR(path_stat.st_mode):
+            return int(self._set_attributes(path, path_stat, *attributes))
 
-            # Determine the binary representation of the mode requseted
-            mode_bin = int(self.mode, 8)
+        # Walk the tree iteratively using scandir, updating the attributes of directories after
+        # their contents so that a restrictive mode or owner doesn't prevent their traversal
+        changed_count = 0
+        directories = [(path, path_stat)]
+        visited_directories = []
+
+        while directories:
+            directory, directory_stat = directories.pop()
+            visited_directories.append((directory, directory_stat))
 
             try:
-                os.chmod(path, mode_bin, follow_symlinks=False)
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append((entry.path, entry.stat(follow_symlinks=False)))
+                            continue
+
+                        entry_stat = entry.stat(follow_symlinks=False)
+                        changed_count += self._set_attributes(
+                            entry.path, entry_stat, *attributes,
+                            follow_symlinks=not entry.is_symlink()
+                        )
             except OSError:
-                raise ActionError('unable to set the requested mode on the path specified')
+                raise ActionError(f'unable to list the contents of the directory {directory}')
 
-        # Set the file owner and/or groups
-        if self.owner or self.group:
-            # Obtain the uid of the owner requested
-            if self.owner:
-                try:
-                    uid = pwd.getpwnam(self.owner).pw_uid
-                except KeyError:
-                    raise ActionError('the owner requested was not found')
-            else:
-                uid = -1
-
-            # Obtain the gid of the group requested
-            if self.group:
-                try:
-                    gid = grp.getgrnam(self.group).gr_gid
-                except KeyError:
-                    raise ActionError('the group requested was not found')
-            else:
-                gid = -1
+        for directory, directory_stat in reversed(visited_directories):
+            changed_count += self._set_attributes(directory, directory_stat, *attributes)
 
-            # Update the owner and/or group if required
-            if self.owner and stat.st_uid != uid or self.group and stat.st_gid != gid:
-                changed = True
-                try:
-                    os.chown(path, uid, gid)
-                except OSError:
-                    raise ActionError('unable to set the requested owner on the path specified')
+        return changed_count
+
+    def _file_attributes(self):
+        """
+        Converts the requested mode, owner, group and flags into the values required to compare
+        and set them.
+
+        :return: a tuple containing the binary mode, uid, gid and binary flags requested (where
+                 the mode and flags are None and the uid and gid are -1 if not requested)
+        """
+        # Determine the binary representation of the mode requseted
+        mode_bin = int(self.mode, 8) if self.mode else None
+
+        # Obtain the uid of the owner requested
+        if self.owner:
+            try:
+                uid = pwd.getpwnam(self.owner).pw_uid
+            except KeyError:
+                raise ActionError('the owner requested was not found')
+        else:
+            uid = -1
+
+        # Obtain the gid of the group requested
+        if self.group:
+            try:
+                gid = grp.getgrnam(self.group).gr_gid
+            except KeyError:
+                raise ActionError('the group requested was not found')
+        else:
+            gid = -1
 
-        # Set the file flags
+        # Determine the binary representation of the flags requseted
         if self.flags is not None:
-            # Determine the binary representation of the flags requseted
             flags_bin = 0
 
             for flag in self.flags:
@@ -178,17 +318,97 @@ class FileAction(Action):
                     raise ActionError('the specified flag is unsupported')
 
                 flags_bin |= FLAGS[flag]
+        else:
+            flags_bin = None
+
+        return mode_bin, uid, gid, flags_bin
+
+    def _set_attributes(
+        self, path, file_stat, mode_bin, uid, gid, flags_bin, follow_symlinks=True
+    ):
+        """Sets the attributes on a path which differ from its stat details."""
+        changed = False
 
-            # Update the flags if required
-            if stat.st_flags != flags_bin:
-                changed = True
-                try:
+        # Set the file mode if required (the mode of symlinks themselves is irrelevant)
+        if mode_bin is not None and follow_symlinks and file_stat.st_mode & 0o7777 != mode_bin:
+            changed = True
+            try:
+                os.chmod(path, mode_bin, follow_symlinks=False)
+            except OSError:
+                raise ActionError('unable to set the requested mode on the path specified')
+
+        # Update the owner and/or group if required
+        if uid != -1 and file_stat.st_uid != uid or gid != -1 and file_stat.st_gid != gid:
+            changed = True
+            try:
+                if follow_symlinks:
+                    os.chown(path, uid, gid)
+                else:
+                    os.lchown(path, uid, gid)
+            except OSError:
+                raise ActionError('unable to set the requested owner on the path specified')
+
+        # Update the flags if required
+        if flags_bin is not None and file_stat.st_flags != flags_bin:
+            changed = True
+            try:
+                if follow_symlinks:
                     os.chflags(path, flags_bin)
-                except OSError:
-                    raise ActionError('unable to set the requested flags on the path specified')
+                else:
+                    os.chflags(path, flags_bin, follow_symlinks=False)
+            except OSError:
+                raise ActionError('unable to set the requested flags on the path specified')
 
         return changed
 
+    def load_document(self, path, load, detect_format=None):
+        """
+        Parses a configuration file, using the document store (if enabled) so that each file is
+        only parsed once per run.
+
+        :param path: the path of the file
+        :param load: a function which parses the file at the path provided and returns its data
+        :param detect_format: a function which determines the format of the file at the path
+                              provided or None if the format isn't required
+
+        :return: the parsed data
+        """
+        if self.document_store:
+            return self.document_store.load(path, load, detect_format)
+        return load(path)
+
+    def document_format(self, path, detect_format):
+        """
+        Determines the format of a configuration file, using the format recorded by the document
+        store (if enabled) as the file may not have been written yet.
+
+        :param path: the path of the file
+        :param detect_format: a function which determines the format of the file at the path
+                              provided
+
+        :return: the format of the file
+        """
+        if self.document_store:
+            fmt = self.document_store.fmt(path)
+            if fmt is not None:
+                return fmt
+        return detect_format(path)
+
+    def save_document(self, path, data, dump, fmt=None):
+        """
+        Atomically writes a configuration file or defers the write until the document store is
+        flushed (if enabled).
+
+        :param path: the path of the file
+        :param data: the updated data of the file
+        :param dump: a function which serialises the data into the bytes to be written
+        :param fmt: the format that the data is serialised in or None if it's unknown
+        """
+        if self.document_store:
+            self.document_store.save(path, data, dump, fmt)
+        else:
+            write_file(path, dump(data))
+
     def remove(self, path):
         if os.path.isfile(path):
             try:
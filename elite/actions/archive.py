@@ -1,40 +1,134 @@
+import lzma
 import os
 import shutil
+import stat
+import subprocess
+import tarfile
+import tempfile
+import threading
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import rarfile
 
 from . import Action, ActionError
+from ..libraries import files
+
+
+# The compression used by tar archives with each extension
+TAR_COMPRESSIONS = {
+    '.tar': '',
+    '.tar.gz': 'gz',
+    '.tgz': 'gz',
+    '.tar.bz2': 'bz2',
+    '.tbz2': 'bz2',
+    '.tar.xz': 'xz',
+    '.txz': 'xz',
+    '.tar.zst': 'zst',
+    '.tzst': 'zst'
+}
 
 
 class Archive(Action):
     """
-    Extracts ZIP and RAR archives to a specified destination.
+    Extracts ZIP, RAR and tar (optionally compressed with gzip, bzip2, xz or zstd) archives to a
+    specified destination.
 
     :param path: the destination where the archive should be extracted
     :param source: the path of the archive
     :param preserve_mode: preserve the archived mode of all files being extracted
     :param ignore_files: file or directory names to ignore
     :param base_dir: extract from a particular sub-directory as the base
+    :param workers: the number of threads to extract ZIP archives with or None to extract
+                    sequentially
     """
 
     def __init__(
-        self, path, source, preserve_mode=True, ignore_files=None, base_dir=None, **kwargs
+        self, path, source, preserve_mode=True, ignore_files=None, base_dir=None, workers=None,
+        **kwargs
     ):
         self.path = path
         self.source = source
         self.preserve_mode = preserve_mode
         self.ignore_files = [] if ignore_files is None else ignore_files
         self.base_dir = base_dir
+        self.workers = workers
         super().__init__(**kwargs)
 
     def process(self):
         # Determine the type of archive provided
-        extension = os.path.splitext(self.source)[1]
-        archive_type = extension[1:].lower()
-        if archive_type not in ['rar', 'zip']:
-            raise ActionError('the archive source provided is not a RAR or ZIP file')
+        archive_type = self.archive_type()
+        if not archive_type:
+            raise ActionError('the archive source provided is not a RAR, ZIP or tar file')
+
+        # Compare the archive and the files previously extracted from it against the manifest
+        # recorded during the last extraction, avoiding opening the archive when nothing changed
+        try:
+            archive_stat = os.stat(self.source)
+        except OSError:
+            raise ActionError('unable to find the archive source provided')
+
+        manifest_key = self.manifest_key()
+        manifest = self.persistent_cache_get(manifest_key)
+        archive_unchanged = manifest is not None and self.archive_unchanged(
+            manifest['archive'], archive_stat
+        )
+
+        if archive_unchanged:
+            unchanged_outputs = {
+                output_filepath
+                for output_filepath, signature in manifest['outputs'].items()
+                if self.output_signature(output_filepath) == signature
+            }
+            if len(unchanged_outputs) == len(manifest['outputs']):
+                return self.ok()
+        else:
+            unchanged_outputs = set()
+
+        # Extract the archive, obtaining the output path, mode and type of each member
+        if archive_type in TAR_COMPRESSIONS:
+            changed, members = self.extract_tar(TAR_COMPRESSIONS[archive_type], unchanged_outputs)
+        else:
+            changed, members = self.extract_zip_or_rar(archive_type, unchanged_outputs)
+
+        # Set the file modes if required once all files are written, updating directories last
+        # (deepest first) so that restrictive modes don't prevent their contents being updated
+        if self.preserve_mode:
+            for output_filepath, mode, _is_dir in sorted(
+                members, key=lambda member: (member[2], -member[0].count(os.sep))
+            ):
+                if mode and stat.S_IMODE(os.stat(output_filepath).st_mode) != stat.S_IMODE(mode):
+                    os.chmod(output_filepath, mode)
 
+        # Record the archive and the state of each file extracted so that future runs may
+        # verify the extraction using a stat of each file alone
+        self.persistent_cache_set(manifest_key, {
+            'archive': (
+                archive_stat.st_size, archive_stat.st_mtime_ns,
+                manifest['archive'][2] if archive_unchanged else self.archive_digest()
+            ),
+            'outputs': {
+                output_filepath: self.output_signature(output_filepath)
+                for output_filepath, _mode, _is_dir in members
+            }
+        })
+
+        return self.changed() if changed else self.ok()
+
+    def extract_zip_or_rar(self, archive_type, unchanged_outputs):
+        """
+        Extracts a ZIP or RAR archive.
+
+        :param archive_type: the type of archive (zip or rar)
+        :param unchanged_outputs: output paths which are known to be unchanged since they were
+                                  last extracted
+
+        :return: a tuple containing a boolean indicating whether any changes were made and a
+                 list of tuples containing the output path, mode and whether each member is a
+                 directory
+        """
         # Create an object of the appropriate type based on the archive type
         try:
             if archive_type == 'zip':
@@ -51,62 +145,486 @@ class Archive(Action):
 
         changed = False
 
-        # Iterate through all files in the archive
+        # Determine the members to be extracted along with their output paths
+        members = []
         for filepath in sorted(archive.namelist()):
-            # Skip any requested files
-            filepath_parts = os.path.normpath(filepath).split(os.sep)
-            if set(filepath_parts).intersection(self.ignore_files):
+            output_filepath = self.output_filepath(filepath)
+            if output_filepath is None:
                 continue
 
-            # Determine the full output path of the current file
-            if self.base_dir:
-                if filepath_parts[0] != self.base_dir:
-                    continue
-
-                output_filepath = os.path.join(self.path, *filepath_parts[1:])
-            else:
-                output_filepath = os.path.join(self.path, filepath)
-
             # Obtain useful information about the file
             info = archive.getinfo(filepath)
             mode = info.external_attr >> 16 if archive_type == 'zip' else info.mode
             is_dir = info.is_dir() if archive_type == 'zip' else info.isdir()
 
-            # If the file has already been extracted, determine its size (for potential comparison)
+            members.append((filepath, info, output_filepath, mode, is_dir))
+
+        # Create all directories up-front (including those which aren't present in the archive
+        # but contain files) so that members may be extracted in any order
+        directories = {
+            output_filepath for _filepath, _info, output_filepath, _mode, is_dir in members
+            if is_dir
+        }
+        parent_directories = {
+            os.path.dirname(output_filepath)
+            for _filepath, _info, output_filepath, _mode, is_dir in members if not is_dir
+        }
+
+        for directory in sorted(directories | parent_directories):
+            try:
+                os.makedirs(directory)
+                if directory in directories:
+                    changed = True
+            except FileExistsError:
+                pass
+
+        # Determine the files which differ from those previously extracted, verifying those
+        # which have changed since the last extraction (or weren't recorded) using their CRC
+        extract_members = []
+        for filepath, info, output_filepath, _mode, is_dir in members:
+            if is_dir or output_filepath in unchanged_outputs:
+                continue
+
             try:
                 output_file_size = os.path.getsize(output_filepath)
             except FileNotFoundError:
                 output_file_size = -1
 
-            # A directory has been encountered
-            if is_dir:
-                try:
-                    os.makedirs(output_filepath)
-                    changed = True
-                except FileExistsError:
-                    pass
+            # Some RAR archives record a BLAKE2 hash rather than a CRC for their members, in
+            # which case only the size may be compared
+            if (
+                info.file_size != output_file_size or
+                info.CRC is not None and files.crc32(output_filepath) != info.CRC
+            ):
+                extract_members.append((filepath, info, output_filepath))
+
+        if extract_members:
+            changed = True
+
+        # Extract the files, decompressing ZIP members concurrently when requested (zlib
+        # releases the GIL) with each thread reading from its own handle of the archive
+        if archive_type == 'zip' and self.workers and self.workers > 1:
+            archive.close()
+            self.extract_zip_members_concurrently(extract_members)
+        elif archive_type == 'rar' and extract_members:
+            # Extracting each member of a RAR archive individually spawns a process per member,
+            # so they're extracted using a single process instead
+            self.extract_rar_members(archive, extract_members)
+            archive.close()
+        else:
+            for filepath, _info, output_filepath in extract_members:
+                self.extract_member(archive, filepath, output_filepath)
+            archive.close()
+
+        return changed, [
+            (output_filepath, mode, is_dir)
+            for _filepath, _info, output_filepath, mode, is_dir in members
+        ]
+
+    def extract_tar(self, compression, unchanged_outputs):
+        """
+        Extracts a tar archive in a single sequential pass, streaming each file to disk without
+        holding it in memory.
+
+        Files are skipped when a file with the same size and modification time was previously
+        extracted.  Symlinks and hard links are recreated, while other special files are ignored.
+
+        :param compression: the compression of the tar archive (an empty string if uncompressed)
+        :param unchanged_outputs: output paths which are known to be unchanged since they were
+                                  last extracted
+
+        :return: a tuple containing a boolean indicating whether any changes were made and a
+                 list of tuples containing the output path, mode and whether each member is a
+                 directory
+        """
+        changed = False
+        members = []
+
+        # Hard links refer to members extracted earlier, so their output paths are retained
+        output_filepaths = {}
+
+        try:
+            with self.open_tar(compression) as archive:
+                for info in archive:
+                    output_filepath = self.output_filepath(info.name)
+                    if output_filepath is None:
+                        continue
+
+                    # A directory has been encountered
+                    if info.isdir():
+                        try:
+                            os.makedirs(output_filepath)
+                            changed = True
+                        except FileExistsError:
+                            pass
+
+                        members.append((output_filepath, info.mode, True))
+                        continue
+
+                    # Special files such as devices and FIFOs are not extracted
+                    if not (info.isfile() or info.issym() or info.islnk()):
+                        continue
+
+                    # Verify that the directory we're writing in is present (especially useful
+                    # for archives where only the files have been added and not the directories)
+                    os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
+
+                    if info.issym():
+                        if output_filepath not in unchanged_outputs:
+                            changed |= self.extract_tar_symlink(info.linkname, output_filepath)
+
+                        # The mode of a symlink is irrelevant and changing it follows the link
+                        members.append((output_filepath, None, False))
+                        continue
+
+                    if info.islnk():
+                        target_filepath = output_filepaths.get(os.path.normpath(info.linkname))
+                        if target_filepath is None:
+                            continue
+
+                        if output_filepath not in unchanged_outputs:
+                            changed |= self.extract_tar_hard_link(target_filepath, output_filepath)
+                    elif output_filepath not in unchanged_outputs:
+                        changed |= self.extract_tar_file(archive, info, output_filepath)
+
+                    output_filepaths[os.path.normpath(info.name)] = output_filepath
+                    members.append((output_filepath, info.mode, False))
+        except (tarfile.TarError, EOFError, zlib.error, lzma.LZMAError):
+            raise ActionError('the contents of the archive provided are not valid')
+
+        return changed, members
+
+    def extract_tar_file(self, archive, info, output_filepath):
+        """
+        Extracts a regular file from a tar archive unless it has already been extracted.
+
+        :param archive: the TarFile object of the archive opened in stream mode
+        :param info: the TarInfo of the file
+        :param output_filepath: the path to write the file to
+
+        :return: a boolean indicating whether the file was extracted
+        """
+        try:
+            output_stat = os.lstat(output_filepath)
+            if (
+                stat.S_ISREG(output_stat.st_mode) and
+                output_stat.st_size == info.size and
+                int(output_stat.st_mtime) == int(info.mtime)
+            ):
+                return False
+        except FileNotFoundError:
+            pass
+
+        # Replace existing links rather than writing to the files they point to
+        if os.path.islink(output_filepath) or os.path.isfile(output_filepath):
+            os.remove(output_filepath)
+
+        # Large buffers reduce the number of system calls when writing each file
+        with archive.extractfile(info) as archive_fp:
+            with open(output_filepath, 'wb') as output_fp:
+                shutil.copyfileobj(archive_fp, output_fp, files.BUFFER_SIZE)
+
+        # The modification time is retained so that it may be compared on subsequent runs
+        os.utime(output_filepath, (info.mtime, info.mtime))
+        return True
+
+    def extract_tar_symlink(self, link_target, output_filepath):
+        """
+        Creates a symlink from a tar archive unless an identical one already exists.
+
+        :param link_target: the target of the symlink
+        :param output_filepath: the path of the symlink
+
+        :return: a boolean indicating whether the symlink was created
+        """
+        if os.path.islink(output_filepath):
+            if os.readlink(output_filepath) == link_target:
+                return False
+            os.remove(output_filepath)
+        elif os.path.isfile(output_filepath):
+            os.remove(output_filepath)
 
-            # A file has been encountered which is the same size as a previously extracted file
-            elif info.file_size == output_file_size:
+        os.symlink(link_target, output_filepath)
+        return True
+
+    def extract_tar_hard_link(self, target_filepath, output_filepath):
+        """
+        Creates a hard link from a tar archive unless the file is already linked to its target.
+
+        :param target_filepath: the output path of the file being linked to
+        :param output_filepath: the path of the hard link
+
+        :return: a boolean indicating whether the hard link was created
+        """
+        if os.path.lexists(output_filepath):
+            if os.path.samefile(target_filepath, output_filepath):
+                return False
+            os.remove(output_filepath)
+
+        os.link(target_filepath, output_filepath)
+        return True
+
+    @contextmanager
+    def open_tar(self, compression):
+        """
+        Opens a tar archive in stream mode so that it's read sequentially in a single pass.
+        Archives compressed with zstd are decompressed by the zstd command while being read.
+
+        :param compression: the compression of the tar archive (an empty string if uncompressed)
+
+        :return: a context manager yielding the TarFile object of the archive
+        """
+        if compression != 'zst':
+            with tarfile.open(self.source, f'r|{compression}') as archive:
+                yield archive
+            return
+
+        command = ['zstd', '--decompress', '--stdout', '--quiet', self.source]
+        try:
+            process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                preexec_fn=self.preexec_fn
+            )
+        except FileNotFoundError:
+            raise ActionError(f'unable to find executable for command {command}')
+
+        try:
+            with tarfile.open(fileobj=process.stdout, mode='r|') as archive:
+                yield archive
+
+            # Consume any padding following the end of the archive so that zstd exits cleanly
+            while process.stdout.read(files.BUFFER_SIZE):
                 pass
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', errors='replace')
+            process.stderr.close()
+            returncode = process.wait()
 
-            # A file has been encountered
-            else:
-                # Verify that the directory we're writing in is present (especially useful
-                # for archives where only the files have been added and not the directories)
-                output_dirname = os.path.dirname(output_filepath)
-                if not os.path.exists(output_dirname):
-                    os.makedirs(output_dirname)
+        if returncode != 0:
+            raise ActionError(f'unable to decompress the archive provided: {stderr.rstrip()}')
 
-                # Extract the file
-                with archive.open(filepath) as archive_fp:
-                    with open(output_filepath, 'wb') as output_fp:
-                        shutil.copyfileobj(archive_fp, output_fp)
+    def archive_type(self):
+        """
+        Determines the type of archive from the extension of its source.
 
-                changed = True
+        :return: the archive type (zip, rar or a tar extension) or None if it's unsupported
+        """
+        source = self.source.lower()
+        for tar_extension in sorted(TAR_COMPRESSIONS, key=len, reverse=True):
+            if source.endswith(tar_extension):
+                return tar_extension
 
-            # Set the file mode if required
-            if mode and self.preserve_mode:
-                os.chmod(output_filepath, mode)
+        archive_type = os.path.splitext(source)[1][1:]
+        return archive_type if archive_type in ['rar', 'zip'] else None
 
-        return self.changed() if changed else self.ok()
+    def output_filepath(self, filepath):
+        """
+        Determines the output path of a file in the archive.
+
+        :param filepath: the path of the file in the archive
+
+        :return: the path to extract the file to or None if the file should be skipped
+        """
+        # Skip any requested files
+        filepath_parts = os.path.normpath(filepath).split(os.sep)
+        if set(filepath_parts).intersection(self.ignore_files):
+            return None
+
+        # Determine the full output path of the current file
+        if self.base_dir:
+            if filepath_parts[0] != self.base_dir:
+                return None
+
+            output_filepath = os.path.join(self.path, *filepath_parts[1:])
+        else:
+            output_filepath = os.path.join(self.path, filepath)
+
+        # Refuse members which would be written outside the destination, whether by using an
+        # absolute path, a parent directory reference or a symlink extracted earlier (the last
+        # component is not resolved as existing links are replaced rather than written through)
+        output_filepath = os.path.normpath(output_filepath)
+        if output_filepath == os.path.normpath(self.path):
+            return output_filepath
+
+        destination = os.path.realpath(self.path)
+        resolved_filepath = os.path.join(
+            os.path.realpath(os.path.dirname(output_filepath)), os.path.basename(output_filepath)
+        )
+        if not resolved_filepath.startswith(os.path.join(destination, '')):
+            raise ActionError(
+                f'the archive member {filepath} would be extracted outside of the destination'
+            )
+
+        return output_filepath
+
+    def manifest_key(self):
+        """
+        Builds the persistent cache key used to store the manifest of an extraction.
+
+        :return: a tuple which identifies the archive, destination and extraction options
+        """
+        return (
+            'manifest', os.path.abspath(self.source), os.path.abspath(self.path),
+            self.preserve_mode, tuple(sorted(self.ignore_files)), self.base_dir
+        )
+
+    def archive_digest(self):
+        """
+        Computes the digest of the archive when persistent caching is enabled.
+
+        :return: the hex digest of the archive or None if persistent caching is disabled
+        """
+        return files.digest(self.source) if self.persistent_cache_dir else None
+
+    def archive_unchanged(self, manifest_archive, archive_stat):
+        """
+        Determines whether an archive is the same as the one recorded in a manifest.  The
+        contents of the archive are only compared when its size or modification time differ.
+
+        :param manifest_archive: the size, modification time and digest of the archive
+                                 recorded in the manifest
+        :param archive_stat: the current stat result of the archive
+
+        :return: a boolean indicating whether the archive is unchanged
+        """
+        size, mtime_ns, digest = manifest_archive
+        if archive_stat.st_size != size:
+            return False
+        if archive_stat.st_mtime_ns == mtime_ns:
+            return True
+
+        try:
+            return files.digest(self.source) == digest
+        except OSError:
+            return False
+
+    def output_signature(self, output_filepath):
+        """
+        Builds a signature of an extracted file which changes whenever it is modified.
+
+        :param output_filepath: the path of the extracted file
+
+        :return: a tuple containing the stat signature and mode of the file or None if it
+                 doesn't exist
+        """
+        try:
+            output_stat = os.stat(output_filepath, follow_symlinks=False)
+        except OSError:
+            return None
+
+        return files.stat_signature(output_stat) + (output_stat.st_mode,)
+
+    def extract_member(self, archive, filepath, output_filepath):
+        """
+        Extracts a single file from an archive.
+
+        :param archive: the ZipFile or RarFile object of the archive
+        :param filepath: the path of the file in the archive
+        :param output_filepath: the path to write the file to
+        """
+        # Large buffers reduce the number of system calls, particularly for stored members
+        with archive.open(filepath) as archive_fp:
+            with open(output_filepath, 'wb') as output_fp:
+                shutil.copyfileobj(archive_fp, output_fp, files.BUFFER_SIZE)
+
+    def extract_rar_members(self, archive, extract_members):
+        """
+        Extracts files from a RAR archive using a single unrar or bsdtar process which writes
+        them to a staging directory in the destination, moving each into place afterwards.
+        Any files which couldn't be extracted this way are extracted individually.
+
+        :param archive: the RarFile object of the archive
+        :param extract_members: a list of tuples containing the path in the archive, the info
+                                and output path of each file to be extracted
+        """
+        # bsdtar is unable to extract multi-volume RAR archives
+        if shutil.which('unrar'):
+            tool = 'unrar'
+        elif shutil.which('bsdtar') and len(archive.volumelist()) == 1:
+            tool = 'bsdtar'
+        else:
+            tool = None
+
+        remaining_members = extract_members
+
+        if tool:
+            staging_dir = tempfile.mkdtemp(prefix='.archive-', dir=self.path)
+            try:
+                list_path = os.path.join(staging_dir, '.members')
+
+                if tool == 'unrar':
+                    with open(list_path, 'w', encoding='utf-8') as list_fp:
+                        for filepath, _info, _output_filepath in extract_members:
+                            list_fp.write(f'{filepath}\n')
+
+                    command = [
+                        'unrar', 'x', '-o+', '-y', '-idq', '-p-', '-scul', self.source,
+                        f'@{list_path}', staging_dir + os.sep
+                    ]
+                else:
+                    with open(list_path, 'w', encoding='utf-8') as list_fp:
+                        for filepath, _info, _output_filepath in extract_members:
+                            list_fp.write(f'{filepath}\0')
+
+                    command = [
+                        'bsdtar', '-x', '-f', self.source, '-C', staging_dir, '--null',
+                        '-T', list_path
+                    ]
+
+                self.run(command, fail_error='unable to extract the RAR archive provided')
+
+                # Extraction tools apply the archived mode, so files are given the default mode
+                # for new files (as they would be when written directly) if it isn't preserved
+                umask = os.umask(0)
+                os.umask(umask)
+                default_mode = 0o666 & ~umask
+
+                # Move each file extracted into place, noting any which weren't extracted (e.g.
+                # those with names which were interpreted as wildcards)
+                remaining_members = []
+                for member in extract_members:
+                    filepath, _info, output_filepath = member
+                    staged_filepath = os.path.join(staging_dir, filepath)
+                    try:
+                        if not self.preserve_mode:
+                            os.chmod(staged_filepath, default_mode)
+                        os.replace(staged_filepath, output_filepath)
+                    except FileNotFoundError:
+                        remaining_members.append(member)
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+        for filepath, _info, output_filepath in remaining_members:
+            self.extract_member(archive, filepath, output_filepath)
+
+    def extract_zip_members_concurrently(self, extract_members):
+        """
+        Extracts files from a ZIP archive using a pool of threads.
+
+        :param extract_members: a list of tuples containing the path in the archive, the info
+                                and output path of each file to be extracted
+        """
+        local = threading.local()
+        archives = []
+
+        def extract(member):
+            filepath, _info, output_filepath = member
+
+            # ZipFile objects share a single file position, so each thread uses its own
+            if not hasattr(local, 'archive'):
+                local.archive = zipfile.ZipFile(self.source)
+                archives.append(local.archive)
+
+            self.extract_member(local.archive, filepath, output_filepath)
+
+        # Start with the largest files so that the workers finish at a similar time
+        extract_members = sorted(extract_members, key=lambda member: -member[1].file_size)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for _result in executor.map(extract, extract_members):
+                    pass
+        finally:
+            for archive in archives:
+                archive.close()
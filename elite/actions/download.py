@@ -1,71 +1,587 @@
 import cgi
+import hashlib
+import http.client
+import json
 import os
-import shutil
+import re
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 from . import ActionError, FileAction
+from ..libraries import files
+
+
+# The minimum size of each range when downloading using multiple concurrent requests
+MIN_RANGE_SIZE = 8 * 1024 * 1024
+
+# The number of bytes downloaded between each save of the progress of a ranged download
+PROGRESS_SAVE_INTERVAL = 16 * 1024 * 1024
+
+
+class RangesUnsupportedError(Exception):
+    """An error that occurs when a server doesn't honour a range request"""
 
 
 class Download(FileAction):
     """
     Downloads a specified URL to a particular destination path.
 
+    Downloads are written to a .part file alongside the destination which is moved into place
+    once complete, so interrupted downloads are never mistaken for completed ones and are resumed
+    on the next run when the server supports range requests and the download is unchanged
+    (according to the validator recorded alongside the .part file).
+
     :param url: the URL to download
     :param path: the directory or filename where the download should be placed
+    :param workers: the number of concurrent range requests to split the download into when the
+                    server supports them or None to download using a single request
+    :param checksum: the expected checksum of the download in the form algorithm:hex digest
+                     (e.g. sha256:2c26b46b...) which is verified while downloading and used to
+                     verify any existing file at the destination
+    :param cache_path: the directory of a content-addressed cache of downloads which have been
+                       verified against their checksum (defaults to the persistent cache)
+    :param refresh: whether to revalidate an existing download with the server using the ETag
+                    and Last-Modified headers it was downloaded with (requires persistent caching)
+                    and download it again if it has changed
+    :param opener: the urllib opener used to make requests (e.g. one which reuses connections
+                   from a pool) or None to use the default
     """
 
-    def __init__(self, url, path, **kwargs):
+    def __init__(
+        self, url, path, workers=None, checksum=None, cache_path=None, refresh=False,
+        opener=None, **kwargs
+    ):
         self.url = url
         self.path = path
+        self.workers = workers
+        self.checksum = checksum
+        self.cache_path = cache_path
+        self.refresh = refresh
+        self.opener = opener
         super().__init__(**kwargs)
 
+    @property
+    def checksum(self):
+        return self._checksum
+
+    @checksum.setter
+    def checksum(self, checksum):
+        if checksum is not None:
+            algorithm, _separator, expected_digest = checksum.partition(':')
+            if algorithm.lower() not in hashlib.algorithms_guaranteed:
+                raise ValueError(
+                    'checksum must be in the form algorithm:hex digest using one of '
+                    f'{", ".join(sorted(hashlib.algorithms_guaranteed))}'
+                )
+            if not re.match(r'^[0-9a-fA-F]+$', expected_digest):
+                raise ValueError('checksum must contain a hexadecimal digest')
+        self._checksum = checksum
+
+    @property
+    def checksum_algorithm(self):
+        return self.checksum.partition(':')[0].lower() if self.checksum else None
+
+    @property
+    def checksum_digest(self):
+        return self.checksum.partition(':')[2].lower() if self.checksum else None
+
+    @property
+    def blob_path(self):
+        """The path of the download in the content-addressed cache (if enabled)."""
+        if not self.checksum:
+            return None
+
+        if self.cache_path:
+            cache_path = os.path.expanduser(self.cache_path)
+        elif self.persistent_cache_dir:
+            cache_path = os.path.join(self.persistent_cache_dir, 'blobs')
+        else:
+            return None
+
+        return os.path.join(cache_path, self.checksum_algorithm, self.checksum_digest)
+
     def process(self):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.path)
 
+        # Determine the destination filepath if it is known without making any requests
+        if not os.path.isdir(path) and not path.endswith(os.sep):
+            filepath = path
+        else:
+            filename = self.persistent_cache_get(('filename', self.url))
+            filepath = os.path.join(path, filename) if filename else None
+
+        # When the checksum is known, the destination may be verified or populated from the
+        # cache without any network requests
+        if self.checksum:
+            if filepath and self.verify(filepath):
+                changed = self.set_file_attributes(filepath)
+                return self.changed(path=filepath) if changed else self.ok(path=filepath)
+
+            if filepath and self.place_blob(filepath):
+                self.set_file_attributes(filepath)
+                return self.changed(path=filepath)
+
+        # Send the validators of an existing download so the server may advise it's unchanged
+        headers = {}
+        if self.refresh and filepath:
+            validators = self.load_validators(filepath)
+            if validators:
+                etag, last_modified = validators
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
         # Download the requested URL to the destination path
         try:
-            request = urllib.request.urlopen(self.url)
+            try:
+                request = self.urlopen(urllib.request.Request(self.url, headers=headers))
+            except urllib.error.HTTPError as e:
+                if not headers or e.code != 304:
+                    raise
+                e.close()
 
-            # Determine if the user has provided a full filepath to download to
-            if not os.path.isdir(path) and not path.endswith(os.sep):
-                filepath = path
-            else:
-                # Use the download headers to determine the download filename
-                filename = None
-                if 'Content-Disposition' in request.headers:
-                    content_type, options = cgi.parse_header(request.headers['Content-Disposition'])
-                    if content_type == 'attachment' and 'filename' in options:
-                        filename = options['filename']
-
-                # Use the URL to determine the download filename
-                if not filename:
-                    url_path = urllib.parse.urlparse(request.url).path
-                    filename = os.path.basename(url_path)
-
-                # No filename could be determined
-                if not filename:
-                    raise ActionError('unable to determine the filename of the download')
-
-                # Build the full filepath using the path given and filename determined
-                filepath = os.path.join(path, filename)
-
-            # Check if the file already exists in the destination path
-            if os.path.exists(filepath):
+                # The existing download is current
                 changed = self.set_file_attributes(filepath)
                 return self.changed(path=filepath) if changed else self.ok(path=filepath)
 
-            # Perform the download to a binary file in chunks
             try:
-                with open(filepath, 'wb') as fp:
-                    shutil.copyfileobj(request, fp)
-            except OSError:
-                raise ActionError('unable to write the download to the path requester')
+                # Determine if the user has provided a full filepath to download to
+                if not os.path.isdir(path) and not path.endswith(os.sep):
+                    filepath = path
+                else:
+                    # Use the download headers to determine the download filename
+                    filename = None
+                    if 'Content-Disposition' in request.headers:
+                        content_type, options = cgi.parse_header(
+                            request.headers['Content-Disposition']
+                        )
+                        if content_type == 'attachment' and 'filename' in options:
+                            filename = options['filename']
+
+                    # Use the URL to determine the download filename
+                    if not filename:
+                        url_path = urllib.parse.urlparse(request.url).path
+                        filename = os.path.basename(url_path)
+
+                    # No filename could be determined
+                    if not filename:
+                        raise ActionError('unable to determine the filename of the download')
+
+                    # Build the full filepath using the path given and filename determined
+                    filepath = os.path.join(path, filename)
+
+                    # Remember the filename so that future runs may avoid this request or
+                    # revalidate the download
+                    if self.checksum or self.refresh:
+                        self.persistent_cache_set(('filename', self.url), filename)
+
+                # Check if the file already exists in the destination path (and matches the
+                # checksum if provided) unless it is being refreshed
+                if (
+                    os.path.exists(filepath) and
+                    (not self.checksum or self.verify(filepath)) and
+                    not self.refresh
+                ):
+                    changed = self.set_file_attributes(filepath)
+                    return self.changed(path=filepath) if changed else self.ok(path=filepath)
+
+                # The filename is now known, so the cache may satisfy the download
+                if self.checksum and self.place_blob(filepath):
+                    self.set_file_attributes(filepath)
+                    return self.changed(path=filepath)
 
-        except urllib.error.URLError:
+                # Perform the download to a partial file and move it into place once complete
+                part_filepath = f'{filepath}.part'
+                try:
+                    digest = self.download(request, part_filepath)
+
+                    if self.checksum and digest != self.checksum_digest:
+                        os.remove(part_filepath)
+                        self.save_part_validator(part_filepath, None)
+                        raise ActionError(
+                            f'the checksum of the download ({self.checksum_algorithm}:{digest}) '
+                            'does not match the checksum provided'
+                        )
+
+                    os.replace(part_filepath, filepath)
+                    self.save_part_validator(part_filepath, None)
+                except OSError:
+                    raise ActionError('unable to write the download to the path requester')
+
+                if self.refresh:
+                    self.save_validators(filepath, request.headers)
+            finally:
+                request.close()
+        except (urllib.error.URLError, http.client.HTTPException):
             raise ActionError('unable to retrieve the download URL requested')
 
+        # Record the verified download so it needn't be hashed again and may be used elsewhere
+        if self.checksum:
+            self.persistent_cache_set(self.checksum_key(os.stat(filepath)), digest)
+            self.store_blob(filepath)
+
         self.set_file_attributes(filepath)
         return self.changed(path=filepath)
+
+    def urlopen(self, request):
+        """
+        Opens a URL using the opener provided or the default opener.
+
+        :param request: the urllib request
+
+        :return: the response of the request
+        """
+        if self.opener:
+            return self.opener.open(request)
+        return urllib.request.urlopen(request)
+
+    def download(self, request, part_filepath):
+        """
+        Downloads the URL to a partial file, resuming any previous partial download and
+        splitting the download into concurrent range requests when possible.
+
+        :param request: the response of the initial request to the URL
+        :param part_filepath: the path of the partial file
+
+        :return: the hex digest of the download using the checksum algorithm or None if no
+                 checksum was provided
+        """
+        size = request.headers.get('Content-Length')
+        size = int(size) if size and size.isdigit() else None
+        ranges_supported = (
+            size is not None and request.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        )
+
+        # A partial download may only be resumed when the server identifies the download with
+        # the same validator that it had when the partial download was started
+        validator = self.range_validator(request.headers)
+        resumable = (
+            validator is not None and os.path.isfile(part_filepath) and
+            self.load_part_validator(part_filepath) == validator
+        )
+        self.save_part_validator(part_filepath, validator)
+
+        if ranges_supported:
+            # Ranges which are in progress are recorded alongside the partial file
+            progress_filepath = f'{part_filepath}.progress'
+            if resumable:
+                ranges = self.load_progress(progress_filepath, size)
+            else:
+                ranges = None
+
+            # Resume a partial download of a single request from where it finished
+            if ranges is None and resumable:
+                part_size = os.path.getsize(part_filepath)
+                if 0 < part_size < size:
+                    ranges = [[0, size, part_size]]
+
+            # Split new downloads into a range per worker where the file is large enough
+            if ranges is None and self.workers and self.workers > 1:
+                range_count = min(self.workers, size // MIN_RANGE_SIZE)
+                if range_count > 1:
+                    range_size = -(-size // range_count)
+                    ranges = [
+                        [start, min(start + range_size, size), start]
+                        for start in range(0, size, range_size)
+                    ]
+
+            if ranges is not None:
+                try:
+                    self.download_ranges(
+                        part_filepath, progress_filepath, size, ranges, validator
+                    )
+                except RangesUnsupportedError:
+                    # The download is restarted using the initial request
+                    self.remove_progress(progress_filepath)
+                else:
+                    # Ranges arrive out of order, so the file is read once it's complete
+                    if self.checksum:
+                        return files.digest(part_filepath, algorithm=self.checksum_algorithm)
+                    return None
+
+        # Download the entire file using the initial request, computing its digest as it's
+        # written when a checksum is provided
+        file_hash = files.new_hash(self.checksum_algorithm) if self.checksum else None
+        buffer = bytearray(files.BUFFER_SIZE)
+        view = memoryview(buffer)
+
+        with open(part_filepath, 'wb') as fp:
+            for length in iter(lambda: request.readinto(buffer), 0):
+                fp.write(view[:length])
+                if file_hash:
+                    file_hash.update(view[:length])
+            downloaded_size = fp.tell()
+
+        # Connections which are closed early are only detected by comparing the size
+        if size is not None and downloaded_size != size:
+            raise ActionError('the download ended before it was complete')
+
+        return file_hash.hexdigest() if file_hash else None
+
+    def download_ranges(self, part_filepath, progress_filepath, size, ranges, validator=None):
+        """
+        Downloads the remainder of each range provided concurrently, writing each to its
+        position in the partial file.
+
+        :param part_filepath: the path of the partial file
+        :param progress_filepath: the path used to save the progress of each range
+        :param size: the total size of the download
+        :param ranges: a list of lists containing the start, end (exclusive) and current
+                       position of each range
+        :param validator: the validator sent with each request using the If-Range header so
+                          that the server responds with the entire download if it has changed
+        """
+        lock = threading.Lock()
+        downloaded_since_save = 0
+
+        def save_progress():
+            # Progress is only tracked separately when downloading multiple ranges as the
+            # size of the partial file indicates the progress of a single range
+            if len(ranges) > 1:
+                temp_filepath = f'{progress_filepath}.tmp'
+                with open(temp_filepath, 'w') as fp:
+                    json.dump({'size': size, 'ranges': ranges}, fp)
+                os.replace(temp_filepath, progress_filepath)
+
+        def download_range(download_range):
+            nonlocal downloaded_since_save
+            _start, end, position = download_range
+            if position >= end:
+                return
+
+            headers = {'Range': f'bytes={position}-{end - 1}'}
+            if validator:
+                headers['If-Range'] = validator
+
+            request = urllib.request.Request(self.url, headers=headers)
+            with self.urlopen(request) as response:
+                if response.status != 206:
+                    raise RangesUnsupportedError()
+
+                while download_range[2] < end:
+                    data = response.read(min(files.BUFFER_SIZE, end - download_range[2]))
+                    if not data:
+                        break
+
+                    written = 0
+                    while written < len(data):
+                        written += os.pwrite(fd, data[written:], download_range[2] + written)
+
+                    with lock:
+                        download_range[2] += len(data)
+                        downloaded_since_save += len(data)
+                        if downloaded_since_save >= PROGRESS_SAVE_INTERVAL:
+                            save_progress()
+                            downloaded_since_save = 0
+
+        fd = os.open(part_filepath, os.O_WRONLY | os.O_CREAT, 0o666)
+        try:
+            # Any data beyond the end of the download (e.g. from a larger stale partial file)
+            # must not remain in the completed download
+            os.ftruncate(fd, size)
+            save_progress()
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                for _result in executor.map(download_range, ranges):
+                    pass
+        finally:
+            os.close(fd)
+            with lock:
+                save_progress()
+
+        if (
+            any(position < end for _start, end, position in ranges) or
+            os.path.getsize(part_filepath) != size
+        ):
+            raise ActionError('the download ended before it was complete')
+
+        # The download is complete, so its progress is no longer required
+        self.remove_progress(progress_filepath)
+
+    def remove_progress(self, progress_filepath):
+        """
+        Removes the saved progress of a download using multiple ranges (if present).
+
+        :param progress_filepath: the path where the progress was saved
+        """
+        try:
+            os.remove(progress_filepath)
+        except FileNotFoundError:
+            pass
+
+    def checksum_key(self, stat):
+        """
+        Builds the persistent cache key used to store the checksum of a file.
+
+        :param stat: the stat result of the file
+
+        :return: a tuple which changes whenever the file is modified
+        """
+        return ('checksum', self.checksum_algorithm, *files.stat_signature(stat))
+
+    def verify(self, filepath):
+        """
+        Verifies a file against the checksum provided, consulting the persistent cache to avoid
+        reading files which were previously verified and haven't changed since.
+
+        :param filepath: the path of the file
+
+        :return: a boolean indicating whether the file exists and matches the checksum
+        """
+        try:
+            key = self.checksum_key(os.stat(filepath))
+            digest = self.persistent_cache_get(key)
+            if digest is None:
+                digest = files.digest(filepath, algorithm=self.checksum_algorithm)
+                self.persistent_cache_set(key, digest)
+        except OSError:
+            return False
+
+        return digest == self.checksum_digest
+
+    def place_blob(self, filepath):
+        """
+        Copies a previously verified download from the content-addressed cache to the path
+        provided, cloning it where the filesystem supports it.
+
+        :param filepath: the destination path
+
+        :return: a boolean indicating whether the download was found in the cache
+        """
+        blob_path = self.blob_path
+        if not blob_path or not self.verify(blob_path):
+            return False
+
+        # Cached files are never linked, as modifying the destination would alter the cache
+        try:
+            files.copy(blob_path, filepath, source_digest=self.checksum_digest)
+        except OSError:
+            return False
+
+        self.persistent_cache_set(self.checksum_key(os.stat(filepath)), self.checksum_digest)
+        return True
+
+    def store_blob(self, filepath):
+        """
+        Stores a verified download in the content-addressed cache (if enabled).
+
+        :param filepath: the path of the download
+        """
+        blob_path = self.blob_path
+        if not blob_path or os.path.exists(blob_path):
+            return
+
+        # Failures are ignored as the cache is only an optimisation
+        try:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            files.copy(filepath, blob_path, source_digest=self.checksum_digest)
+            self.persistent_cache_set(self.checksum_key(os.stat(blob_path)), self.checksum_digest)
+        except OSError:
+            pass
+
+    def validators_key(self, filepath):
+        """
+        Builds the persistent cache key used to store the validators of a download.
+
+        :param filepath: the path of the download
+
+        :return: a tuple which changes whenever the download is modified
+        """
+        return ('validators', self.url, filepath, *files.stat_signature(os.stat(filepath)))
+
+    def load_validators(self, filepath):
+        """
+        Loads the validators which were sent by the server when the download was made.
+
+        :param filepath: the path of the download
+
+        :return: a tuple containing the ETag and Last-Modified headers (either of which may be
+                 None) or None if the download doesn't exist or has been modified since
+        """
+        try:
+            return self.persistent_cache_get(self.validators_key(filepath))
+        except OSError:
+            return None
+
+    def save_validators(self, filepath, headers):
+        """
+        Saves the validators sent by the server for a download (if any).
+
+        :param filepath: the path of the download
+        :param headers: the headers of the response
+        """
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if etag or last_modified:
+            self.persistent_cache_set(self.validators_key(filepath), (etag, last_modified))
+
+    def range_validator(self, headers):
+        """
+        Determines the validator of a download which may be used with the If-Range header.
+
+        :param headers: the headers of the response
+
+        :return: the strong ETag or Last-Modified header of the response or None if neither was
+                 provided
+        """
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return headers.get('Last-Modified')
+
+    def load_part_validator(self, part_filepath):
+        """
+        Loads the validator of the download which a partial file was started with.
+
+        :param part_filepath: the path of the partial file
+
+        :return: the validator or None if none was recorded
+        """
+        try:
+            with open(f'{part_filepath}.validator', encoding='utf-8') as fp:
+                return fp.read() or None
+        except OSError:
+            return None
+
+    def save_part_validator(self, part_filepath, validator):
+        """
+        Records the validator of the download which a partial file is started with.
+
+        :param part_filepath: the path of the partial file
+        :param validator: the validator of the download or None to remove any recorded validator
+        """
+        validator_filepath = f'{part_filepath}.validator'
+        if validator is None:
+            try:
+                os.remove(validator_filepath)
+            except FileNotFoundError:
+                pass
+            return
+
+        with open(validator_filepath, 'w', encoding='utf-8') as fp:
+            fp.write(validator)
+
+    def load_progress(self, progress_filepath, size):
+        """
+        Loads the progress of a previously interrupted download using multiple ranges.
+
+        :param progress_filepath: the path where the progress was saved
+        :param size: the total size of the download which must match the saved progress
+
+        :return: a list of lists containing the start, end and position of each range or None
+                 if no valid progress was found
+        """
+        try:
+            with open(progress_filepath) as fp:
+                progress = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        if progress.get('size') != size:
+            return None
+
+        return progress.get('ranges')
@@ -0,0 +1,107 @@
+import os
+import shutil
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import Action, ActionError
+from .download import Download
+from ..libraries import http_pool
+
+
+class Downloads(Action):
+    """
+    Downloads many URLs at once, processing them concurrently and reusing keep-alive
+    connections to each host so that the TCP and TLS handshakes aren't repeated per download.
+
+    Progress is reported as each download completes and every download is attempted, with any
+    failures reported together once all downloads have finished.
+
+    :param downloads: a list of dicts containing the arguments of each download (e.g. url, path
+                      and checksum) as accepted by the download action
+    :param workers: the maximum number of downloads to process at once or None to use the default
+    :param host_workers: the maximum number of downloads to process at once from each host or
+                         None for no limit
+    """
+
+    def __init__(self, downloads, workers=None, host_workers=None, **kwargs):
+        self.downloads = downloads
+        self.workers = workers
+        self.host_workers = host_workers
+        super().__init__(**kwargs)
+
+        # Connections are shared by all downloads and returned to the pool once each response
+        # has been read
+        self.pool = http_pool.ConnectionPool()
+        opener = http_pool.build_opener(self.pool)
+
+        # Create the download action for each entry up-front so that invalid arguments are
+        # reported before any downloads are started (the command cache is cleared once all
+        # downloads have finished rather than by each download action as it changes)
+        self.download_actions = [
+            Download(
+                **download,
+                opener=opener,
+                persistent_cache_base_dir=self.persistent_cache_base_dir,
+                preexec_fn=self.preexec_fn
+            )
+            for download in self.downloads
+        ]
+
+    def process(self):
+        host_semaphores = {}
+        if self.host_workers:
+            for download_action in self.download_actions:
+                host = urllib.parse.urlparse(download_action.url).netloc
+                host_semaphores[host] = threading.BoundedSemaphore(self.host_workers)
+
+        def process_download(download_action):
+            host = urllib.parse.urlparse(download_action.url).netloc
+            semaphore = host_semaphores.get(host)
+            try:
+                if semaphore:
+                    with semaphore:
+                        return download_action.process(), None
+                return download_action.process(), None
+            except ActionError as e:
+                return None, e
+
+        outcomes = [None] * len(self.download_actions)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {
+                    executor.submit(process_download, download_action): index
+                    for index, download_action in enumerate(self.download_actions)
+                }
+                for completed, future in enumerate(as_completed(futures), 1):
+                    outcomes[futures[future]] = future.result()
+                    self.progress(f'{completed} of {len(outcomes)} downloads complete')
+        finally:
+            self.pool.close()
+
+        # Clear the command cache of download actions once if any downloads were changed
+        if self.cache_base_dir and any(response and response.changed for response, _ in outcomes):
+            download_cache_dir = os.path.join(self.cache_base_dir, Download.__name__)
+            if os.path.exists(download_cache_dir):
+                shutil.rmtree(download_cache_dir)
+
+        # Report every failure encountered in the order the downloads were provided
+        failures = [
+            f'{download_action.url}: {error}' if error.args else download_action.url
+            for download_action, (_response, error) in zip(self.download_actions, outcomes)
+            if error
+        ]
+        if len(failures) == 1:
+            raise ActionError(f'unable to download the URL {failures[0]}')
+        elif failures:
+            raise ActionError(
+                f'unable to download {len(failures)} of {len(outcomes)} URLs: ' +
+                '; '.join(failures)
+            )
+
+        results = [
+            {'url': download_action.url, 'path': response.data['path'], 'changed': response.changed}
+            for download_action, (response, _error) in zip(self.download_actions, outcomes)
+        ]
+        changed = any(result['changed'] for result in results)
+        return self.changed(results=results) if changed else self.ok(results=results)
@@ -1,12 +1,11 @@
-import hashlib
 import os
-import shutil
 
 from Foundation import (  # pylint: disable=no-name-in-module
     NSURL, NSURLBookmarkCreationSuitableForBookmarkFile, NSURLBookmarkResolutionWithoutUI
 )
 
 from . import ActionError, FileAction
+from ..libraries import files
 
 
 class File(FileAction):
@@ -92,13 +91,20 @@ class File(FileAction):
                 # An existing file at the destination path was found so we compare them
                 # and avoid making changes if they're identical
                 exists = os.path.isfile(path)
-                if exists and self.md5(source) == self.md5(path):
+                if exists and self.identical(source, path):
                     changed = self.set_file_attributes(path)
                     return self.changed(path=path) if changed else self.ok(path=path)
 
-                # Copy the source to the destination
+                # Copy the source to the destination, using the known digest of the source (if
+                # any) to allow the copy to be offloaded to the kernel and caching the digest of
+                # the newly copied file so it needn't be read during the next comparison
                 try:
-                    shutil.copyfile(source, path)
+                    source_key = self.digest_key(os.stat(source))
+                    source_digest = self.persistent_cache_get(source_key)
+                    path_digest = files.copy(source, path, source_digest=source_digest)
+                    if not source_digest:
+                        self.persistent_cache_set(source_key, path_digest)
+                    self.persistent_cache_set(self.digest_key(os.stat(path)), path_digest)
                 except OSError:
                     raise ActionError('unable to copy source file to path requested')
 
@@ -125,6 +131,14 @@ class File(FileAction):
         elif self.state == 'directory':
             # An existing directory was found
             if os.path.isdir(path):
+                # Report the number of entries updated when applying attributes recursively
+                if self.recurse:
+                    changed_entries = self.set_file_attributes_recursive(path)
+                    if changed_entries:
+                        return self.changed(path=path, changed_entries=changed_entries)
+                    else:
+                        return self.ok(path=path, changed_entries=changed_entries)
+
                 changed = self.set_file_attributes(path)
                 return self.changed(path=path) if changed else self.ok(path=path)
 
@@ -223,14 +237,56 @@ class File(FileAction):
             removed = self.remove(path)
             return self.changed(path=path) if removed else self.ok(path=path)
 
-    def md5(self, path, block_size=1024 * 8):
-        hash_md5 = hashlib.md5()
+    def digest_key(self, stat):
+        """
+        Builds the persistent cache key used to store the digest of a file.
+
+        :param stat: the stat result of the file
+
+        :return: a tuple which changes whenever the file is modified
+        """
+        return ('digest', *files.stat_signature(stat))
+
+    def identical(self, source, path):
+        """
+        Determines whether two files are identical, avoiding reading them where possible by
+        comparing their sizes and consulting the persistent digest cache.
+
+        :param source: the path of the source file
+        :param path: the path of the destination file
+
+        :return: a boolean indicating whether the files have identical contents
+        """
+        try:
+            source_stat = os.stat(source)
+            path_stat = os.stat(path)
+        except OSError:
+            raise ActionError('unable to determine checksum of file')
+
+        # Files of differing sizes can't be identical
+        if source_stat.st_size != path_stat.st_size:
+            return False
+
+        source_key = self.digest_key(source_stat)
+        path_key = self.digest_key(path_stat)
+        source_digest = self.persistent_cache_get(source_key)
+        path_digest = self.persistent_cache_get(path_key)
+
+        if source_digest and path_digest:
+            return source_digest == path_digest
 
         try:
-            with open(path, 'rb') as fp:
-                for block in iter(lambda: fp.read(block_size), b''):
-                    hash_md5.update(block)
+            identical, compared_source_digest, compared_path_digest = files.compare(
+                source, path, source_digest=source_digest, destination_digest=path_digest
+            )
         except OSError:
             raise ActionError('unable to determine checksum of file')
 
-        return hash_md5.hexdigest()
+        # Cache any digest that had to be computed
+        if identical:
+            if not source_digest:
+                self.persistent_cache_set(source_key, compared_source_digest)
+            if not path_digest:
+                self.persistent_cache_set(path_key, compared_path_digest)
+
+        return identical
@@ -6,6 +6,7 @@ from Foundation import (  # pylint: disable=no-name-in-module
 
 from . import Action
 from ..constants import FLAGS
+from ..libraries import alias
 
 
 class FileInfo(Action):
@@ -38,23 +39,21 @@ class FileInfo(Action):
                 file_type = 'directory'
                 source = None
             elif self.aliases:
-                # Determine if the file is an alias
-                alias_url = NSURL.fileURLWithPath_(path)
-                bookmark_data, _error = NSURL.bookmarkDataWithContentsOfURL_error_(alias_url, None)
+                # Determine if the file is an alias from its contents, using the target path
+                # recorded in the alias if it still exists
+                is_bookmark_file = alias.is_bookmark_file(path)
+                target_path = alias.bookmark_file_target_path(path) if is_bookmark_file else None
 
-                if bookmark_data:
-                    file_type = 'alias'
-                    source_url, _is_stale, _error = (
-                        # pylint: disable=line-too-long
-                        NSURL.URLByResolvingBookmarkData_options_relativeToURL_bookmarkDataIsStale_error_(  # noqa: E501
-                            bookmark_data, NSURLBookmarkResolutionWithoutUI, None, None, None
-                        )
-                        # pylint: enable=line-too-long
-                    )
-                    source = source_url.path() if source_url else None
-                else:
+                if is_bookmark_file is False:
                     file_type = 'file'
                     source = None
+                elif target_path and os.path.exists(target_path):
+                    file_type = 'alias'
+                    source = target_path
+                else:
+                    # Fall back to resolving the alias via Finder which may also locate targets
+                    # that have since moved
+                    file_type, source = self.resolve_alias(path)
             else:
                 file_type = 'file'
                 source = None
@@ -74,3 +73,26 @@ class FileInfo(Action):
             flags = None
 
         return self.ok(exists=exists, file_type=file_type, source=source, mount=mount, flags=flags)
+
+    def resolve_alias(self, path):
+        """
+        Determines whether a file is an alias and resolves its source via Finder.
+
+        :param path: the path of the file
+
+        :return: a tuple containing the file type and source of the alias (if any)
+        """
+        alias_url = NSURL.fileURLWithPath_(path)
+        bookmark_data, _error = NSURL.bookmarkDataWithContentsOfURL_error_(alias_url, None)
+
+        if not bookmark_data:
+            return 'file', None
+
+        source_url, _is_stale, _error = (
+            # pylint: disable=line-too-long
+            NSURL.URLByResolvingBookmarkData_options_relativeToURL_bookmarkDataIsStale_error_(  # noqa: E501
+                bookmark_data, NSURLBookmarkResolutionWithoutUI, None, None, None
+            )
+            # pylint: enable=line-too-long
+        )
+        return 'alias', source_url.path() if source_url else None
@@ -0,0 +1,116 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Action, ActionError
+from .file import File
+
+
+class Files(Action):
+    """
+    Manages many files, directories, symlinks and macOS aliases at once, processing them
+    concurrently so that hashing and copying (which release the GIL) may run in parallel.
+
+    Entries are processed after any entries for the directories which contain them (and after
+    earlier entries for the same path), so only unrelated paths are processed at once.
+
+    :param files: a list of dicts containing the arguments of each file (e.g. path, source, state,
+                  mode, owner, group and flags) as accepted by the file action
+    :param workers: the maximum number of files to process at once or None to use the default
+    """
+
+    def __init__(self, files, workers=None, **kwargs):
+        self.files = files
+        self.workers = workers
+        super().__init__(**kwargs)
+
+        # Create the file action for each entry up-front so that invalid arguments are reported
+        # before any files are processed (the command cache is cleared once all files have been
+        # processed rather than by each file action as it changes)
+        self.file_actions = [
+            File(
+                **file,
+                persistent_cache_base_dir=self.persistent_cache_base_dir,
+                preexec_fn=self.preexec_fn
+            )
+            for file in self.files
+        ]
+
+    def stages(self):
+        """
+        Groups the file actions into stages which must be processed one after another, so that
+        each path is processed after the paths of any directories containing it and after any
+        earlier entries for the same path.
+
+        :return: a list of lists containing the indexes of the file actions in each stage
+        """
+        paths = [
+            os.path.normpath(os.path.abspath(os.path.expanduser(file_action.path)))
+            for file_action in self.file_actions
+        ]
+
+        indexes_by_path = {}
+        for index, path in enumerate(paths):
+            indexes_by_path.setdefault(path, []).append(index)
+
+        # Determine the stage of each entry from the entries it depends on, visiting parent
+        # directories before their contents
+        stage_numbers = {}
+        for index in sorted(range(len(paths)), key=lambda i: (paths[i].count(os.sep), i)):
+            path = paths[index]
+            dependencies = [i for i in indexes_by_path[path] if i < index]
+
+            parent = os.path.dirname(path)
+            while parent != path:
+                dependencies.extend(indexes_by_path.get(parent, []))
+                path, parent = parent, os.path.dirname(parent)
+
+            stage_numbers[index] = max((stage_numbers[i] + 1 for i in dependencies), default=0)
+
+        stages = [[] for _stage in range(max(stage_numbers.values(), default=-1) + 1)]
+        for index in range(len(paths)):
+            stages[stage_numbers[index]].append(index)
+        return stages
+
+    def process(self):
+        def process_file(file_action):
+            try:
+                return file_action.process(), None
+            except ActionError as e:
+                return None, e
+
+        outcomes = [None] * len(self.file_actions)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for stage in self.stages():
+                stage_outcomes = executor.map(
+                    process_file, [self.file_actions[index] for index in stage]
+                )
+                for index, outcome in zip(stage, stage_outcomes):
+                    outcomes[index] = outcome
+
+        # Clear the command cache of file actions once if any files were changed
+        if self.cache_base_dir and any(response and response.changed for response, _ in outcomes):
+            file_cache_dir = os.path.join(self.cache_base_dir, File.__name__)
+            if os.path.exists(file_cache_dir):
+                shutil.rmtree(file_cache_dir)
+
+        # Report every failure encountered in the order the files were provided
+        failures = [
+            f'{file_action.path}: {error}' if error.args else file_action.path
+            for file_action, (_response, error) in zip(self.file_actions, outcomes)
+            if error
+        ]
+        if len(failures) == 1:
+            raise ActionError(f'unable to process the path {failures[0]}')
+        elif failures:
+            raise ActionError(
+                f'unable to process {len(failures)} of {len(outcomes)} paths: ' +
+                '; '.join(failures)
+            )
+
+        results = [
+            {'path': response.data['path'], 'changed': response.changed}
+            for response, _error in outcomes
+        ]
+        changed = any(result['changed'] for result in results)
+        return self.changed(results=results) if changed else self.ok(results=results)
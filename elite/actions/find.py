@@ -1,12 +1,12 @@
 import grp
 import os
 import pwd
-from fnmatch import fnmatch
+import sqlite3
 
 from Foundation import NSURL, NSURLIsAliasFileKey  # pylint: disable=no-name-in-module
 
 from . import ActionError, FileAction
-from ..constants import FLAGS
+from ..libraries import alias, find
 
 
 class Find(FileAction):
@@ -19,11 +19,18 @@ class Find(FileAction):
     :param types: the types of files to return
     :param patterns: various glob patterns to match against
     :param aliases: whether to process macOS aliases
+    :param workers: the number of threads to scan directories with or None to scan sequentially
+    :param aggregate: an aggregation to return instead of the paths found (count, size,
+                      extensions, owners, newest or oldest)
+    :param limit: the number of paths to return for the newest and oldest aggregations
+    :param index: whether to maintain a persistent index of the path which speeds up repeated
+                  searches by only scanning directories which have changed since the last search
+                  (requires persistent caching to be enabled)
     """
 
     def __init__(
         self, path, min_depth=None, max_depth=None, types=None, patterns=None, aliases=True,
-        **kwargs
+        workers=None, aggregate=None, limit=10, index=False, **kwargs
     ):
         self.path = path
         self.min_depth = min_depth
@@ -31,8 +38,22 @@ class Find(FileAction):
         self.types = types
         self.patterns = patterns
         self.aliases = aliases
+        self.workers = workers
+        self.aggregate = aggregate
+        self.limit = limit
+        self.index = index
         super().__init__(**kwargs)
 
+    @property
+    def aggregate(self):
+        return self._aggregate
+
+    @aggregate.setter
+    def aggregate(self, aggregate):
+        if aggregate is not None and aggregate not in find.AGGREGATES:
+            raise ValueError(f'aggregate must be one of {", ".join(find.AGGREGATES)}')
+        self._aggregate = aggregate
+
     def process(self):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.path)
@@ -58,77 +79,78 @@ class Find(FileAction):
         else:
             gid = None
 
-        # Find all the paths with the filters provided and return them to the user
-        paths = self.walk(
-            path, path.count(os.sep), self.mode, uid, gid, self.flags,
-            self.min_depth, self.max_depth, self.types, self.patterns, self.aliases
-        )
-        return self.ok(paths=sorted(paths))
-
-    def walk(
-        self, path, root_depth, mode=None, uid=None, gid=None, flags=None, min_depth=None,
-        max_depth=None, types=None, patterns=None, aliases=True
-    ):
-        # Create a list to store all the files found
-        paths = []
-
-        # Walk through the base path provided using scandir (for speed)
-        for item in os.scandir(path):
-            # Determine the current depth
-            depth = item.path.count(os.sep) - root_depth
-
-            # Impose a maximum depth
-            if max_depth and depth > max_depth:
-                continue
-
-            # Determine the file type if a type filter is requested
-            if types:
-                if item.is_dir():
-                    file_type = 'directory'
-                elif item.is_symlink():
-                    file_type = 'symlink'
-                elif aliases:
-                    # Determine if the file is an alias
-                    url = NSURL.fileURLWithPath_(item.path)
-                    ok, is_alias, _error = url.getResourceValue_forKey_error_(
-                        None, NSURLIsAliasFileKey, None
-                    )
-                    file_type = 'alias' if ok and is_alias else 'file'
-                else:
-                    file_type = 'file'
-
-            # Determine the mode, owner, group and flags if requested
-            if mode is not None or uid is not None or gid is not None or flags:
-                stat = os.stat(item.path, follow_symlinks=False)
-
-                if mode is not None:
-                    mode_int = int(mode, 8)
-                    stat_mode_int = int(oct(stat.st_mode)[-4:], 8)
-
-                if flags:
-                    flags_bin = 0
-                    for flag in flags:
-                        if flag not in FLAGS:
-                            raise ActionError('the specified flag is unsupported')
-                        flags_bin |= FLAGS[flag]
-
-            # Determine if the current item should be added to our paths list based on filters
-            if (
-                (not min_depth or depth >= min_depth) and
-                (not types or file_type in types) and
-                (not patterns or any(fnmatch(item.path, p) for p in patterns)) and
-                (mode is None or stat_mode_int == mode_int) and
-                (uid is None or stat.st_uid == uid) and
-                (gid is None or stat.st_gid == gid) and
-                (not flags or stat.st_flags & flags_bin)
-            ):
-                paths.append(item.path)
-
-            # Recurse through directories
-            if item.is_dir() and not item.is_symlink():
-                paths.extend(self.walk(
-                    item.path, root_depth, mode, uid, gid, flags, min_depth, max_depth,
-                    types, patterns, aliases
-                ))
-
-        return paths
+        # Find all the entries with the filters provided
+        index = self.open_index() if self.index else None
+        try:
+            if index:
+                # Indexed paths are absolute so that searches from any directory may share them
+                path = os.path.abspath(path)
+                index.update(path, self.max_depth)
+                entries = index.walk(
+                    path, self.mode, uid, gid, self.flags, self.min_depth, self.max_depth,
+                    self.types, self.patterns, self.is_alias if self.aliases else None
+                )
+            else:
+                entries = find.walk(
+                    path, self.mode, uid, gid, self.flags, self.min_depth, self.max_depth,
+                    self.types, self.patterns, self.is_alias if self.aliases else None,
+                    self.workers
+                )
+
+            # Aggregate results as entries are found if requested
+            if self.aggregate:
+                return self.ok(**{
+                    self.aggregate: find.aggregate(entries, self.aggregate, self.limit)
+                })
+
+            # Return all the paths found to the user
+            return self.ok(paths=sorted(entry.path for entry in entries))
+        except ValueError as e:
+            raise ActionError(str(e))
+        except sqlite3.Error as e:
+            raise ActionError(f'unable to query the index: {e}')
+        finally:
+            if index:
+                index.close()
+
+    def open_index(self):
+        """
+        Opens the persistent index of directory trees.
+
+        :return: the index or None if persistent caching is disabled or the index couldn't be
+                 opened
+        """
+        if not self.persistent_cache_dir:
+            return None
+
+        index_path = os.path.join(self.persistent_cache_dir, 'index.sqlite')
+        try:
+            os.makedirs(self.persistent_cache_dir, exist_ok=True)
+            return find.Index(index_path)
+        except (OSError, sqlite3.Error):
+            pass
+
+        # The index is only an optimisation, so a damaged index is simply discarded
+        try:
+            os.remove(index_path)
+            return find.Index(index_path)
+        except (OSError, sqlite3.Error):
+            return None
+
+    def is_alias(self, path):
+        """
+        Determines whether a file is a macOS alias.
+
+        :param path: the path of the file
+
+        :return: a boolean indicating whether the file is an alias
+        """
+        # Determine if the file is an alias from its contents where possible, only falling back
+        # to the considerably slower Finder query when this can't be determined
+        is_bookmark_file = alias.is_bookmark_file(path)
+        if is_bookmark_file is not None:
+            return is_bookmark_file
+
+        url = NSURL.fileURLWithPath_(path)
+        ok, is_alias, _error = url.getResourceValue_forKey_error_(None, NSURLIsAliasFileKey, None)
+        return bool(ok and is_alias)
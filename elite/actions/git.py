@@ -1,6 +1,7 @@
 import os
 
-from . import FileAction
+from . import ActionError, FileAction
+from ..libraries.git_state import GitRepository, GitStateError
 
 
 class Git(FileAction):
@@ -24,23 +25,25 @@ class Git(FileAction):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.path)
 
+        # Read the state of any existing repository directly from its files so that git need
+        # only be run when something must change
+        try:
+            repository = GitRepository(path)
+            if repository.exists:
+                remote_url = repository.remote_url(self.remote)
+                branch = repository.branch()
+        except GitStateError as e:
+            raise ActionError(f'unable to check existing repository: {e}')
+
         # Check if the repository already exists in the destination path
-        if os.path.exists(os.path.join(path, '.git', 'config')):
-            # Verify that the existing repo originates from the same remote
-            git_remote_proc = self.run(
-                ['git', 'remote', 'get-url', self.remote],
-                fail_error='unable to check existing remote'
-            )
-
-            if git_remote_proc.stdout.rstrip() == self.repo:
-                # Verify that the existing repo is on the correct branch
-                git_branch_proc = self.run(
-                    ['git', 'symbolic-ref', '--short', 'HEAD'], cwd=path, stdout=True,
-                    fail_error='unable to check existing repository branch'
-                )
+        if repository.exists:
+            if remote_url is None:
+                raise ActionError('unable to check existing remote')
 
+            # Verify that the existing repo originates from the same remote
+            if remote_url == self.repo:
                 # Currently checked out repo is on the correct branch
-                if git_branch_proc.stdout.rstrip() == self.branch:
+                if branch == self.branch:
                     return self.ok()
                 # Checked out repo is on the wrong branch and must be switched
                 else:
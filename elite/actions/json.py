@@ -2,7 +2,24 @@ import json as jsonlib
 import os
 
 from . import ActionError, FileAction
-from ..utils import deep_equal, deep_merge
+from ..utils import LIST_MERGE_STRATEGIES, apply_changes, deep_diff
+
+
+def load_json(path):
+    """
+    Loads a JSON file or creates a fresh data structure if it doesn't exist.
+
+    :param path: the path of the JSON file
+
+    :return: the contents of the JSON file
+    """
+    try:
+        with open(path, 'r') as fp:
+            return jsonlib.load(fp)
+    except OSError:
+        return {}
+    except jsonlib.JSONDecodeError:
+        raise ActionError('an invalid JSON file already exists')
 
 
 class JSON(FileAction):
@@ -12,43 +29,52 @@ class JSON(FileAction):
     :param path: the full path of the JSON file to manipulate
     :param values: a dictionary containing the data to be incorporated into the config
     :param indent: the indentation level of the written JSON file
+    :param list_merge: how lists in the values are merged with existing lists (replace, append
+                       or prepend)
     """
 
-    def __init__(self, path, values, indent=2, **kwargs):
+    uses_document_store = True
+
+    def __init__(self, path, values, indent=2, list_merge='replace', **kwargs):
         self.path = path
         self.values = values
         self.indent = indent
+        self.list_merge = list_merge
         super().__init__(**kwargs)
 
+    @property
+    def list_merge(self):
+        return self._list_merge
+
+    @list_merge.setter
+    def list_merge(self, list_merge):
+        if list_merge not in LIST_MERGE_STRATEGIES:
+            raise ValueError('list_merge must be replace, append or prepend')
+        self._list_merge = list_merge
+
     def process(self):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.path)
 
         # Load the JSON or create a fresh data structure if it doesn't exist
-        try:
-            with open(path, 'r') as fp:
-                json = jsonlib.load(fp)
-        except OSError:
-            json = {}
-        except jsonlib.JSONDecodeError:
-            raise ActionError('an invalid JSON file already exists')
+        json = self.load_document(path, load_json)
 
-        # Check if the current JSON is the same as the values provided
-        if deep_equal(self.values, json):
+        # Check if the current JSON already contains the values provided
+        changes = deep_diff(self.values, json, list_merge=self.list_merge)
+        if not changes:
             changed = self.set_file_attributes(path)
             return self.changed(path=path) if changed else self.ok(path=path)
 
         # Update the JSON with the values provided
-        deep_merge(self.values, json)
+        apply_changes(json, changes)
 
-        # Write the updated JSON file
+        # Write the updated JSON file with a new line at the end of the file
+        indent = self.indent
         try:
-            with open(path, 'w') as fp:
-                jsonlib.dump(json, fp, indent=self.indent)
-                # Add a new line at the end of the file
-                print(file=fp)
-
+            self.save_document(
+                path, json, lambda data: (jsonlib.dumps(data, indent=indent) + '\n').encode()
+            )
             self.set_file_attributes(path)
-            return self.changed(path=path)
+            return self.changed(path=path, changed_keys=[change.path for change in changes])
         except OSError:
             raise ActionError('unable to update the requested JSON file')
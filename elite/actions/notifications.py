@@ -8,6 +8,23 @@ def get_ncprefs_plist_path():
     return os.path.expanduser('~/Library/Preferences/com.apple.ncprefs.plist')
 
 
+def load_ncprefs_plist(path):
+    """
+    Loads the notification center preferences.
+
+    :param path: the path of the notification center preferences plist
+
+    :return: the contents of the notification center preferences plist
+    """
+    try:
+        with open(path, 'rb') as fp:
+            return plistlib.load(fp)
+    except OSError:
+        raise ActionError('unable to find the notification center preferences file')
+    except plistlib.InvalidFileException:
+        raise ActionError('unable to parse notification center preferences')
+
+
 class Notifications(FileAction):
     """
     Configures notifications for a particular application.
@@ -20,6 +37,8 @@ class Notifications(FileAction):
     :param sound: whether to play a sound for notifications
     """
 
+    uses_document_store = True
+
     def __init__(
         self, path, alert_style=None, lock_screen=None, notification_center=None,
         badge_app_icon=None, sound=None, **kwargs
@@ -48,13 +67,7 @@ class Notifications(FileAction):
         ncprefs_plist_path = get_ncprefs_plist_path()
 
         # Read the existing notification center preferences
-        try:
-            with open(ncprefs_plist_path, 'rb') as fp:
-                ncprefs_plist = plistlib.load(fp)
-        except OSError:
-            raise ActionError('unable to find the notification center preferences file')
-        except plistlib.InvalidFileException:
-            raise ActionError('unable to parse notification center preferences')
+        ncprefs_plist = self.load_document(ncprefs_plist_path, load_ncprefs_plist)
 
         # Search for the requested app and obtain its current flags
         try:
@@ -130,8 +143,7 @@ class Notifications(FileAction):
         app['flags'] = flags
 
         try:
-            with open(ncprefs_plist_path, 'wb') as fp:
-                plistlib.dump(ncprefs_plist, fp)
+            self.save_document(ncprefs_plist_path, ncprefs_plist, plistlib.dumps)
 
             # The rebuild was successful
             self.set_file_attributes(ncprefs_plist_path)
@@ -5,6 +5,8 @@ import urllib.parse
 from xml.etree import ElementTree
 
 from . import Action, ActionError
+from ..libraries import xar
+from ..libraries.receipts import ReceiptsIndex
 
 
 class Package(Action):
@@ -14,17 +16,37 @@ class Package(Action):
     :param path: the path of the package to work with
     :param choices: a dictionary containing any choice overrides during installation
     :param target: the target path to install into
+    :param upgrade: whether to install the package when it contains newer versions of the
+                    components that are already installed
     """
 
     # The locations to search for receipts
     receipts_dirs = ['/System/Library/Receipts', '/private/var/db/receipts']
 
-    def __init__(self, path, choices=None, target='/', **kwargs):
+    # The receipts index which is shared by all package actions during a run
+    _receipts_index = None
+
+    def __init__(self, path, choices=None, target='/', upgrade=False, **kwargs):
         self.path = path
         self.choices = choices
         self.target = target
+        self.upgrade = upgrade
         super().__init__(**kwargs)
 
+    @classmethod
+    def receipts_index(cls):
+        """
+        Obtains the receipts index, building it when first used, when the dirs change or when
+        receipts have been added or removed since (e.g. by another installer).
+        """
+        if (
+            cls._receipts_index is None or
+            cls._receipts_index.receipts_dirs != cls.receipts_dirs or
+            cls._receipts_index.stale()
+        ):
+            cls._receipts_index = ReceiptsIndex(cls.receipts_dirs)
+        return cls._receipts_index
+
     def process(self):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.path)
@@ -37,6 +59,65 @@ class Package(Action):
         if os.geteuid() != 0:
             raise ActionError('package installers must be run with root privileges')
 
+        # Obtain the identifiers contained in the package, avoiding extraction of the package
+        # metadata if the package has been examined previously
+        package_signature = xar.signature(path)
+        identifiers = self.persistent_cache_get(package_signature) if package_signature else None
+        if identifiers is None:
+            identifiers = self.identifiers(path)
+            if package_signature:
+                self.persistent_cache_set(package_signature, identifiers)
+
+        # Determine if all bundle id identifiers are installed on the system (and up to date
+        # if upgrades were requested)
+        receipts_index = self.receipts_index()
+        package_installed = all(
+            identifier in receipts_index and
+            not (self.upgrade and receipts_index.outdated(identifier, version))
+            for identifier, version in identifiers.items()
+        )
+
+        # The package was fully installed on the system so we don't need to run the installer
+        if package_installed:
+            return self.ok()
+
+        installer_command = ['installer']
+
+        # If choices have been provided, we must create a temporary plist file and pass
+        # it to the installer
+        if self.choices:
+            # Create a temporary plist for use in providing choices to the installer
+            _choices_plist_fd, choices_plist_path = tempfile.mkstemp()
+            with open(choices_plist_path, 'wb') as fp:
+                plistlib.dump(self.choices, fp)
+
+            # Pass the path of the choices plist to the installer command
+            installer_command.extend(['-applyChoiceChangesXML', choices_plist_path])
+
+        # Specify the package and target
+        installer_command.extend(['-package', path, '-target', self.target])
+
+        # Run the installer
+        try:
+            self.run(installer_command, fail_error='unable to install the requested package')
+        finally:
+            # Ensure that the temporary choices plist file is cleaned up
+            if self.choices:
+                os.remove(choices_plist_path)
+
+        # The installer may have added receipts for components beyond those in the package, so
+        # the index is rebuilt when next required
+        type(self)._receipts_index = None
+        return self.changed()
+
+    def identifiers(self, path):
+        """
+        Extracts the package metadata to determine the components contained in the package.
+
+        :param path: the path of the package to examine
+
+        :return: a dict mapping each bundle id identifier to its version
+        """
         # Create a temporary directory to store our package metadata in
         package_extract_dir = tempfile.mkdtemp()
 
@@ -57,8 +138,8 @@ class Package(Action):
                 'unable to find a Distribution or PackageInfo file in the root of the package'
             )
 
-        # Create a list to store all identifiers found
-        identifiers = []
+        # Create a dict to store all identifiers found along with their versions
+        identifiers = {}
 
         # Determine the full path of the Distribution file being referenced
         distribution = os.path.join(package_extract_dir, 'Distribution')
@@ -113,62 +194,13 @@ class Package(Action):
                     'unable to parse the PackageInfo XML contained in the package'
                 )
 
-            # Append the associated bundle id (identifier) to our list of identifiers
+            # Add the associated bundle id (identifier) and version to our identifiers
             try:
-                identifiers.append(root.attrib['identifier'])
+                identifiers[root.attrib['identifier']] = root.attrib.get('version')
             except KeyError:
                 raise ActionError('unable to determine bundle id identifier for package')
 
         if not identifiers:
             raise ActionError('unable to find any installable components for this package')
 
-        # Determine if all bundle id identifiers are installed on the system
-        package_installed = True
-
-        for identifier in identifiers:
-            # We start by assuming the identifier is not installed
-            identifier_installed = False
-
-            # Search for the identifier plist and bom in the available receipts directories
-            # to verify if it is installed or not
-            for receipts_dir in self.receipts_dirs:
-                if (
-                    os.path.exists(os.path.join(receipts_dir, f'{identifier}.plist')) and
-                    os.path.exists(os.path.join(receipts_dir, f'{identifier}.bom'))
-                ):
-                    identifier_installed = True
-                    break
-
-            # All identifiers must be installed for the package to be considered installed
-            package_installed = package_installed and identifier_installed
-            if not package_installed:
-                break
-
-        # The package was fully installed on the system so we don't need to run the installer
-        if package_installed:
-            return self.ok()
-
-        installer_command = ['installer']
-
-        # If choices have been provided, we must create a temporary plist file and pass
-        # it to the installer
-        if self.choices:
-            # Create a temporary plist for use in providing choices to the installer
-            _choices_plist_fd, choices_plist_path = tempfile.mkstemp()
-            with open(choices_plist_path, 'wb') as fp:
-                plistlib.dump(self.choices, fp)
-
-            # Pass the path of the choices plist to the installer command
-            installer_command.extend(['-applyChoiceChangesXML', choices_plist_path])
-
-        # Specify the package and target
-        installer_command.extend(['-package', path, '-target', self.target])
-
-        # Run the installer
-        try:
-            self.run(installer_command, fail_error='unable to install the requested package')
-        finally:
-            # Ensure that the temporary choices plist file is cleaned up
-            if self.choices:
-                os.remove(choices_plist_path)
-        return self.changed()
+        return identifiers
@@ -3,6 +3,7 @@ import plistlib
 import tempfile
 
 from . import Action, ActionError
+from ..libraries import xar
 
 
 class PackageChoices(Action):
@@ -24,22 +25,33 @@ class PackageChoices(Action):
         if not os.path.isfile(path):
             raise ActionError('unable to find a file with the path provided')
 
+        # Return the choices determined previously if the package hasn't changed since
+        package_signature = xar.signature(path)
+        choices = self.persistent_cache_get(package_signature) if package_signature else None
+        if choices is not None:
+            return self.ok(choices=choices)
+
         # Create a temporary plist for use in determining the installer choices
-        _empty_plist_fd, empty_plist_name = tempfile.mkstemp()
-        with open(empty_plist_name, 'wb') as f:
-            plistlib.dump([], f)
-
-        # Obtain all installer choices as a plist
-        choices_proc = self.run(
-            [
-                'installer',
-                '-showChoicesAfterApplyingChangesXML', empty_plist_name,
-                '-package', path,
-                '-target', '/'
-            ],
-            stdout=True,
-            fail_error='unable to obtain installer information for the path provided'
-        )
+        empty_plist_fd, empty_plist_path = tempfile.mkstemp()
+
+        try:
+            with os.fdopen(empty_plist_fd, 'wb') as fp:
+                plistlib.dump([], fp)
+
+            # Obtain all installer choices as a plist
+            choices_proc = self.run(
+                [
+                    'installer',
+                    '-showChoicesAfterApplyingChangesXML', empty_plist_path,
+                    '-package', path,
+                    '-target', '/'
+                ],
+                stdout=True,
+                fail_error='unable to obtain installer information for the path provided'
+            )
+        finally:
+            # Ensure that the temporary plist file is cleaned up
+            os.remove(empty_plist_path)
 
         # Split the lines and crop output to only include the plist
         # (sometimes the installer command includes extra lines before the plist)
@@ -62,4 +74,7 @@ class PackageChoices(Action):
         except (ValueError, IndexError, plistlib.InvalidFileException):
             raise ActionError('unable to parse installer command output')
 
+        if package_signature:
+            self.persistent_cache_set(package_signature, choices)
+
         return self.ok(choices=choices)
@@ -2,7 +2,45 @@ import os
 import plistlib
 
 from . import ActionError, FileAction
-from ..utils import deep_equal, deep_merge
+from ..libraries import bplist
+from ..utils import LIST_MERGE_STRATEGIES, apply_changes, deep_diff
+
+
+# Binary plists of at least this size are memory mapped and only decoded as their values are
+# compared, rather than being parsed in full
+LAZY_PLIST_SIZE = 1024 * 1024
+
+
+def load_plist(path):
+    """
+    Loads a plist or creates a fresh data structure if it doesn't exist. Large binary plists
+    are loaded lazily.
+
+    :param path: the path of the plist
+
+    :return: the contents of the plist
+    """
+    try:
+        if os.path.getsize(path) >= LAZY_PLIST_SIZE and bplist.is_binary(path):
+            return bplist.load(path)
+
+        with open(path, 'rb') as fp:
+            return plistlib.load(fp)
+    except OSError:
+        return {}
+    except (plistlib.InvalidFileException, bplist.BinaryPlistError):
+        raise ActionError('an invalid plist already exists')
+
+
+def detect_plist_format(path):
+    """
+    Determines the format of a plist (new plists are written as xml).
+
+    :param path: the path of the plist
+
+    :return: binary if the plist exists in the binary format or xml otherwise
+    """
+    return 'binary' if bplist.is_binary(path) else 'xml'
 
 
 class Plist(FileAction):
@@ -14,11 +52,17 @@ class Plist(FileAction):
     :param domain: the app domain name of the plist to manipulate
     :param container: the sandbox container name of the plist to manipulate
     :param source: the path of an additional plist file to incorporate with the values provided
-    :param fmt: the format of the plist file to write (xml or binary)
+    :param fmt: the format of the plist file to write (xml or binary) or None to preserve the
+                format of an existing plist (new plists are written as xml)
+    :param list_merge: how lists in the values are merged with existing lists (replace, append
+                       or prepend)
     """
 
+    uses_document_store = True
+
     def __init__(
-        self, values, path=None, domain=None, container=None, source=None, fmt='xml', **kwargs
+        self, values, path=None, domain=None, container=None, source=None, fmt=None,
+        list_merge='replace', **kwargs
     ):
         self._path = path
         self._domain = domain
@@ -30,6 +74,7 @@ class Plist(FileAction):
         self.container = container
         self.source = source
         self.fmt = fmt
+        self.list_merge = list_merge
         super().__init__(**kwargs)
 
     @property
@@ -82,10 +127,20 @@ class Plist(FileAction):
 
     @fmt.setter
     def fmt(self, fmt):
-        if fmt not in ['xml', 'binary']:
-            raise ValueError('fmt must be xml or binary')
+        if fmt not in [None, 'xml', 'binary']:
+            raise ValueError('fmt must be xml, binary or None')
         self._fmt = fmt
 
+    @property
+    def list_merge(self):
+        return self._list_merge
+
+    @list_merge.setter
+    def list_merge(self, list_merge):
+        if list_merge not in LIST_MERGE_STRATEGIES:
+            raise ValueError('list_merge must be replace, append or prepend')
+        self._list_merge = list_merge
+
     def determine_plist_path(self):
         """Determine the path of the plist using the domain or container provided."""
         if self.domain:
@@ -105,20 +160,12 @@ class Plist(FileAction):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.determine_plist_path())
 
-        # Set the fmt of the output file
-        if self.fmt == 'xml':
-            fmt = plistlib.FMT_XML  # pylint: disable=no-member
-        else:
-            fmt = plistlib.FMT_BINARY  # pylint: disable=no-member
-
         # Load the plist or create a fresh data structure if it doesn't exist
-        try:
-            with open(path, 'rb') as fp:
-                plist = plistlib.load(fp)
-        except OSError:
-            plist = {}
-        except plistlib.InvalidFileException:
-            raise ActionError('an invalid plist already exists')
+        plist = self.load_document(path, load_plist, detect_plist_format)
+
+        # Set the fmt of the output file, preserving the format of an existing file by default
+        # (including any update of the file which hasn't been written yet)
+        fmt = self.fmt or self.document_format(path, detect_plist_format)
 
         values = self.values
 
@@ -137,20 +184,38 @@ class Plist(FileAction):
             except plistlib.InvalidFileException:
                 raise ActionError('the source file is an invalid plist')
 
-        # Check if the current plist is the same as the values provided
-        if deep_equal(values, plist):
+        # Check if the current plist already contains the values provided
+        try:
+            changes = deep_diff(values, plist, list_merge=self.list_merge)
+        except bplist.BinaryPlistError:
+            raise ActionError('an invalid plist already exists')
+
+        if not changes:
             changed = self.set_file_attributes(path)
             return self.changed(path=path) if changed else self.ok(path=path)
 
+        # Lazily loaded plists are read-only so they must be parsed in full before being updated
+        if isinstance(plist, bplist.LazyDict):
+            try:
+                with open(path, 'rb') as fp:
+                    plist = plistlib.load(fp)
+            except (OSError, plistlib.InvalidFileException):
+                raise ActionError('an invalid plist already exists')
+
         # Update the plist with the values provided
-        deep_merge(values, plist)
+        apply_changes(plist, changes)
 
         # Write the updated plist
         try:
-            with open(path, 'wb') as fp:
-                plistlib.dump(plist, fp, fmt=fmt)
+            if fmt == 'binary':
+                plist_fmt = plistlib.FMT_BINARY  # pylint: disable=no-member
+            else:
+                plist_fmt = plistlib.FMT_XML  # pylint: disable=no-member
 
+            self.save_document(
+                path, plist, lambda data: plistlib.dumps(data, fmt=plist_fmt), fmt
+            )
             self.set_file_attributes(path)
-            return self.changed(path=path)
+            return self.changed(path=path, changed_keys=[change.path for change in changes])
         except OSError:
             raise ActionError('unable to update the requested plist')
@@ -1,7 +1,42 @@
-import ast
 import os
+import re
+import subprocess
+import tempfile
+import time
+from collections import Counter
 
-from . import Action
+from . import Action, ActionError
+from ..libraries import tree_sync
+
+
+# The rsync options which are supported by the native backend
+NATIVE_OPTIONS = {
+    '--delete': 'delete',
+    '--checksum': 'checksum',
+    '-c': 'checksum'
+}
+
+# The output we want from rsync is the operation and filename of each affected file
+RSYNC_OUT_FORMAT = '%o %n'
+
+# The number of seconds between each progress update while rsync is running
+RSYNC_PROGRESS_INTERVAL = 0.25
+
+# rsync escapes characters in filenames which can't be printed (such as newlines) along with
+# any backslash which could be mistaken for such an escape using the form \#ooo
+RSYNC_ESCAPE_RE = re.compile(rb'\\#([0-7]{3})')
+
+
+def unescape_filename(filename):
+    """
+    Restores characters in a filename which were escaped in the output of rsync.
+
+    :param filename: the filename as output by rsync in bytes
+
+    :return: the original filename
+    """
+    filename = RSYNC_ESCAPE_RE.sub(lambda match: bytes([int(match.group(1), 8)]), filename)
+    return os.fsdecode(filename)
 
 
 class Rsync(Action):
@@ -13,21 +48,88 @@ class Rsync(Action):
     :param executable: a custom path to the rsync executable
     :param archive: whether or not to enable the rsync archive flag
     :param options: additional command-line options that should be using with rsync
+    :param max_changes: the maximum number of changes to report (further changes are only
+                        counted) or None (the default) to report every change
+    :param backend: the engine used to sync (rsync or native which syncs in-process and
+                    supports the archive flag along with the --delete and --checksum options)
+    :param workers: the number of threads used to scan and copy files by the native backend or
+                    None to use the default
     """
 
-    def __init__(self, path, source, executable=None, archive=True, options=None, **kwargs):
+    def __init__(
+        self, path, source, executable=None, archive=True, options=None, max_changes=None,
+        backend='rsync', workers=None, **kwargs
+    ):
+        self._backend = backend
         self.path = path
         self.source = source
         self.executable = executable
         self.archive = archive
         self.options = options
+        self.max_changes = max_changes
+        self.backend = backend
+        self.workers = workers
         super().__init__(**kwargs)
 
+    @property
+    def archive(self):
+        return self._archive
+
+    @archive.setter
+    def archive(self, archive):
+        if not archive and self.backend == 'native':
+            raise ValueError('the native backend requires the archive flag')
+        self._archive = archive
+
+    @property
+    def options(self):
+        return self._options
+
+    @options.setter
+    def options(self, options):
+        if options and self.backend == 'native' and not set(options) <= set(NATIVE_OPTIONS):
+            raise ValueError(
+                'the native backend only supports the --delete and --checksum options'
+            )
+        self._options = options
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        if backend not in ['rsync', 'native']:
+            raise ValueError('backend must be rsync or native')
+        if backend == 'native' and not self.archive:
+            raise ValueError('the native backend requires the archive flag')
+        if (
+            backend == 'native' and self.options and
+            not set(self.options) <= set(NATIVE_OPTIONS)
+        ):
+            raise ValueError(
+                'the native backend only supports the --delete and --checksum options'
+            )
+        self._backend = backend
+
+    @property
+    def max_changes(self):
+        return self._max_changes
+
+    @max_changes.setter
+    def max_changes(self, max_changes):
+        if max_changes is not None and (not isinstance(max_changes, int) or max_changes < 0):
+            raise ValueError('max_changes must be a non-negative integer or None')
+        self._max_changes = max_changes
+
     def process(self):
         # Ensure that home directories are taken into account
         path = os.path.expanduser(self.path)
         source = os.path.expanduser(self.source)
 
+        if self.backend == 'native':
+            return self.process_native(path, source)
+
         # Determine the rsync executable
         executable = self.executable if self.executable else 'rsync'
 
@@ -40,21 +142,106 @@ class Rsync(Action):
         # Add any additional user provided options
         options_list.extend(self.options if self.options else [])
 
-        # The output we want from rsync is a tuple containing the operation and filename of
-        # each affected file
-        options_list.append("--out-format=('%o', '%n')")
+        # Each affected file is output on its own line (filenames containing newlines are
+        # escaped by rsync)
+        options_list.append(f'--out-format={RSYNC_OUT_FORMAT}')
+
+        command = [executable] + options_list + [source, path]
+
+        counts = Counter()
+        changes = []
+        last_progress = time.monotonic()
+
+        # Run rsync to sync the files requested, consuming its output as it is produced so that
+        # large syncs needn't be held in memory (errors are written to a temporary file so that
+        # they can't block rsync while we read its output)
+        with tempfile.TemporaryFile() as stderr:
+            try:
+                rsync_proc = subprocess.Popen(
+                    command, stdout=subprocess.PIPE, stderr=stderr, preexec_fn=self.preexec_fn
+                )
+            except FileNotFoundError:
+                raise ActionError(f'unable to find executable for command {command}')
+
+            with rsync_proc:
+                for line in rsync_proc.stdout:
+                    operation, _, filename = line.rstrip(b'\n').partition(b' ')
+                    if not operation:
+                        continue
+
+                    operation = operation.decode('utf-8', 'replace')
+                    counts[operation] += 1
+                    if self.max_changes is None or len(changes) < self.max_changes:
+                        changes.append((operation, unescape_filename(filename)))
+
+                    # Report progress periodically rather than for every file
+                    if time.monotonic() - last_progress >= RSYNC_PROGRESS_INTERVAL:
+                        self.progress(f'{sum(counts.values())} files processed')
+                        last_progress = time.monotonic()
+
+            if rsync_proc.returncode != 0:
+                stderr.seek(0)
+                error = stderr.read().decode('utf-8', 'replace').rstrip()
+                if error:
+                    raise ActionError(f'rsync failed to sync the requested source to path: {error}')
+                raise ActionError('rsync failed to sync the requested source to path')
+
+        return self.respond(changes, counts)
+
+    def process_native(self, path, source):
+        """
+        Syncs the source to the path in-process, comparing both trees in parallel rather than
+        starting rsync.
+
+        :param path: the destination path
+        :param source: the source path to syncronise
+
+        :return: the response of the action
+        """
+        if not os.path.isdir(source):
+            raise ActionError('the native backend may only sync a source directory')
+
+        # Like rsync, a source without a trailing slash is synced into a directory of the same
+        # name within the path rather than its contents being synced to the path itself
+        prefix = ''
+        if not source.endswith(os.sep):
+            prefix = os.path.basename(source) + '/'
+            path = os.path.join(path, os.path.basename(source))
+
+        options = {NATIVE_OPTIONS[option] for option in self.options or []}
+
+        try:
+            created = not os.path.isdir(path)
+            sync_changes = tree_sync.sync(
+                source, path, delete='delete' in options, checksum='checksum' in options,
+                preserve_owner=os.geteuid() == 0, workers=self.workers
+            )
+        except OSError as e:
+            raise ActionError(f'unable to sync the requested source to path: {e}')
+
+        changes = [(operation, prefix + filename) for operation, filename in sync_changes]
+        if prefix and created:
+            changes.insert(0, ('send', prefix))
+
+        counts = Counter(operation for operation, _filename in changes)
+        if self.max_changes is not None:
+            changes = changes[:self.max_changes]
+
+        return self.respond(changes, counts)
+
+    def respond(self, changes, counts):
+        """
+        Builds the response of the action from the changes made.
 
-        # Run rsync to sync the files requested
-        rsync_proc = self.run(
-            [executable] + options_list + [source, path], stdout=True,
-            fail_error='rsync failed to sync the requested source to path'
-        )
+        :param changes: a list of tuples containing the operation and filename of each change
+                        reported
+        :param counts: a counter of the total number of changes made per operation
 
-        # Obtain rsync output and check to see if any changes were made
-        rsync_output = rsync_proc.stdout.strip()
-        if not rsync_output:
+        :return: the response of the action
+        """
+        # Check to see if any changes were made
+        if not counts:
             return self.ok()
 
         # Changes were found and must be reported to the user
-        changes = [ast.literal_eval(c) for c in rsync_output.split('\n')]
-        return self.changed(changes=changes)
+        return self.changed(changes=changes, counts=dict(counts))
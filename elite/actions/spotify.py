@@ -1,7 +1,7 @@
 import os
 
 from . import ActionError, FileAction
-from ..utils import deep_equal, deep_merge
+from ..utils import apply_changes, deep_diff
 
 
 def convert_to_spotify_value(value):
@@ -27,6 +27,41 @@ def convert_from_spotify_value(value):
             raise ActionError(f'an unexpected value ({value}) was encountered')
 
 
+def load_spotify_prefs(path):
+    """
+    Loads Spotify prefs or creates a fresh data structure if they don't exist.
+
+    :param path: the path of the Spotify prefs file
+
+    :return: a dict containing the Spotify prefs
+    """
+    prefs = {}
+    try:
+        with open(path, 'r') as fp:
+            for line in fp.readlines():
+                pref, value = line.rstrip().split('=', 1)
+                prefs[pref] = convert_from_spotify_value(value)
+    except ValueError:
+        raise ActionError('unable to parse existing Spotify configuration')
+    except OSError:
+        pass
+
+    return prefs
+
+
+def dump_spotify_prefs(prefs):
+    """
+    Serialises Spotify prefs into the format used in the Spotify prefs file.
+
+    :param prefs: a dict containing the Spotify prefs
+
+    :return: the contents of the Spotify prefs file
+    """
+    return ''.join(
+        f'{pref}={convert_to_spotify_value(value)}\n' for pref, value in prefs.items()
+    ).encode()
+
+
 class Spotify(FileAction):
     """
     Provides the ability to manipulate Spotify configuration files.
@@ -35,6 +70,8 @@ class Spotify(FileAction):
     :param username: the username of the user to manipulate config files for
     """
 
+    uses_document_store = True
+
     def __init__(self, values, username=None, **kwargs):
         self.values = values
         self.username = username
@@ -52,32 +89,26 @@ class Spotify(FileAction):
         path = os.path.expanduser(self.determine_pref_path())
 
         # Load the Spotify prefs or create a fresh data structure if it doesn't exist
-        prefs = {}
-        try:
-            with open(path, 'r') as fp:
-                for line in fp.readlines():
-                    pref, value = line.rstrip().split('=', 1)
-                    prefs[pref] = convert_from_spotify_value(value)
-        except ValueError:
-            raise ActionError('unable to parse existing Spotify configuration')
-        except OSError:
-            pass
+        prefs = self.load_document(path, load_spotify_prefs)
 
-        # Check if the current prefs are the same as the values provided
-        if deep_equal(self.values, prefs):
+        # Check if the current prefs already contain the values provided
+        changes = deep_diff(self.values, prefs)
+        if not changes:
             changed = self.set_file_attributes(path)
             return self.changed(path=path) if changed else self.ok(path=path)
 
-        # Update the JSON with the values provided
-        deep_merge(self.values, prefs)
+        # Ensure that the values provided are supported before updating the prefs, as the
+        # write may be deferred
+        for value in self.values.values():
+            convert_to_spotify_value(value)
+
+        # Update the prefs with the values provided
+        apply_changes(prefs, changes)
 
         # Write the updated Spotify config
         try:
-            with open(path, 'w') as fp:
-                for pref, value in prefs.items():
-                    print(f'{pref}={convert_to_spotify_value(value)}', file=fp)
-
+            self.save_document(path, prefs, dump_spotify_prefs)
             self.set_file_attributes(path)
-            return self.changed(path=path)
+            return self.changed(path=path, changed_keys=[change.path for change in changes])
         except OSError:
             raise ActionError('unable to update the Spotify config file file')
@@ -15,6 +15,7 @@ ENDC = '\x1b[0m'
 
 # Other Escape Sequences
 CLEAR_LINE = '\x1b[0K'
+CLEAR_SCREEN_DOWN = '\x1b[0J'
 HIDE_CURSOR = '\x1b[?25l'
 SHOW_CURSOR = '\x1b[?25h'
 
@@ -19,8 +19,9 @@ def automate():
                 # Header
                 printer.header()
 
-                # Run the main Elite entrypoint
+                # Run the main Elite entrypoint and write any outstanding file updates
                 main(elite, printer)
+                elite.flush_documents()
 
                 # Summary
                 printer.heading('Summary')
@@ -39,6 +40,9 @@ def automate():
 
             # An action failed to run
             except EliteError:
+                # Write the file updates of the actions which completed
+                elite.flush_documents(ignore_failed=True)
+
                 # Summary
                 printer.heading('Summary')
                 elite.summary()
@@ -51,6 +55,8 @@ def automate():
                 print(
                     f'{ansi.RED}Processing aborted as requested by keyboard interrupt.{ansi.ENDC}'
                 )
+                elite.flush_documents(ignore_failed=True)
+
                 # Summary
                 printer.heading('Summary')
                 elite.summary()
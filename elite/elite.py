@@ -12,9 +12,11 @@ from .actions.brew_update import BrewUpdate
 from .actions.cask import Cask
 from .actions.dock import Dock
 from .actions.download import Download
+from .actions.downloads import Downloads
 from .actions.fail import Fail
 from .actions.file import File
 from .actions.file_info import FileInfo
+from .actions.files import Files
 from .actions.find import Find
 from .actions.gem import Gem
 from .actions.git import Git
@@ -35,6 +37,7 @@ from .actions.run import Run
 from .actions.spotify import Spotify
 from .actions.system_setup import SystemSetup
 from .actions.tap import Tap
+from .libraries.documents import DocumentStore
 
 
 EliteResponse = namedtuple(
@@ -127,6 +130,9 @@ class Elite:
         # Register the core actions provided with Elite
         self._register_core_actions()
 
+        # Configuration files are parsed once and written once when shared by multiple actions
+        self.document_store = DocumentStore()
+
         # Capture action information for the final summary
         self.completed_actions = {
             EliteState.OK: [],
@@ -142,6 +148,10 @@ class Elite:
     def cache_base_dir(self):
         return os.path.expanduser('~/.cache/elite')
 
+    @property
+    def persistent_cache_base_dir(self):
+        return os.path.expanduser('~/Library/Caches/elite')
+
     def register_action(self, action_name, action_class):
         """
         Registers a new action given its name and class.
@@ -163,9 +173,11 @@ class Elite:
         self.register_action('cask', Cask)
         self.register_action('dock', Dock)
         self.register_action('download', Download)
+        self.register_action('downloads', Downloads)
         self.register_action('fail', Fail)
         self.register_action('file', File)
         self.register_action('file_info', FileInfo)
+        self.register_action('files', Files)
         self.register_action('find', Find)
         self.register_action('go', Go)
         self.register_action('gem', Gem)
@@ -200,8 +212,37 @@ class Elite:
             os.setegid(self.user_gid)
             os.seteuid(self.user_uid)
 
+    def flush_documents(self, ignore_failed=None):
+        """
+        Writes any configuration files which were updated by actions but haven't been written
+        yet.  Files which couldn't be written are displayed and recorded as failures.
+
+        :param ignore_failed: whether to continue after a failure or None to use the current
+                              options
+        """
+        failures = self.document_store.flush()
+        if not failures:
+            return
+
+        for path, error in failures:
+            args = {'path': path}
+            elite_response = EliteResponse(
+                changed=False, ok=False, failed_message=f'unable to write the file: {error}'
+            )
+            self.printer.action(EliteState.RUNNING, 'write', args)
+            self.printer.action(EliteState.FAILED, 'write', args, elite_response)
+            self.completed_actions[EliteState.FAILED].append(('write', args, elite_response))
+
+        if ignore_failed is None:
+            ignore_failed = self.current_options.ignore_failed
+        if not ignore_failed:
+            raise EliteError(elite_response.failed_message)
+
     @contextmanager
     def options(self, sudo=False, changed=None, ignore_failed=None, env=None):
+        # Files updated outside the block are written with the permissions they were updated with
+        self.flush_documents()
+
         # Switch to root if necessary and update options to the current values
         if sudo:
             self._switch_to_root()
@@ -218,6 +259,9 @@ class Elite:
 
         yield
 
+        # Write files updated during the block before the permissions are reverted
+        self.flush_documents()
+
         # Revert back to user permissions and reset options
         self._switch_to_user(currently_root=sudo)
         self.current_options = Options(
@@ -247,12 +291,22 @@ class Elite:
             # Print progress to indicate we have started running the action
             self.printer.action(EliteState.RUNNING, action_name, kwargs)
 
-            # Run the requested action
+            # Actions which don't use the document store (e.g. running a command) must observe
+            # the files updated by previous actions
             Action = self.actions[action_name]  # noqa: N806
+            if not Action.uses_document_store:
+                self.flush_documents()
+
+            # Run the requested action
             action = Action(
                 *args, **kwargs,
                 cache_base_dir=self.cache_base_dir,
-                preexec_fn=demote(self.current_options.uid, self.current_options.gid)
+                persistent_cache_base_dir=self.persistent_cache_base_dir,
+                preexec_fn=demote(self.current_options.uid, self.current_options.gid),
+                document_store=self.document_store,
+                progress_fn=lambda message: self.printer.action(
+                    EliteState.RUNNING, action_name, kwargs, progress=message
+                )
             )
 
             try:
@@ -0,0 +1,251 @@
+import datetime
+import mmap
+import struct
+from collections.abc import Mapping
+
+
+# Binary plists begin with a magic and end with a trailer which is comprised of the size of
+# offsets and object references, the number of objects, the top object and the offset of the
+# offset table
+BPLIST_MAGIC = b'bplist00'
+BPLIST_TRAILER = struct.Struct('>6xBBQQQ')
+
+# The epoch of dates stored in binary plists
+BPLIST_EPOCH = datetime.datetime(2001, 1, 1)
+
+
+class BinaryPlistError(Exception):
+    """An error that occurs when a file is not a valid binary plist"""
+
+
+try:
+    from plistlib import UID
+except ImportError:
+    # UIDs are only available in plistlib from Python 3.8
+    class UID:
+        """A UID (as used by keyed archives) which is equivalent to plistlib.UID"""
+
+        def __init__(self, data):
+            if not isinstance(data, int):
+                raise TypeError('data must be an int')
+            if data >= 1 << 64:
+                raise ValueError('UIDs cannot be >= 2**64')
+            if data < 0:
+                raise ValueError('UIDs must be positive')
+            self.data = data
+
+        def __index__(self):
+            return self.data
+
+        def __repr__(self):
+            return f'{self.__class__.__name__}({self.data!r})'
+
+        def __eq__(self, other):
+            if not isinstance(other, UID):
+                return NotImplemented
+            return self.data == other.data
+
+        def __hash__(self):
+            return hash(self.data)
+
+
+def is_binary(path):
+    """
+    Determines whether a file is a binary plist using its magic.
+
+    :param path: the path of the file
+
+    :return: a boolean indicating whether the file is a binary plist (or False if it doesn't exist)
+    """
+    try:
+        with open(path, 'rb') as fp:
+            return fp.read(len(BPLIST_MAGIC)) == BPLIST_MAGIC
+    except OSError:
+        return False
+
+
+class LazyDict(Mapping):
+    """
+    A read-only dict from a binary plist whose values are only decoded as they are accessed.
+
+    :param plist: the binary plist containing the dict
+    :param key_refs: the object references of each key
+    :param value_refs: the object references of each value
+    """
+
+    def __init__(self, plist, key_refs, value_refs):
+        self._plist = plist
+        self._key_refs = key_refs
+        self._value_refs = value_refs
+        self._index = None
+        self._values = {}
+
+    def _refs(self):
+        # Keys are decoded the first time that any key is looked up
+        if self._index is None:
+            self._index = {
+                self._plist.decode(key_ref): value_ref
+                for key_ref, value_ref in zip(self._key_refs, self._value_refs)
+            }
+        return self._index
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._plist.decode(self._refs()[key], lazy=True)
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._refs())
+
+    def __len__(self):
+        return len(self._key_refs)
+
+
+class BinaryPlist:
+    """
+    Decodes the objects of a binary plist on demand.
+
+    :param data: the contents of the binary plist (e.g. a memory map of the file)
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+        if (
+            len(data) < len(BPLIST_MAGIC) + BPLIST_TRAILER.size or
+            data[:len(BPLIST_MAGIC)] != BPLIST_MAGIC
+        ):
+            raise BinaryPlistError('the data provided is not a binary plist')
+
+        (
+            self.offset_size, self.ref_size, self.object_count, self.top_object,
+            self.offset_table_offset
+        ) = BPLIST_TRAILER.unpack_from(data, len(data) - BPLIST_TRAILER.size)
+
+        if (
+            not self.offset_size or not self.ref_size or
+            self.top_object >= self.object_count or
+            self.offset_table_offset + self.offset_size * self.object_count > len(data)
+        ):
+            raise BinaryPlistError('the binary plist trailer is invalid')
+
+    def _int(self, offset, size, signed=False):
+        if offset + size > len(self.data):
+            raise BinaryPlistError('the binary plist is truncated')
+        return int.from_bytes(self.data[offset:offset + size], 'big', signed=signed)
+
+    def _offset(self, ref):
+        if ref >= self.object_count:
+            raise BinaryPlistError('the binary plist contains an invalid object reference')
+        return self._int(self.offset_table_offset + ref * self.offset_size, self.offset_size)
+
+    def _refs(self, offset, count):
+        return [self._int(offset + i * self.ref_size, self.ref_size) for i in range(count)]
+
+    def _length(self, offset, info):
+        """Determines the length of an object and the offset of its contents."""
+        if info != 0xF:
+            return info, offset + 1
+
+        # Larger lengths are stored in an integer object which follows the marker
+        marker = self._int(offset + 1, 1)
+        if marker & 0xF0 != 0x10:
+            raise BinaryPlistError('the binary plist contains an invalid length')
+        size = 1 << (marker & 0x0F)
+        return self._int(offset + 2, size), offset + 2 + size
+
+    def top(self, lazy=True):
+        """
+        Decodes the top object of the binary plist.
+
+        :param lazy: whether dicts should only decode their values as they are accessed
+
+        :return: the top object
+        """
+        return self.decode(self.top_object, lazy=lazy)
+
+    def decode(self, ref, lazy=False):
+        """
+        Decodes an object of the binary plist.
+
+        :param ref: the object reference
+        :param lazy: whether dicts should only decode their values as they are accessed (the
+                     contents of arrays are always decoded in full)
+
+        :return: the decoded object
+        """
+        try:
+            return self._decode(ref, lazy, frozenset())
+        except (struct.error, ValueError) as e:
+            raise BinaryPlistError(f'the binary plist contains an invalid object: {e}')
+
+    def _decode(self, ref, lazy, parents):
+        if ref in parents:
+            raise BinaryPlistError('the binary plist contains a recursive object')
+
+        offset = self._offset(ref)
+        marker = self._int(offset, 1)
+        kind, info = marker & 0xF0, marker & 0x0F
+
+        if marker == 0x00:
+            return None
+        elif marker == 0x08:
+            return False
+        elif marker == 0x09:
+            return True
+        elif kind == 0x10:
+            size = 1 << info
+            return self._int(offset + 1, size, signed=size >= 8)
+        elif marker == 0x22:
+            return struct.unpack('>f', self.data[offset + 1:offset + 5])[0]
+        elif marker == 0x23:
+            return struct.unpack('>d', self.data[offset + 1:offset + 9])[0]
+        elif marker == 0x33:
+            seconds = struct.unpack('>d', self.data[offset + 1:offset + 9])[0]
+            return BPLIST_EPOCH + datetime.timedelta(seconds=seconds)
+        elif kind == 0x80:
+            return UID(self._int(offset + 1, info + 1))
+
+        length, start = self._length(offset, info)
+        if kind == 0x40:
+            return bytes(self.data[start:start + length])
+        elif kind == 0x50:
+            return self.data[start:start + length].decode('ascii')
+        elif kind == 0x60:
+            return self.data[start:start + length * 2].decode('utf-16be')
+        elif kind == 0xA0:
+            parents |= {ref}
+            return [
+                self._decode(item_ref, False, parents) for item_ref in self._refs(start, length)
+            ]
+        elif kind == 0xD0:
+            key_refs = self._refs(start, length)
+            value_refs = self._refs(start + length * self.ref_size, length)
+            if lazy:
+                return LazyDict(self, key_refs, value_refs)
+
+            parents |= {ref}
+            return {
+                self._decode(key_ref, False, parents): self._decode(value_ref, False, parents)
+                for key_ref, value_ref in zip(key_refs, value_refs)
+            }
+
+        raise BinaryPlistError(f'the binary plist contains an unsupported object ({marker:#x})')
+
+
+def load(path):
+    """
+    Loads a binary plist using a memory map so that only the objects which are accessed are read
+    and decoded.
+
+    :param path: the path of the binary plist
+
+    :return: the top object of the plist where dicts are lazily decoded
+    """
+    with open(path, 'rb') as fp:
+        try:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise BinaryPlistError('the binary plist is empty')
+
+    return BinaryPlist(data).top()
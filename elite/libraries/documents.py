@@ -0,0 +1,124 @@
+import os
+
+from . import files
+
+
+class Document:
+    """
+    A parsed configuration file held by a document store.
+
+    :param data: the parsed contents of the file
+    :param signature: the stat signature of the file when it was parsed or None if it didn't exist
+    :param fmt: the format of the file (e.g. xml or binary for plists) or None if unknown
+    """
+
+    __slots__ = ('data', 'signature', 'fmt', 'dump', 'dirty')
+
+    def __init__(self, data, signature, fmt=None):
+        self.data = data
+        self.signature = signature
+        self.fmt = fmt
+        self.dump = None
+        self.dirty = False
+
+
+def _signature(path):
+    try:
+        return files.stat_signature(os.stat(path))
+    except OSError:
+        return None
+
+
+class DocumentStore:
+    """
+    A store of parsed configuration files (e.g. plists and JSON files) which is shared by actions
+    during a run, so that each file is parsed once and written once no matter how many actions
+    update it.
+    """
+
+    def __init__(self):
+        self.documents = {}
+
+    def load(self, path, load, detect_format=None):
+        """
+        Obtains the parsed contents of a file, parsing it if it hasn't been parsed already or
+        has been modified since (outside of the store).
+
+        :param path: the path of the file
+        :param load: a function which parses the file at the path provided and returns its data
+        :param detect_format: a function which determines the format of the file at the path
+                              provided when it's parsed or None if the format isn't required
+
+        :return: the parsed data which may be modified and then saved
+        """
+        document = self.documents.get(path)
+        if document and (document.dirty or document.signature == _signature(path)):
+            if document.fmt is None and detect_format and not document.dirty:
+                document.fmt = detect_format(path)
+            return document.data
+
+        signature = _signature(path)
+        fmt = detect_format(path) if detect_format else None
+        document = self.documents[path] = Document(load(path), signature, fmt)
+        return document.data
+
+    def fmt(self, path):
+        """
+        Obtains the format of a file as detected when it was parsed or as it will be written
+        when the store is flushed.
+
+        :param path: the path of the file
+
+        :return: the format of the file or None if it's unknown
+        """
+        document = self.documents.get(path)
+        return document.fmt if document else None
+
+    def save(self, path, data, dump, fmt=None):
+        """
+        Marks a file as modified so that it is written when the store is flushed.
+
+        :param path: the path of the file
+        :param data: the updated data of the file
+        :param dump: a function which serialises the data into the bytes to be written
+        :param fmt: the format that the data is serialised in (which is recorded so that later
+                    updates may preserve it) or None if it's unknown
+        """
+        document = self.documents.get(path)
+        if not document:
+            document = self.documents[path] = Document(data, None)
+
+        document.data = data
+        document.dump = dump
+        document.dirty = True
+        if fmt is not None:
+            document.fmt = fmt
+
+    def flush(self, path=None):
+        """
+        Atomically writes each file that has been modified.
+
+        :param path: the path of a single file to write or None to write all modified files
+
+        :return: a list of tuples containing the path and error of each file which couldn't be
+                 written (these are discarded from the store)
+        """
+        paths = [path] if path else list(self.documents)
+        failures = []
+
+        for document_path in paths:
+            document = self.documents.get(document_path)
+            if not document or not document.dirty:
+                continue
+
+            try:
+                files.write(document_path, document.dump(document.data))
+            except (OSError, TypeError, ValueError, OverflowError) as e:
+                del self.documents[document_path]
+                failures.append((document_path, e))
+                continue
+
+            document.dirty = False
+            document.signature = _signature(document_path)
+
+        return failures
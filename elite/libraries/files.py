@@ -0,0 +1,418 @@
+import ctypes
+import errno
+import hashlib
+import os
+import stat
+import zlib
+
+
+# Large buffers significantly reduce the number of system calls when reading big files
+BUFFER_SIZE = 1024 * 1024
+
+# The maximum number of bytes to copy in each kernel copy call
+KERNEL_COPY_SIZE = 1024 * 1024 * 1024
+
+# Errors which indicate that a kernel copy mechanism is unsupported for the files provided
+KERNEL_COPY_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EBADF,
+    errno.ENOTSOCK
+}
+
+
+def _load_clonefile():
+    """Obtains the clonefile function from libc which is only available on macOS (APFS)."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        clonefile = libc.clonefile
+    except (AttributeError, OSError):
+        return None
+
+    clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+    clonefile.restype = ctypes.c_int
+    return clonefile
+
+
+_clonefile = _load_clonefile()
+
+
+def new_hash(algorithm=None):
+    """
+    Creates a new hash object for use in computing file digests.
+
+    :param algorithm: the name of the hash algorithm (e.g. sha256) or None to use the default
+    """
+    return hashlib.new(algorithm) if algorithm else hashlib.blake2b()
+
+
+def digest(path, buffer_size=BUFFER_SIZE, algorithm=None):
+    """
+    Computes the digest of a file.
+
+    :param path: the path of the file
+    :param buffer_size: the size of each read
+    :param algorithm: the name of the hash algorithm (e.g. sha256) or None to use the default
+
+    :return: the hex digest of the file's contents
+    """
+    file_hash = new_hash(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    with open(path, 'rb') as fp:
+        for length in iter(lambda: fp.readinto(buffer), 0):
+            file_hash.update(view[:length])
+
+    return file_hash.hexdigest()
+
+
+def crc32(path, buffer_size=BUFFER_SIZE):
+    """
+    Computes the CRC32 checksum of a file (as recorded for each member of ZIP and RAR archives).
+
+    :param path: the path of the file
+    :param buffer_size: the size of each read
+
+    :return: the CRC32 checksum of the file's contents as an integer
+    """
+    checksum = 0
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    with open(path, 'rb') as fp:
+        for length in iter(lambda: fp.readinto(buffer), 0):
+            checksum = zlib.crc32(view[:length], checksum)
+
+    return checksum
+
+
+def compare(
+    source, destination, buffer_size=BUFFER_SIZE, source_digest=None, destination_digest=None,
+    digest_required=True
+):
+    """
+    Compares the contents of two files, reading as little as possible.  Files of differing sizes
+    are never read, known digests are used in place of reading each file and otherwise the files
+    are compared chunk-by-chunk, stopping as soon as they differ.
+
+    :param source: the path of the first file
+    :param destination: the path of the second file
+    :param buffer_size: the size of each read
+    :param source_digest: the known digest of the first file (if any)
+    :param destination_digest: the known digest of the second file (if any)
+    :param digest_required: whether the digest of each file must be returned when they are
+                            identical (otherwise the files are compared without being hashed)
+
+    :return: a tuple containing a boolean indicating whether the files are identical followed
+             by the digest of each file (or None for each digest if the files differ or the
+             digests weren't required)
+    """
+    with open(source, 'rb') as source_fp, open(destination, 'rb') as destination_fp:
+        if os.fstat(source_fp.fileno()).st_size != os.fstat(destination_fp.fileno()).st_size:
+            return False, None, None
+
+        # Only the file whose digest is unknown needs to be read when the other is known
+        if source_digest and destination_digest:
+            pass
+        elif source_digest and digest_required:
+            destination_digest = _fp_digest(destination_fp, buffer_size)
+        elif destination_digest and digest_required:
+            source_digest = _fp_digest(source_fp, buffer_size)
+        else:
+            return _compare_contents(source_fp, destination_fp, buffer_size, digest_required)
+
+    if source_digest != destination_digest:
+        return False, None, None
+    return True, source_digest, destination_digest
+
+
+def _fp_digest(fp, buffer_size):
+    """Computes the digest of an open file."""
+    file_hash = new_hash()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    for length in iter(lambda: fp.readinto(buffer), 0):
+        file_hash.update(view[:length])
+
+    return file_hash.hexdigest()
+
+
+def _compare_contents(source_fp, destination_fp, buffer_size, digest_required):
+    """Compares two open files chunk-by-chunk, hashing their contents if required."""
+    source_hash = new_hash() if digest_required else None
+    destination_hash = new_hash() if digest_required else None
+    source_buffer = bytearray(buffer_size)
+    destination_buffer = bytearray(buffer_size)
+    source_view = memoryview(source_buffer)
+    destination_view = memoryview(destination_buffer)
+
+    while True:
+        source_length = source_fp.readinto(source_buffer)
+        destination_length = destination_fp.readinto(destination_buffer)
+
+        if (
+            source_length != destination_length or
+            source_view[:source_length] != destination_view[:destination_length]
+        ):
+            return False, None, None
+
+        if not source_length:
+            break
+
+        if digest_required:
+            source_hash.update(source_view[:source_length])
+            destination_hash.update(destination_view[:destination_length])
+
+    if not digest_required:
+        return True, None, None
+    return True, source_hash.hexdigest(), destination_hash.hexdigest()
+
+
+def stat_signature(stat):
+    """
+    Builds a signature from a file's stat details which changes whenever the file is modified.
+
+    :param stat: the stat result of the file
+
+    :return: a tuple containing the device, inode, size and modification time of the file
+    """
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _clone(source, destination):
+    """
+    Clones a file using copy-on-write on filesystems that support it (e.g. APFS).
+
+    :param source: the path of the source file
+    :param destination: the path to clone the source to which must not exist
+
+    :return: a boolean indicating whether the file was cloned
+    """
+    if _clonefile is None:
+        return False
+
+    return _clonefile(os.fsencode(source), os.fsencode(destination), 0) == 0
+
+
+def _kernel_copy(source_fd, destination_fd, size):
+    """
+    Copies a file's contents using kernel copy offload where available.
+
+    :param source_fd: the file descriptor of the source file
+    :param destination_fd: the file descriptor of the destination file
+    :param size: the number of bytes to copy
+
+    :return: a boolean indicating whether the contents were copied in full
+    """
+    for copy_function in [getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)]:
+        if copy_function is None:
+            continue
+
+        offset = 0
+        try:
+            while offset < size:
+                if copy_function is os.sendfile:
+                    copied = os.sendfile(destination_fd, source_fd, offset, KERNEL_COPY_SIZE)
+                else:
+                    copied = copy_function(source_fd, destination_fd, KERNEL_COPY_SIZE)
+                if not copied:
+                    break
+                offset += copied
+        except OSError as e:
+            # Fall back to the next mechanism if nothing has been copied yet
+            if offset == 0 and e.errno in KERNEL_COPY_UNSUPPORTED_ERRNOS:
+                continue
+            raise
+
+        # The source ended early (e.g. it was truncated while being copied), so the partial
+        # copy is discarded and the caller must copy through a buffer instead
+        if offset < size:
+            os.ftruncate(destination_fd, 0)
+            os.lseek(destination_fd, 0, os.SEEK_SET)
+            os.lseek(source_fd, 0, os.SEEK_SET)
+            return False
+
+        return True
+
+    return False
+
+
+def _buffered_copy(source_fd, destination_fd, buffer_size):
+    """
+    Copies a file's contents through a buffer while computing its digest.
+
+    :param source_fd: the file descriptor of the source file
+    :param destination_fd: the file descriptor of the destination file
+    :param buffer_size: the size of each read
+
+    :return: the hex digest of the contents copied
+    """
+    file_hash = new_hash()
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    for length in iter(lambda: os.readv(source_fd, [buffer]), 0):
+        file_hash.update(view[:length])
+        written = 0
+        while written < length:
+            written += os.write(destination_fd, view[written:length])
+
+    return file_hash.hexdigest()
+
+
+def _create_temp(destination):
+    """
+    Creates a temporary file alongside the destination so that it may be renamed into place.
+
+    :param destination: the final path of the file
+
+    :return: a tuple containing the file descriptor and path of the temporary file
+    """
+    directory, filename = os.path.split(destination)
+    for _attempt in range(100):
+        temp_path = os.path.join(directory, f'.{filename}.{os.urandom(4).hex()}.tmp')
+        try:
+            # The file is created with the regular mode (taking the umask into account)
+            return os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), temp_path
+        except FileExistsError:
+            continue
+
+    raise FileExistsError(errno.EEXIST, 'unable to create a unique temporary file', destination)
+
+
+def copy(
+    source, destination, source_digest=None, buffer_size=BUFFER_SIZE, digest_required=True
+):
+    """
+    Atomically copies a file by writing it to a temporary file in the destination directory and
+    renaming it into place, so that an interrupted copy never leaves a truncated file behind.
+
+    When the source digest is already known (or isn't required), the file is cloned or copied
+    using kernel copy offload.  Otherwise, the contents are copied through a buffer so that the
+    digest may be computed in the same pass.
+
+    :param source: the path of the source file
+    :param destination: the path of the destination file
+    :param source_digest: the known digest of the source file (if any)
+    :param buffer_size: the size of each read when copying through a buffer
+    :param digest_required: whether the digest of the copied file must be returned
+
+    :return: the hex digest of the copied file (or None if it wasn't required and wasn't
+             computed)
+    """
+    # Like a regular copy, we write to the target of any existing symlink at the destination
+    if os.path.islink(destination):
+        destination = os.path.realpath(destination)
+
+    # Existing files keep their mode and ownership when they are replaced
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        destination_stat = None
+
+    temp_fd, temp_path = _create_temp(destination)
+    try:
+        temp_mode = stat.S_IMODE(os.fstat(temp_fd).st_mode)
+
+        with open(source, 'rb') as source_fp:
+            source_fd = source_fp.fileno()
+            cloned = copied = False
+
+            if source_digest or not digest_required:
+                # Clones must be created at a path which doesn't exist yet
+                os.close(temp_fd)
+                temp_fd = None
+                os.remove(temp_path)
+                cloned = _clone(source, temp_path)
+
+                if not cloned:
+                    temp_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, temp_mode)
+                    copied = _kernel_copy(source_fd, temp_fd, os.fstat(source_fd).st_size)
+
+            if cloned or copied:
+                digest = source_digest
+            else:
+                digest = _buffered_copy(source_fd, temp_fd, buffer_size)
+
+        if temp_fd is not None:
+            os.close(temp_fd)
+            temp_fd = None
+
+        _replace(temp_path, destination, destination_stat, temp_mode)
+    except BaseException:
+        _discard_temp(temp_fd, temp_path)
+        raise
+
+    return digest
+
+
+def write(destination, data):
+    """
+    Atomically writes data to a file by writing it to a temporary file in the destination
+    directory and renaming it into place, so that readers never encounter a partially written file.
+
+    :param destination: the path of the file
+    :param data: the bytes to be written
+    """
+    # Like a regular write, we write to the target of any existing symlink at the destination
+    if os.path.islink(destination):
+        destination = os.path.realpath(destination)
+
+    # Existing files keep their mode and ownership when they are replaced
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        destination_stat = None
+
+    temp_fd, temp_path = _create_temp(destination)
+    try:
+        temp_mode = stat.S_IMODE(os.fstat(temp_fd).st_mode)
+
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            written += os.write(temp_fd, view[written:])
+
+        os.close(temp_fd)
+        temp_fd = None
+
+        _replace(temp_path, destination, destination_stat, temp_mode)
+    except BaseException:
+        _discard_temp(temp_fd, temp_path)
+        raise
+
+
+def _replace(temp_path, destination, destination_stat, temp_mode):
+    """
+    Moves a temporary file into place, retaining the mode and ownership of any existing file.
+
+    :param temp_path: the path of the temporary file
+    :param destination: the final path of the file
+    :param destination_stat: the stat result of the existing file or None if it doesn't exist
+    :param temp_mode: the mode of the temporary file when it was created
+    """
+    if destination_stat:
+        os.chmod(temp_path, stat.S_IMODE(destination_stat.st_mode))
+        try:
+            os.chown(temp_path, destination_stat.st_uid, destination_stat.st_gid)
+        except PermissionError:
+            pass
+    else:
+        os.chmod(temp_path, temp_mode)
+
+    os.replace(temp_path, destination)
+
+
+def _discard_temp(temp_fd, temp_path):
+    """
+    Closes and removes a temporary file after a failure.
+
+    :param temp_fd: the file descriptor of the temporary file or None if it was closed
+    :param temp_path: the path of the temporary file
+    """
+    if temp_fd is not None:
+        os.close(temp_fd)
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
@@ -0,0 +1,528 @@
+import heapq
+import os
+import pwd
+import re
+import sqlite3
+import stat
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import translate
+
+from ..constants import FLAGS
+
+
+# The number of directories queued for scanning per worker when scanning in parallel
+QUEUED_DIRECTORIES_PER_WORKER = 4
+
+# The aggregations which may be computed over the entries found
+AGGREGATES = ['count', 'size', 'extensions', 'owners', 'newest', 'oldest']
+
+
+def _prepare_filters(mode, flags, patterns):
+    """
+    Converts the mode, flags and patterns requested into a form which may be efficiently
+    compared against each entry.
+
+    :param mode: the mode that entries must have
+    :param flags: the flags which entries must have at least one of
+    :param patterns: various glob patterns to match against
+
+    :return: a tuple containing the integer mode, the binary flags and a function which matches
+             paths against the patterns (each of which is None if not requested)
+    """
+    mode_int = int(mode, 8) if mode is not None else None
+
+    if flags:
+        flags_bin = 0
+        for flag in flags:
+            if flag not in FLAGS:
+                raise ValueError('the specified flag is unsupported')
+            flags_bin |= FLAGS[flag]
+    else:
+        flags_bin = None
+
+    if patterns:
+        pattern_match = re.compile('|'.join(translate(p) for p in patterns)).match
+    else:
+        pattern_match = None
+
+    return mode_int, flags_bin, pattern_match
+
+
+def walk(
+    path, mode=None, uid=None, gid=None, flags=None, min_depth=None, max_depth=None, types=None,
+    patterns=None, is_alias=None, workers=None
+):
+    """
+    Walks through the path provided iteratively and yields each entry matching the filters.
+
+    Entries are yielded as they are found (in no particular order) so that callers may process
+    very large trees without holding every path in memory.
+
+    :param path: the path to search
+    :param mode: the mode that entries must have
+    :param uid: the uid that must own entries
+    :param gid: the gid that must own entries
+    :param flags: the flags which entries must have at least one of
+    :param min_depth: the minimum directory depth to return entries from
+    :param max_depth: the maximum directory depth to return entries from
+    :param types: the types of files to return
+    :param patterns: various glob patterns to match against
+    :param is_alias: a function which determines whether a path is a macOS alias or None to
+                     treat aliases as regular files
+    :param workers: the number of threads to scan directories with or None to scan
+                    sequentially
+
+    :return: a generator yielding the os.DirEntry of each entry found
+    """
+    # Prepare all filters before walking so they needn't be computed for each item
+    mode_int, flags_bin, pattern_match = _prepare_filters(mode, flags, patterns)
+
+    stat_required = mode_int is not None or uid is not None or gid is not None or flags_bin
+
+    # Only files can be aliases, so the alias check is skipped when their type is irrelevant
+    alias_check = is_alias and types and ('file' in types or 'alias' in types)
+
+    def scan(directory, depth):
+        """Scans a directory, returning the entries matched and subdirectories to traverse."""
+        entries = []
+        subdirectories = []
+
+        # Subdirectories are only traversed when their items are within the maximum depth
+        traverse = not max_depth or depth < max_depth
+
+        # Use scandir (for speed)
+        with os.scandir(directory) as items:
+            for item in items:
+                is_dir = item.is_dir()
+
+                if traverse and is_dir and not item.is_symlink():
+                    subdirectories.append((item.path, depth + 1))
+
+                # Apply the cheapest filters first
+                if min_depth and depth < min_depth:
+                    continue
+
+                if pattern_match and not pattern_match(item.path):
+                    continue
+
+                # Determine the file type if a type filter is requested
+                if types:
+                    if is_dir:
+                        file_type = 'directory'
+                    elif item.is_symlink():
+                        file_type = 'symlink'
+                    elif alias_check and is_alias(item.path):
+                        file_type = 'alias'
+                    else:
+                        file_type = 'file'
+
+                    if file_type not in types:
+                        continue
+
+                # Compare the mode, owner, group and flags if requested using the stat
+                # details cached by scandir where possible
+                if stat_required:
+                    stat = item.stat(follow_symlinks=False)
+
+                    if (
+                        (mode_int is not None and stat.st_mode & 0o7777 != mode_int) or
+                        (uid is not None and stat.st_uid != uid) or
+                        (gid is not None and stat.st_gid != gid) or
+                        (flags_bin and not stat.st_flags & flags_bin)
+                    ):
+                        continue
+
+                entries.append(item)
+
+        return entries, subdirectories
+
+    # Walk through directories using a stack of directories along with the depth of the
+    # items they contain
+    directories = [(path, 1)]
+
+    if not workers or workers <= 1:
+        while directories:
+            entries, subdirectories = scan(*directories.pop())
+            directories.extend(subdirectories)
+            yield from entries
+        return
+
+    # Scan directories in parallel (scandir and stat release the GIL), handing each idle
+    # worker the next queued directory and limiting how many are queued at once so that
+    # memory use remains bounded regardless of the size of the tree
+    max_queued = workers * QUEUED_DIRECTORIES_PER_WORKER
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scanning = set()
+
+        while directories or scanning:
+            while directories and len(scanning) < max_queued:
+                scanning.add(executor.submit(scan, *directories.pop()))
+
+            done, scanning = wait(scanning, return_when=FIRST_COMPLETED)
+            for future in done:
+                entries, subdirectories = future.result()
+                directories.extend(subdirectories)
+                yield from entries
+
+
+def aggregate(entries, aggregate_type, limit=10):
+    """
+    Computes an aggregation over the entries provided in a single pass, without retaining
+    the entries themselves.
+
+    :param entries: an iterable of os.DirEntry objects (e.g. as yielded by walk)
+    :param aggregate_type: the aggregation to compute which may be count (the number of
+                           entries), size (the total size in bytes of all non-directories),
+                           extensions (the number of entries per extension), owners (the
+                           number of entries per owner), newest or oldest (the paths of the
+                           most or least recently modified entries)
+    :param limit: the number of paths to return for the newest and oldest aggregations
+
+    :return: the result of the aggregation
+    """
+    if aggregate_type == 'count':
+        return sum(1 for _entry in entries)
+
+    elif aggregate_type == 'size':
+        return sum(
+            entry.stat(follow_symlinks=False).st_size
+            for entry in entries if not entry.is_dir(follow_symlinks=False)
+        )
+
+    elif aggregate_type == 'extensions':
+        return dict(Counter(
+            os.path.splitext(entry.name)[1].lower() for entry in entries
+        ).most_common())
+
+    elif aggregate_type == 'owners':
+        uid_counts = Counter(entry.stat(follow_symlinks=False).st_uid for entry in entries)
+
+        # Resolve each owner only once
+        owners = Counter()
+        for uid, count in uid_counts.items():
+            try:
+                owners[pwd.getpwuid(uid).pw_name] += count
+            except KeyError:
+                owners[str(uid)] += count
+        return dict(owners.most_common())
+
+    elif aggregate_type in ['newest', 'oldest']:
+        select = heapq.nlargest if aggregate_type == 'newest' else heapq.nsmallest
+        mtime_entries = (
+            (entry.stat(follow_symlinks=False).st_mtime_ns, entry.path) for entry in entries
+        )
+        return [path for _mtime, path in select(limit, mtime_entries)]
+
+    else:
+        raise ValueError(f'aggregate must be one of {", ".join(AGGREGATES)}')
+
+
+class IndexEntry:
+    """
+    An entry found in a directory index which offers the subset of the os.DirEntry interface
+    used when filtering and aggregating entries.
+    """
+
+    __slots__ = [
+        'path', 'name', 'file_type', 'st_mode', 'st_uid', 'st_gid', 'st_flags', 'st_size',
+        'st_mtime_ns'
+    ]
+
+    def __init__(self, path, file_type, mode, uid, gid, flags, size, mtime_ns):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.file_type = file_type
+        self.st_mode = mode
+        self.st_uid = uid
+        self.st_gid = gid
+        self.st_flags = flags
+        self.st_size = size
+        self.st_mtime_ns = mtime_ns
+
+    def __repr__(self):
+        return f'<IndexEntry {self.path!r}>'
+
+    def is_dir(self, follow_symlinks=True):
+        # Like walk, symlinks to directories are typed as directories
+        if follow_symlinks:
+            return self.file_type == 'directory'
+        return stat.S_ISDIR(self.st_mode)
+
+    def is_symlink(self):
+        return stat.S_ISLNK(self.st_mode)
+
+    def stat(self, follow_symlinks=True):
+        # The entry holds the stat details of the path itself (like lstat)
+        return self
+
+
+class Index:
+    """
+    A persistent index of the entries contained in directory trees which is stored in an
+    SQLite database.
+
+    The index is revalidated incrementally by comparing the modification time of each directory
+    against the time recorded when it was last scanned, so only directories which have had
+    entries added, removed or renamed since are scanned again.  Changes which don't alter the
+    directory itself (such as modifying the mode or contents of an existing file) are not
+    detected until its directory is next scanned.
+
+    :param database_path: the path of the SQLite database holding the index
+    """
+
+    # Increment this whenever the schema changes so that existing indexes are rebuilt
+    SCHEMA_VERSION = 2
+
+    def __init__(self, database_path):
+        self.database_path = database_path
+        self.connection = sqlite3.connect(database_path)
+
+        # The index may always be rebuilt, so durability is traded for write performance
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = OFF')
+
+        schema_version, = self.connection.execute('PRAGMA user_version').fetchone()
+        if schema_version != self.SCHEMA_VERSION:
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS directories')
+                self.connection.execute('DROP TABLE IF EXISTS entries')
+                self.connection.execute(
+                    'CREATE TABLE directories (path TEXT PRIMARY KEY, mtime_ns INTEGER) '
+                    'WITHOUT ROWID'
+                )
+                self.connection.execute(
+                    'CREATE TABLE entries ('
+                    'path TEXT PRIMARY KEY, directory TEXT, depth INTEGER, type TEXT, '
+                    'mode INTEGER, uid INTEGER, gid INTEGER, flags INTEGER, size INTEGER, '
+                    'mtime_ns INTEGER, alias INTEGER'
+                    ') WITHOUT ROWID'
+                )
+                self.connection.execute('CREATE INDEX entries_directory ON entries (directory)')
+                self.connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes the underlying database connection."""
+        self.connection.close()
+
+    @staticmethod
+    def _subtree_range(path):
+        """Determines the range of paths which are contained within the path provided."""
+        prefix = path.rstrip('/') + '/'
+        # The character following a slash is a zero, so this bounds all paths with the prefix
+        return prefix, prefix[:-1] + '0'
+
+    def _remove(self, directory):
+        """Removes a directory and everything it contains from the index."""
+        start, end = self._subtree_range(directory)
+        for table in ['directories', 'entries']:
+            self.connection.execute(
+                f'DELETE FROM {table} WHERE path = ? OR (path >= ? AND path < ?)',
+                (directory, start, end)
+            )
+
+    def _subdirectories(self, directory):
+        """Obtains the indexed subdirectories of a directory (excluding symlinks)."""
+        return [
+            path for path, in self.connection.execute(
+                'SELECT path FROM entries WHERE directory = ? AND type = ? AND mode & ? = ?',
+                (directory, 'directory', stat.S_IFMT(0o177777), stat.S_IFDIR)
+            )
+        ]
+
+    def _scan(self, directory, mtime_ns):
+        """Scans a directory and replaces its entries in the index."""
+        previous_subdirectories = set(self._subdirectories(directory))
+        self.connection.execute('DELETE FROM entries WHERE directory = ?', (directory,))
+
+        rows = []
+        subdirectories = []
+        with os.scandir(directory) as items:
+            for item in items:
+                item_stat = item.stat(follow_symlinks=False)
+
+                # Entries are typed in the same way as walk, where symlinks to directories are
+                # typed as directories but aren't traversed
+                if item.is_dir():
+                    file_type = 'directory'
+                    if not item.is_symlink():
+                        subdirectories.append(item.path)
+                elif item.is_symlink():
+                    file_type = 'symlink'
+                else:
+                    file_type = 'file'
+
+                rows.append((
+                    item.path, directory, item.path.count('/'), file_type, item_stat.st_mode,
+                    item_stat.st_uid, item_stat.st_gid, item_stat.st_flags, item_stat.st_size,
+                    item_stat.st_mtime_ns
+                ))
+
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO entries '
+            '(path, directory, depth, type, mode, uid, gid, flags, size, mtime_ns) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        self.connection.execute(
+            'INSERT OR REPLACE INTO directories (path, mtime_ns) VALUES (?, ?)',
+            (directory, mtime_ns)
+        )
+
+        # Forget about subdirectories which no longer exist
+        for subdirectory in previous_subdirectories.difference(subdirectories):
+            self._remove(subdirectory)
+
+        return subdirectories
+
+    def update(self, path, max_depth=None):
+        """
+        Revalidates the index for the path provided, scanning only the directories which have
+        changed since they were last scanned.
+
+        :param path: the absolute path of the directory to revalidate
+        :param max_depth: the maximum directory depth which will be queried
+        """
+        # Load the modification times and subdirectories of all indexed directories in the path
+        # up-front so that unchanged directories only require a stat
+        start, end = self._subtree_range(path)
+        indexed_mtimes = dict(self.connection.execute(
+            'SELECT path, mtime_ns FROM directories WHERE path = ? OR (path >= ? AND path < ?)',
+            (path, start, end)
+        ))
+        indexed_subdirectories = defaultdict(list)
+        for subdirectory, directory in self.connection.execute(
+            'SELECT path, directory FROM entries '
+            'WHERE path >= ? AND path < ? AND type = ? AND mode & ? = ?',
+            (start, end, 'directory', stat.S_IFMT(0o177777), stat.S_IFDIR)
+        ):
+            indexed_subdirectories[directory].append(subdirectory)
+
+        directories = [(path, 1)]
+
+        with self.connection:
+            while directories:
+                directory, depth = directories.pop()
+
+                # The modification time is obtained prior to scanning so that any changes made
+                # during the scan will cause the directory to be scanned again next time
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except OSError:
+                    self._remove(directory)
+                    continue
+
+                if indexed_mtimes.get(directory) == mtime_ns:
+                    subdirectories = indexed_subdirectories[directory]
+                else:
+                    try:
+                        subdirectories = self._scan(directory, mtime_ns)
+                    except OSError:
+                        self._remove(directory)
+                        continue
+
+                if not max_depth or depth < max_depth:
+                    directories.extend((subdirectory, depth + 1) for subdirectory in subdirectories)
+
+    def walk(
+        self, path, mode=None, uid=None, gid=None, flags=None, min_depth=None, max_depth=None,
+        types=None, patterns=None, is_alias=None
+    ):
+        """
+        Queries the index for entries in the path provided matching the filters.  The index
+        should be revalidated using the update method beforehand.
+
+        The arguments are identical to those of the walk function.
+
+        :return: a generator yielding an IndexEntry for each entry found
+        """
+        mode_int, flags_bin, pattern_match = _prepare_filters(mode, flags, patterns)
+        alias_check = is_alias and types and ('file' in types or 'alias' in types)
+
+        start, end = self._subtree_range(path)
+        base_depth = path.rstrip('/').count('/')
+
+        # Apply as many filters as possible in the query itself
+        conditions = ['path >= ?', 'path < ?']
+        parameters = [start, end]
+
+        if min_depth:
+            conditions.append('depth >= ?')
+            parameters.append(base_depth + min_depth)
+
+        if max_depth:
+            conditions.append('depth <= ?')
+            parameters.append(base_depth + max_depth)
+
+        if types:
+            # Aliases are stored as files and determined as they are encountered
+            query_types = set(types) - {'alias'}
+            if alias_check:
+                query_types.add('file')
+
+            conditions.append(f'type IN ({", ".join("?" * len(query_types))})')
+            parameters.extend(sorted(query_types))
+
+        if mode_int is not None:
+            conditions.append('mode & 4095 = ?')
+            parameters.append(mode_int)
+
+        if uid is not None:
+            conditions.append('uid = ?')
+            parameters.append(uid)
+
+        if gid is not None:
+            conditions.append('gid = ?')
+            parameters.append(gid)
+
+        if flags_bin:
+            conditions.append('flags & ? != 0')
+            parameters.append(flags_bin)
+
+        # Patterns are matched while querying so that the details of entries which don't match
+        # needn't be retrieved
+        if pattern_match:
+            # Deterministic functions are only supported from Python 3.8
+            function_kwargs = {'deterministic': True} if sys.version_info >= (3, 8) else {}
+            self.connection.create_function(
+                'pattern_match', 1, lambda entry_path: pattern_match(entry_path) is not None,
+                **function_kwargs
+            )
+            conditions.append('pattern_match(path)')
+
+        rows = self.connection.execute(
+            'SELECT path, type, mode, uid, gid, flags, size, mtime_ns, alias FROM entries '
+            f'WHERE {" AND ".join(conditions)}',
+            parameters
+        )
+
+        # Alias checks require reading each file, so their results are recorded in the index
+        alias_updates = []
+
+        for entry_path, file_type, *entry_stat, alias in rows:
+            if alias_check and file_type == 'file':
+                if alias is None:
+                    alias = is_alias(entry_path)
+                    alias_updates.append((alias, entry_path))
+
+                if alias:
+                    file_type = 'alias'
+
+                if file_type not in types:
+                    continue
+
+            yield IndexEntry(entry_path, file_type, *entry_stat)
+
+        if alias_updates:
+            with self.connection:
+                self.connection.executemany(
+                    'UPDATE entries SET alias = ? WHERE path = ?', alias_updates
+                )
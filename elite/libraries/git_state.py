@@ -0,0 +1,267 @@
+import os
+import re
+
+
+# Matches a section header such as [core], [remote "origin"] or the legacy [branch.master]
+CONFIG_SECTION_RE = re.compile(r'\[\s*([\w.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+
+# Matches a key along with the remainder of its line (which may contain a value)
+CONFIG_KEY_RE = re.compile(r'([A-Za-z][\w-]*)\s*(?:=(.*))?$')
+
+# The escape sequences which may be used in config values
+CONFIG_ESCAPES = {'"': '"', '\\': '\\', 'n': '\n', 't': '\t', 'b': '\b'}
+
+# The maximum depth of symbolic refs which are followed (as per Git itself)
+MAX_SYMREF_DEPTH = 5
+
+
+class GitStateError(Exception):
+    """An error that occurs when the state of a Git repository can't be read"""
+
+
+def _read_text(path):
+    with open(path, encoding='utf-8') as fp:
+        return fp.read()
+
+
+def _parse_value(text):
+    """
+    Parses a config value, removing quotes, processing escapes and stripping comments.
+
+    :param text: the raw text of the value
+
+    :return: a tuple containing the value and a boolean indicating whether the value continues
+             onto the next line
+    """
+    value = []
+    pending_whitespace = ''
+    quoted = False
+    index = 0
+
+    while index < len(text):
+        char = text[index]
+        index += 1
+
+        if char == '\\':
+            if index == len(text):
+                return ''.join(value) + pending_whitespace, True
+            escape = text[index]
+            index += 1
+            if escape not in CONFIG_ESCAPES:
+                raise GitStateError(f'invalid escape sequence \\{escape} in config value')
+            value.append(pending_whitespace + CONFIG_ESCAPES[escape])
+            pending_whitespace = ''
+        elif char == '"':
+            quoted = not quoted
+        elif char in '#;' and not quoted:
+            break
+        elif char.isspace() and not quoted:
+            # Whitespace is retained within a value but not at its start or end
+            if value:
+                pending_whitespace += char
+        else:
+            value.append(pending_whitespace + char)
+            pending_whitespace = ''
+
+    return ''.join(value), False
+
+
+def parse_config(text):
+    """
+    Parses the contents of a Git config file.
+
+    :param text: the contents of the config file
+
+    :return: a dict mapping a tuple of each lowercase section name and its subsection (or None)
+             to a dict of lowercase keys and a list of their values (where keys without a value
+             are True)
+    """
+    config = {}
+    section = None
+    lines = iter(text.splitlines())
+
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+
+        if line.startswith('['):
+            match = CONFIG_SECTION_RE.match(line)
+            if not match:
+                raise GitStateError(f'invalid config section {line}')
+
+            name, subsection = match.groups()
+            if subsection is not None:
+                subsection = re.sub(r'\\(.)', r'\1', subsection)
+            elif '.' in name:
+                # Legacy subsections are case-insensitive and stored in lowercase
+                name, subsection = name.split('.', 1)
+                subsection = subsection.lower()
+
+            section = config.setdefault((name.lower(), subsection), {})
+            line = line[match.end():].strip()
+            if not line or line[0] in '#;':
+                continue
+
+        match = CONFIG_KEY_RE.match(line)
+        if not match or section is None:
+            raise GitStateError(f'invalid config line {line}')
+
+        key, raw_value = match.groups()
+        if raw_value is None:
+            value = True
+        else:
+            value, continued = _parse_value(raw_value)
+            while continued:
+                continuation, continued = _parse_value(next(lines, ''))
+                value += continuation
+
+        section.setdefault(key.lower(), []).append(value)
+
+    return config
+
+
+class GitRepository:
+    """
+    Reads the state of a Git repository (including linked worktrees) directly from its files
+    without running git.
+
+    :param path: the path of the working tree
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.git_dir = self._find_git_dir()
+        self.common_dir = self._find_common_dir()
+        self._config = None
+
+    def _find_git_dir(self):
+        """Determines the Git directory of the working tree or None if it isn't a repository."""
+        dot_git = os.path.join(self.path, '.git')
+
+        # Linked worktrees and submodules use a file which points to their Git directory
+        if os.path.isfile(dot_git):
+            try:
+                contents = _read_text(dot_git).strip()
+            except (OSError, UnicodeDecodeError) as e:
+                raise GitStateError(f'unable to read {dot_git}: {e}')
+            if not contents.startswith('gitdir:'):
+                raise GitStateError(f'{dot_git} does not reference a Git directory')
+            git_dir = os.path.join(self.path, contents[len('gitdir:'):].strip())
+        else:
+            git_dir = dot_git
+
+        return git_dir if os.path.isfile(os.path.join(git_dir, 'HEAD')) else None
+
+    def _find_common_dir(self):
+        """Determines the directory shared by all worktrees which contains the config and refs."""
+        if self.git_dir is None:
+            return None
+
+        try:
+            common_dir = _read_text(os.path.join(self.git_dir, 'commondir')).strip()
+        except FileNotFoundError:
+            return self.git_dir
+        except (OSError, UnicodeDecodeError) as e:
+            raise GitStateError(f'unable to read the common directory: {e}')
+
+        return os.path.normpath(os.path.join(self.git_dir, common_dir))
+
+    @property
+    def exists(self):
+        return self.git_dir is not None
+
+    @property
+    def config(self):
+        if self._config is None:
+            try:
+                self._config = parse_config(_read_text(os.path.join(self.common_dir, 'config')))
+            except FileNotFoundError:
+                self._config = {}
+            except (OSError, UnicodeDecodeError) as e:
+                raise GitStateError(f'unable to read the repository config: {e}')
+        return self._config
+
+    def remote_url(self, remote):
+        """
+        Obtains the URL of a remote (the first URL when many are configured).
+
+        :param remote: the name of the remote
+
+        :return: the URL of the remote or None if it doesn't exist
+        """
+        urls = self.config.get(('remote', remote), {}).get('url')
+        return urls[0] if urls else None
+
+    def _read_ref_file(self, ref):
+        # Refs such as HEAD are specific to each worktree while others are shared
+        for directory in [self.git_dir, self.common_dir]:
+            try:
+                return _read_text(os.path.join(directory, ref)).strip()
+            except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+                continue
+            except (OSError, UnicodeDecodeError) as e:
+                raise GitStateError(f'unable to read the ref {ref}: {e}')
+        return None
+
+    def _read_packed_ref(self, ref):
+        try:
+            packed_refs = _read_text(os.path.join(self.common_dir, 'packed-refs'))
+        except FileNotFoundError:
+            return None
+        except (OSError, UnicodeDecodeError) as e:
+            raise GitStateError(f'unable to read the packed refs: {e}')
+
+        for line in packed_refs.splitlines():
+            # Skip the header and peeled tags
+            if line.startswith(('#', '^')):
+                continue
+            commit, _, packed_ref = line.partition(' ')
+            if packed_ref == ref:
+                return commit
+
+        return None
+
+    def symbolic_ref(self, ref='HEAD'):
+        """
+        Determines the ref that a symbolic ref (such as HEAD) points to.
+
+        :param ref: the symbolic ref
+
+        :return: the full name of the ref pointed to (e.g. refs/heads/master) or None if the ref
+                 isn't symbolic (e.g. a detached HEAD)
+        """
+        contents = self._read_ref_file(ref)
+        if contents and contents.startswith('ref:'):
+            return contents[len('ref:'):].strip()
+        return None
+
+    def branch(self):
+        """
+        Determines the branch which is checked out.
+
+        :return: the short name of the branch or None if HEAD is detached
+        """
+        ref = self.symbolic_ref()
+        if ref and ref.startswith('refs/heads/'):
+            return ref[len('refs/heads/'):]
+        return None
+
+    def resolve(self, ref='HEAD'):
+        """
+        Resolves a ref to the commit it references, following symbolic refs and consulting
+        packed refs.
+
+        :param ref: the full name of the ref (e.g. HEAD or refs/heads/master)
+
+        :return: the commit hash or None if the ref doesn't exist (e.g. an unborn branch)
+        """
+        for _depth in range(MAX_SYMREF_DEPTH):
+            contents = self._read_ref_file(ref)
+            if contents is None:
+                return self._read_packed_ref(ref)
+            if not contents.startswith('ref:'):
+                return contents
+            ref = contents[len('ref:'):].strip()
+
+        raise GitStateError(f'the ref {ref} is nested too deeply')
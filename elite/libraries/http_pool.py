@@ -0,0 +1,175 @@
+import http.client
+import threading
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+
+# Errors which indicate that an idle keep-alive connection was closed by the server
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError,
+    ConnectionAbortedError
+)
+
+
+class ConnectionPool:
+    """
+    A pool of idle keep-alive HTTP connections which may be shared between threads so that
+    requests to the same host avoid repeating the TCP and TLS handshakes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = defaultdict(list)
+
+    def acquire(self, key):
+        """
+        Obtains an idle connection from the pool.
+
+        :param key: a tuple identifying the scheme and host of the connection
+
+        :return: an idle connection or None if no connection is available
+        """
+        with self.lock:
+            connections = self.connections.get(key)
+            return connections.pop() if connections else None
+
+    def release(self, key, connection):
+        """
+        Returns an idle connection to the pool so that it may be reused.
+
+        :param key: a tuple identifying the scheme and host of the connection
+        :param connection: the connection
+        """
+        with self.lock:
+            self.connections[key].append(connection)
+
+    def close(self):
+        """Closes all idle connections in the pool."""
+        with self.lock:
+            for connections in self.connections.values():
+                for connection in connections:
+                    connection.close()
+            self.connections.clear()
+
+
+class PooledHTTPResponse(http.client.HTTPResponse):
+    """A response which calls back once closed so that its connection may be reused."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = None
+
+    def close(self):
+        # The connection may only be reused when the response was read in its entirety
+        complete = self.isclosed()
+        super().close()
+
+        if self.on_close:
+            on_close, self.on_close = self.on_close, None
+            on_close(complete)
+
+
+def pooled_open(pool, http_class, request, **http_conn_args):
+    """
+    Performs a request using a connection from the pool (or a new connection if none are idle),
+    mirroring urllib's own handling of requests but without closing the connection afterwards.
+
+    :param pool: the connection pool
+    :param http_class: the connection class (e.g. http.client.HTTPSConnection)
+    :param request: the urllib request
+    :param http_conn_args: additional arguments used to create new connections
+
+    :return: the response of the request
+    """
+    host = request.host
+    if not host:
+        raise urllib.error.URLError('no host given')
+
+    headers = dict(request.unredirected_hdrs)
+    headers.update({k: v for k, v in request.headers.items() if k not in headers})
+    headers = {name.title(): value for name, value in headers.items()}
+
+    # Move any proxy authorisation to the tunnel used for HTTPS requests via a proxy
+    tunnel_host = request._tunnel_host  # pylint: disable=protected-access
+    tunnel_headers = {}
+    if tunnel_host and 'Proxy-Authorization' in headers:
+        tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+
+    key = (http_class, host, tunnel_host)
+    connection = pool.acquire(key)
+
+    # Idle connections may have been closed by the server, in which case idempotent requests
+    # are retried using a new connection
+    retry = connection is not None and request.get_method() in ('GET', 'HEAD')
+
+    while True:
+        if connection is None:
+            connection = http_class(host, timeout=request.timeout, **http_conn_args)
+            connection.response_class = PooledHTTPResponse
+            if tunnel_host:
+                connection.set_tunnel(tunnel_host, headers=tunnel_headers)
+
+        try:
+            connection.request(
+                request.get_method(), request.selector, request.data, headers,
+                encode_chunked=request.has_header('Transfer-encoding')
+            )
+            response = connection.getresponse()
+            break
+        except STALE_CONNECTION_ERRORS as e:
+            connection.close()
+            if not retry:
+                raise urllib.error.URLError(e)
+            connection = None
+            retry = False
+        except OSError as e:
+            connection.close()
+            raise urllib.error.URLError(e)
+        except BaseException:
+            connection.close()
+            raise
+
+    def on_close(complete, connection=connection):
+        if complete:
+            pool.release(key, connection)
+        else:
+            connection.close()
+
+    response.on_close = on_close
+    response.url = request.get_full_url()
+    response.msg = response.reason
+    return response
+
+
+class PooledHTTPHandler(urllib.request.HTTPHandler):
+    """An HTTP handler which reuses keep-alive connections from a pool."""
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    def do_open(self, http_class, req, **http_conn_args):
+        return pooled_open(self.pool, http_class, req, **http_conn_args)
+
+
+class PooledHTTPSHandler(urllib.request.HTTPSHandler):
+    """An HTTPS handler which reuses keep-alive connections from a pool."""
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    def do_open(self, http_class, req, **http_conn_args):
+        return pooled_open(self.pool, http_class, req, **http_conn_args)
+
+
+def build_opener(pool):
+    """
+    Builds a URL opener which reuses keep-alive connections from the pool provided.
+
+    :param pool: the connection pool
+
+    :return: a urllib opener director
+    """
+    return urllib.request.build_opener(PooledHTTPHandler(pool), PooledHTTPSHandler(pool))
@@ -0,0 +1,110 @@
+import os
+import plistlib
+import re
+
+
+def parse_version(version):
+    """
+    Converts a package version string into a tuple which may be compared against others.
+
+    :param version: the version string (e.g. 1.3.0.3) to be parsed
+
+    :return: a tuple of integers representing each numeric component of the version
+    """
+    return tuple(int(component) for component in re.findall(r'\d+', version or ''))
+
+
+class ReceiptsIndex:
+    """
+    An index of installed package receipts which is built by listing each receipts directory
+    once, rather than checking for individual receipt files on every lookup.
+
+    :param receipts_dirs: the directories containing receipts in order of precedence
+    """
+
+    def __init__(self, receipts_dirs):
+        self.receipts_dirs = list(receipts_dirs)
+
+        # A mapping between each installed identifier and the receipts directory it was found in
+        self.receipts = {}
+
+        # Versions are read from the receipt plists lazily as they are requested
+        self.versions = {}
+
+        # The modification time of each receipts directory is recorded before listing it so that
+        # receipts added afterwards (e.g. by an installer) are detected
+        self.signatures = self._signatures()
+
+        for receipts_dir in self.receipts_dirs:
+            try:
+                with os.scandir(receipts_dir) as it:
+                    filenames = {entry.name for entry in it}
+            except OSError:
+                continue
+
+            # A receipt is only considered valid when both its plist and bom are present
+            for filename in filenames:
+                identifier, extension = os.path.splitext(filename)
+                if (
+                    extension == '.plist' and
+                    f'{identifier}.bom' in filenames and
+                    identifier not in self.receipts
+                ):
+                    self.receipts[identifier] = receipts_dir
+
+    def _signatures(self):
+        signatures = []
+        for receipts_dir in self.receipts_dirs:
+            try:
+                signatures.append(os.stat(receipts_dir).st_mtime_ns)
+            except OSError:
+                signatures.append(None)
+        return signatures
+
+    def stale(self):
+        """
+        Determines whether any receipts directory has changed since the index was built.
+
+        :return: a boolean indicating whether the index must be rebuilt
+        """
+        return self._signatures() != self.signatures
+
+    def __contains__(self, identifier):
+        return identifier in self.receipts
+
+    def version(self, identifier):
+        """
+        Obtains the version of an installed identifier from its receipt plist.
+
+        :param identifier: the bundle id identifier of the package
+
+        :return: the version string or None if it is not installed or could not be determined
+        """
+        if identifier not in self.receipts:
+            return None
+
+        if identifier not in self.versions:
+            receipt_path = os.path.join(self.receipts[identifier], f'{identifier}.plist')
+            try:
+                with open(receipt_path, 'rb') as fp:
+                    receipt = plistlib.load(fp)
+                self.versions[identifier] = receipt.get('PackageVersion')
+            except (OSError, ValueError, AttributeError, plistlib.InvalidFileException):
+                self.versions[identifier] = None
+
+        return self.versions[identifier]
+
+    def outdated(self, identifier, version):
+        """
+        Determines whether an installed identifier is older than the version provided.
+
+        :param identifier: the bundle id identifier of the package
+        :param version: the version of the package available (e.g. from its PackageInfo)
+
+        :return: a boolean indicating whether the installed receipt is older than the version
+        """
+        installed_version = self.version(identifier)
+        if installed_version is None or version is None:
+            return False
+
+        return parse_version(installed_version) < parse_version(version)
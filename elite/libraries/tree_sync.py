@@ -0,0 +1,225 @@
+import os
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from . import files, find
+
+
+# The number of entries whose stat details are obtained by each task when scanning in parallel
+STAT_BATCH_SIZE = 256
+
+
+def scan(root, executor, workers):
+    """
+    Scans a tree, obtaining the stat details of its entries in parallel.
+
+    :param root: the root directory of the tree
+    :param executor: the executor used to stat entries
+    :param workers: the number of threads used to scan directories
+
+    :return: a dict mapping the path of each entry (relative to the root) to its stat result
+             which is empty if the root doesn't exist
+    """
+    if not os.path.isdir(root):
+        return {}
+
+    prefix_length = len(os.path.join(root, ''))
+    entries = list(find.walk(root, workers=workers))
+
+    def stat_batch(batch):
+        return [
+            (entry.path[prefix_length:], entry.stat(follow_symlinks=False)) for entry in batch
+        ]
+
+    batches = [entries[i:i + STAT_BATCH_SIZE] for i in range(0, len(entries), STAT_BATCH_SIZE)]
+    return {
+        relpath: entry_stat
+        for batch in executor.map(stat_batch, batches)
+        for relpath, entry_stat in batch
+    }
+
+
+def _sort_key(relpath):
+    # Sort entries by their components so that each directory precedes its contents
+    return relpath.split(os.sep)
+
+
+def _ancestors(relpath):
+    parts = relpath.split(os.sep)
+    return [os.sep.join(parts[:i]) for i in range(1, len(parts))]
+
+
+def _display_path(relpath, entry_stat):
+    # Like rsync, directories are displayed with a trailing slash
+    return relpath + '/' if stat.S_ISDIR(entry_stat.st_mode) else relpath
+
+
+def _file_differs(source_path, destination_path, source_stat, destination_stat, checksum):
+    """Determines whether a file must be copied in the same way as rsync's quick check."""
+    if source_stat.st_size != destination_stat.st_size:
+        return True
+    if checksum:
+        identical, _source_digest, _destination_digest = files.compare(
+            source_path, destination_path, digest_required=False
+        )
+        return not identical
+
+    # Modification times are compared to the second as not all filesystems store nanoseconds
+    return int(source_stat.st_mtime) != int(destination_stat.st_mtime)
+
+
+def _apply_attributes(path, source_stat, destination_stat, preserve_owner):
+    """
+    Applies the mode, ownership and modification time of a source entry to its destination.
+
+    :param path: the path of the destination entry
+    :param source_stat: the stat result of the source entry
+    :param destination_stat: the stat result of the destination entry or None if it was just
+                             created
+    :param preserve_owner: whether to preserve the owner and group of the source entry
+    """
+    mode = stat.S_IMODE(source_stat.st_mode)
+    if destination_stat is None or stat.S_IMODE(destination_stat.st_mode) != mode:
+        os.chmod(path, mode)
+
+    if preserve_owner and (
+        destination_stat is None or
+        (destination_stat.st_uid, destination_stat.st_gid) !=
+        (source_stat.st_uid, source_stat.st_gid)
+    ):
+        os.chown(path, source_stat.st_uid, source_stat.st_gid)
+
+    if destination_stat is None or destination_stat.st_mtime_ns != source_stat.st_mtime_ns:
+        os.utime(path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
+
+def sync(source, destination, delete=False, checksum=False, preserve_owner=False, workers=None):
+    """
+    Synchronises the contents of one directory to another in the manner of rsync's archive mode,
+    copying files whose size or modification time differ and preserving modes, modification
+    times and symlinks.
+
+    :param source: the source directory
+    :param destination: the destination directory (which is created if it doesn't exist)
+    :param delete: whether to delete entries in the destination which aren't in the source
+    :param checksum: whether to compare the contents of files of the same size rather than their
+                     modification times
+    :param preserve_owner: whether to preserve the owner and group of each entry (which
+                           requires root privileges)
+    :param workers: the number of threads to scan, compare and copy with or None to use the
+                    default
+
+    :return: a list of tuples containing the operation (send or del.) and relative path of each
+             change (where directories end with a slash) as reported by rsync
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+
+    os.makedirs(destination, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        source_entries = scan(source, executor, workers)
+        destination_entries = scan(destination, executor, workers)
+
+        # Remove entries which aren't in the source (if requested) and entries whose type
+        # differs from the source so that they may be replaced
+        removals = set()
+        for relpath, destination_stat in destination_entries.items():
+            source_stat = source_entries.get(relpath)
+            if source_stat is None:
+                if delete:
+                    removals.add(relpath)
+            elif stat.S_IFMT(source_stat.st_mode) != stat.S_IFMT(destination_stat.st_mode):
+                removals.add(relpath)
+
+        deleted = []
+        for relpath in sorted(removals, key=_sort_key, reverse=True):
+            destination_stat = destination_entries[relpath]
+            if relpath not in source_entries:
+                deleted.append(('del.', _display_path(relpath, destination_stat)))
+
+            # Entries within a directory being removed are removed along with it
+            if any(ancestor in removals for ancestor in _ancestors(relpath)):
+                continue
+
+            path = os.path.join(destination, relpath)
+            if stat.S_ISDIR(destination_stat.st_mode):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+        if removals:
+            destination_entries = {
+                relpath: destination_stat
+                for relpath, destination_stat in destination_entries.items()
+                if relpath not in removals and
+                not any(ancestor in removals for ancestor in _ancestors(relpath))
+            }
+
+        directories = []
+        symlinks = []
+        regular_files = []
+        for relpath in sorted(source_entries, key=_sort_key):
+            source_mode = source_entries[relpath].st_mode
+            if stat.S_ISDIR(source_mode):
+                directories.append(relpath)
+            elif stat.S_ISLNK(source_mode):
+                symlinks.append(relpath)
+            elif stat.S_ISREG(source_mode):
+                regular_files.append(relpath)
+
+        sent = set()
+
+        # Create directories before their contents
+        for relpath in directories:
+            if relpath not in destination_entries:
+                os.mkdir(os.path.join(destination, relpath))
+                sent.add(relpath)
+
+        for relpath in symlinks:
+            target = os.readlink(os.path.join(source, relpath))
+            path = os.path.join(destination, relpath)
+
+            if relpath in destination_entries:
+                if os.readlink(path) == target:
+                    continue
+                os.remove(path)
+
+            os.symlink(target, path)
+            sent.add(relpath)
+
+        # Files are compared and copied concurrently using kernel copy offload where available
+        def sync_file(relpath):
+            source_path = os.path.join(source, relpath)
+            destination_path = os.path.join(destination, relpath)
+            source_stat = source_entries[relpath]
+            destination_stat = destination_entries.get(relpath)
+
+            copied = destination_stat is None or _file_differs(
+                source_path, destination_path, source_stat, destination_stat, checksum
+            )
+            if copied:
+                files.copy(source_path, destination_path, digest_required=False)
+                destination_stat = None
+
+            _apply_attributes(destination_path, source_stat, destination_stat, preserve_owner)
+            return copied
+
+        for relpath, copied in zip(regular_files, executor.map(sync_file, regular_files)):
+            if copied:
+                sent.add(relpath)
+
+    # Directory attributes are applied last (deepest first) as their modification times change
+    # while their contents are updated
+    for relpath in reversed(directories):
+        path = os.path.join(destination, relpath)
+        _apply_attributes(
+            path, source_entries[relpath], None if relpath in sent else os.stat(path),
+            preserve_owner
+        )
+    _apply_attributes(destination, os.stat(source), os.stat(destination), preserve_owner)
+
+    return deleted + [
+        ('send', _display_path(relpath, source_entries[relpath]))
+        for relpath in sorted(sent, key=_sort_key)
+    ]
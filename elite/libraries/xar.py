@@ -0,0 +1,58 @@
+import hashlib
+import os
+import struct
+
+
+# The xar header is comprised of the magic, header size, version, compressed TOC length,
+# uncompressed TOC length and checksum algorithm
+XAR_HEADER = struct.Struct('>4sHHQQI')
+XAR_MAGIC = b'xar!'
+
+
+class XarError(Exception):
+    """An error that occurs when a file is not a valid xar archive"""
+
+
+def toc_checksum(path):
+    """
+    Determines a checksum of the table of contents of a xar archive (e.g. a flat package) which
+    changes whenever any file contained in the archive changes.
+
+    :param path: the path of the xar archive
+
+    :return: the hex digest of the xar header and compressed table of contents
+    """
+    try:
+        with open(path, 'rb') as fp:
+            header = fp.read(XAR_HEADER.size)
+            if len(header) < XAR_HEADER.size:
+                raise XarError('the file provided is too small to be a xar archive')
+
+            magic, header_size, _version, toc_length_compressed, *_ = XAR_HEADER.unpack(header)
+            if magic != XAR_MAGIC or header_size < XAR_HEADER.size:
+                raise XarError('the file provided is not a xar archive')
+
+            fp.seek(header_size)
+            toc = fp.read(toc_length_compressed)
+            if len(toc) < toc_length_compressed:
+                raise XarError('the xar archive table of contents is truncated')
+    except OSError:
+        raise XarError('unable to read the xar archive provided')
+
+    return hashlib.sha1(header + toc).hexdigest()
+
+
+def signature(path):
+    """
+    Builds a signature for a xar archive which may be used as a persistent cache key.
+
+    :param path: the path of the xar archive
+
+    :return: a tuple containing the path, size, modification time and table of contents checksum
+             or None if the signature could not be determined
+    """
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime_ns, toc_checksum(path))
+    except (OSError, XarError):
+        return None
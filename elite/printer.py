@@ -9,6 +9,9 @@ class Printer:
     def __init__(self):
         # Track the number of lines we must move upwards to overlap text
         self.overlap_lines = None
+        # Track whether progress was displayed, in which case the running text may be longer
+        # than the completed text and must be cleared
+        self.progress_displayed = False
 
     def header(self):
         """Prints the master header which hides the cursor."""
@@ -48,7 +51,7 @@ class Printer:
         else:
             return ansi.GREEN
 
-    def action(self, state, action, args, response=None):
+    def action(self, state, action, args, response=None, progress=None):
         """
         Displays progress while actions are running and also completing execution along with
         related message upon failure.
@@ -57,6 +60,8 @@ class Printer:
         :param action: the action being called
         :param args: the arguments sent to the action
         :param response: the response of the execution or None when the action is still running
+        :param progress: a message describing the progress of a running action which replaces
+                         the running action already displayed
         """
         # Determine the output colour and state text
         state_name = state.name.lower()
@@ -79,11 +84,21 @@ class Printer:
             print_status = ''
             print_chars = 0
 
-            for colour, text in [
+            print_items = [
                 (state_colour, f'{state_name:^10}'),
                 (ansi.BLUE, print_action),
                 (ansi.YELLOW, print_args)
-            ]:
+            ]
+
+            # Replace the running action already displayed with the latest progress
+            if progress is not None:
+                print_items.append((ansi.WHITE, f' ({progress})'))
+                if self.overlap_lines is not None:
+                    print('\r' + ansi.move_up(self.overlap_lines), end='', flush=True)
+                print(ansi.CLEAR_SCREEN_DOWN, end='', flush=True)
+                self.progress_displayed = True
+
+            for colour, text in print_items:
                 print_chars += len(text)
 
                 # We have reached the maximum characters possible to print in the terminal so we
@@ -106,6 +121,10 @@ class Printer:
                 # Move up to the line we wish to start printing from
                 print(ansi.move_up(self.overlap_lines), end='', flush=True)
 
+            # Clear any progress which may extend beyond the text being printed
+            if self.progress_displayed:
+                print(ansi.CLEAR_SCREEN_DOWN, end='', flush=True)
+
             print(
                 state_colour + f'{state_name:^10}' + ansi.ENDC +
                 ansi.BLUE + print_action + ansi.ENDC +
@@ -122,6 +141,7 @@ class Printer:
 
             # Reset the number of lines to overlap
             self.overlap_lines = None
+            self.progress_displayed = False
 
     def summary(self, actions):
         """
@@ -1,5 +1,7 @@
+import copy
 import subprocess
-from collections import UserDict
+from collections import UserDict, namedtuple
+from collections.abc import Mapping
 
 
 class ReversibleDict(UserDict):
@@ -67,6 +69,74 @@ def deep_merge(source, destination):
     return destination
 
 
+# The strategies available for merging a list in the source with a list in the destination
+LIST_MERGE_STRATEGIES = ['replace', 'append', 'prepend']
+
+Change = namedtuple('Change', ['path', 'old', 'new'])
+
+
+def deep_diff(source, destination, list_merge='replace'):
+    """
+    Determines the changes required to deep merge the source dict into the destination in a
+    single iterative pass.  Keys are compared as they are by deep_equal and the changes may be
+    applied using apply_changes.
+
+    :param source: the source dict to merge into the destination
+    :param destination: the destination dict to merge the source into
+    :param list_merge: how lists in the source are merged with lists in the destination; replace
+                       uses the source list, while append and prepend add the source items which
+                       are missing from the destination list to the end or start of it
+
+    :return: a list of changes, each containing the path of the key as a tuple along with its
+             old value (or None if it doesn't exist) and new value
+    """
+    changes = []
+    stack = [((), source, destination)]
+
+    while stack:
+        path, source_node, destination_node = stack.pop()
+        nested = []
+
+        for key, value in source_node.items():
+            existing = destination_node.get(key)
+
+            # Dicts are merged with existing dicts and replace any other value
+            if isinstance(value, dict) and isinstance(existing, Mapping):
+                nested.append((path + (key,), value, existing))
+                continue
+
+            if isinstance(value, list) and isinstance(existing, list) and list_merge != 'replace':
+                missing = [item for item in value if item not in existing]
+                if not missing:
+                    continue
+                value = existing + missing if list_merge == 'append' else missing + existing
+            elif value == existing:
+                continue
+
+            changes.append(Change(path + (key,), existing, value))
+
+        # Nested dicts are processed in the order their keys appear in the source
+        stack.extend(reversed(nested))
+
+    return changes
+
+
+def apply_changes(destination, changes):
+    """
+    Applies the changes determined by deep_diff to the destination dict.
+
+    :param destination: the destination dict to update
+    :param changes: the changes to be applied
+    """
+    for path, _old, new in changes:
+        node = destination
+        for key in path[:-1]:
+            node = node[key]
+
+        # Values are copied so that later changes to the destination don't alter the source
+        node[path[-1]] = copy.deepcopy(new)
+
+
 def batch(items, batch_size):
     """
     Batches up a list into multiple lists which each are of the requested batch size;
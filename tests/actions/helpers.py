@@ -1,5 +1,10 @@
+import hashlib
+import http.server
 import os
+import re
+import threading
 from collections import namedtuple
+from contextlib import contextmanager
 from subprocess import CompletedProcess
 
 
@@ -59,3 +64,104 @@ def build_open_with_permission_error(denied_path):
             return builtins_open(file, *args, **kwargs)
 
     return open_
+
+
+def build_replace_with_permission_error(denied_path):
+    os_replace = os.replace
+
+    def replace(src, dst, *args, **kwargs):
+        if dst == denied_path:
+            raise PermissionError(13, 'Permission denied', dst)
+        else:
+            return os_replace(src, dst, *args, **kwargs)
+
+    return replace
+
+
+class HTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the files of the test HTTP server, supporting range requests if enabled and
+    conditional requests using ETags.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections.append(self.client_address)
+
+    def do_GET(self):  # noqa: N802 pylint: disable=invalid-name
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+
+        if self.path not in server.files:
+            self.send_error(404)
+            return
+
+        content = server.files[self.path]
+        start, end = 0, len(content)
+
+        # Advise that the content is unchanged when the client has a matching ETag
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        # Ranges are ignored when the client's If-Range validator doesn't match the content
+        range_match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        if server.ranges and range_match and (if_range is None or if_range == etag):
+            start = int(range_match.group(1))
+            if range_match.group(2):
+                end = int(range_match.group(2)) + 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(content)}')
+        else:
+            self.send_response(200)
+
+        if server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(end - start))
+        self.end_headers()
+
+        # Simulate an interrupted download by closing the connection after the limit
+        limit = end if server.fail_after is None else min(end, start + server.fail_after)
+        self.wfile.write(content[start:limit])
+        if limit < end:
+            self.close_connection = True
+
+    def log_message(self, format, *args):  # noqa: A002 pylint: disable=redefined-builtin
+        pass
+
+
+@contextmanager
+def http_server(files, ranges=True, fail_after=None):
+    """
+    Runs a local HTTP server in a background thread.
+
+    :param files: a dict mapping each URL path to the content served
+    :param ranges: whether the server supports range requests
+    :param fail_after: the number of bytes after which each response is cut short or None
+
+    :return: a context manager yielding the server whose URL is available in its url attribute,
+             the requests it received in its requests attribute and the address of each client
+             connection in its connections attribute
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), HTTPRequestHandler)
+    server.files = files
+    server.ranges = ranges
+    server.fail_after = fail_after
+    server.requests = []
+    server.connections = []
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,8 +1,14 @@
 import os
+import shutil
+import subprocess
+import tarfile
+import zipfile
+from unittest import mock
 
 import pytest
 from elite.actions import ActionError, ActionResponse
 from elite.actions.archive import Archive
+from elite.libraries import files
 
 
 FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -130,6 +136,92 @@ def test_zip_existing(tmpdir):
     assert archive.process() == ActionResponse(changed=False)
 
 
+def test_zip_existing_modified(tmpdir):
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(
+        path=p.strpath,
+        source=os.path.join(FIXTURE_PATH, 'archive', 'archive.zip')
+    )
+    assert archive.process() == ActionResponse(changed=True)
+
+    # Contents which differ but are the same size are detected using the CRC of the file
+    contents = p.join('directory1/file1.txt').read_binary()
+    p.join('directory1/file1.txt').write_binary(b'x' * len(contents))
+    assert archive.process() == ActionResponse(changed=True)
+    assert p.join('directory1/file1.txt').read_binary() == contents
+
+
+def test_zip_manifest(tmpdir, monkeypatch):
+    sp = tmpdir.join('archive.zip')
+    sp.write_binary(open(os.path.join(FIXTURE_PATH, 'archive', 'archive.zip'), 'rb').read())
+    p = tmpdir.mkdir('directory')
+    pcp = tmpdir.join('cache')
+
+    archive = Archive(path=p.strpath, source=sp.strpath, persistent_cache_base_dir=pcp.strpath)
+    assert archive.process() == ActionResponse(changed=True)
+
+    # The archive needn't be opened when neither it nor the extracted files have changed
+    with mock.patch('zipfile.ZipFile', side_effect=AssertionError):
+        assert archive.process() == ActionResponse(changed=False)
+
+        os.utime(sp.strpath, ns=(0, 0))
+        assert archive.process() == ActionResponse(changed=False)
+
+    # Only files which have changed since they were extracted are verified
+    crc32 = mock.Mock(side_effect=files.crc32)
+    monkeypatch.setattr('elite.libraries.files.crc32', crc32)
+
+    contents = p.join('directory1/file1.txt').read_binary()
+    p.join('directory1/file1.txt').write_binary(b'x' * len(contents))
+    assert archive.process() == ActionResponse(changed=True)
+    assert p.join('directory1/file1.txt').read_binary() == contents
+    assert crc32.call_args_list == [mock.call(p.join('directory1/file1.txt').strpath)]
+
+    assert archive.process() == ActionResponse(changed=False)
+
+
+def test_zip_workers(tmpdir):
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(
+        path=p.strpath,
+        source=os.path.join(FIXTURE_PATH, 'archive', 'archive.zip'),
+        preserve_mode=True,
+        workers=3
+    )
+    assert archive.process() == ActionResponse(changed=True)
+
+    assert p.join('hello.txt').isfile()
+    assert oct(p.join('hello.txt').stat().mode)[-4:] == '0644'
+    assert p.join('directory1/file1.txt').isfile()
+    assert oct(p.join('directory1/file1.txt').stat().mode)[-4:] == '0600'
+    assert p.join('directory2/file4.txt').isfile()
+    assert oct(p.join('directory2/file4.txt').stat().mode)[-4:] == '0666'
+
+    assert archive.process() == ActionResponse(changed=False)
+
+
+def test_zip_workers_compression_types(tmpdir):
+    sp = tmpdir.join('archive.zip')
+    dp = tmpdir.mkdir('directory')
+
+    contents = {
+        f'directory{index % 3}/file{index}.bin': os.urandom(index * 1024)
+        for index in range(1, 21)
+    }
+    with zipfile.ZipFile(sp.strpath, 'w') as zip_file:
+        for index, (filepath, data) in enumerate(sorted(contents.items())):
+            compress_type = zipfile.ZIP_STORED if index % 2 else zipfile.ZIP_DEFLATED
+            zip_file.writestr(filepath, data, compress_type=compress_type)
+
+    archive = Archive(path=dp.strpath, source=sp.strpath, workers=4)
+    assert archive.process() == ActionResponse(changed=True)
+
+    for filepath, data in contents.items():
+        assert dp.join(filepath).read_binary() == data
+
+
 def test_rar_preserve(tmpdir):
     p = tmpdir.mkdir('directory')
 
@@ -158,6 +250,43 @@ def test_rar_preserve(tmpdir):
     assert oct(p.join('directory2/file4.txt').stat().mode)[-4:] == '0666'
 
 
+@pytest.mark.skipif(
+    not shutil.which('unrar') and not shutil.which('bsdtar'), reason='requires unrar or bsdtar'
+)
+def test_rar_single_process(tmpdir):
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(
+        path=p.strpath,
+        source=os.path.join(FIXTURE_PATH, 'archive', 'archive.rar')
+    )
+    with mock.patch('elite.actions.archive.Archive.extract_member', side_effect=AssertionError):
+        assert archive.process() == ActionResponse(changed=True)
+
+    assert p.join('hello.txt').isfile()
+    assert p.join('directory1/file1.txt').isfile()
+    assert oct(p.join('directory1/file1.txt').stat().mode)[-4:] == '0600'
+    assert p.join('directory2/file4.txt').isfile()
+    assert sorted(f.basename for f in p.listdir()) == ['directory1', 'directory2', 'hello.txt']
+
+
+def test_rar_without_extraction_tool(tmpdir, monkeypatch):
+    p = tmpdir.mkdir('directory')
+
+    monkeypatch.setattr('shutil.which', lambda cmd: None)
+
+    archive = Archive(
+        path=p.strpath,
+        source=os.path.join(FIXTURE_PATH, 'archive', 'archive.rar')
+    )
+    with mock.patch('elite.actions.archive.Archive.run', side_effect=AssertionError):
+        assert archive.process() == ActionResponse(changed=True)
+
+    assert p.join('hello.txt').isfile()
+    assert p.join('directory1/file1.txt').isfile()
+    assert p.join('directory2/file4.txt').isfile()
+
+
 def test_rar_no_preserve(tmpdir):
     p = tmpdir.mkdir('directory')
 
@@ -260,3 +389,152 @@ def test_base_dir(tmpdir):
     assert not p.join('hello.txt').isfile()
     assert p.join('file1.txt').isfile()
     assert p.join('file2.txt').isfile()
+
+
+def build_tar(tmpdir, filename, mode):
+    sp = tmpdir.mkdir('source')
+    sp.join('hello.txt').write('Hello there')
+    sp.join('hello.txt').chmod(0o644)
+    d1 = sp.mkdir('directory1')
+    d1.chmod(0o755)
+    d1.join('file1.txt').write('Hello file1')
+    d1.join('file1.txt').chmod(0o600)
+    d1.join('symlink1.txt').mksymlinkto('file1.txt')
+    os.link(d1.join('file1.txt').strpath, d1.join('hardlink1.txt').strpath)
+    d2 = sp.mkdir('directory2')
+    d2.chmod(0o700)
+    d2.join('file2.txt').write('Hello file2')
+    d2.join('file2.txt').chmod(0o666)
+
+    for path in sp.visit():
+        os.utime(path.strpath, (1000000000, 1000000000), follow_symlinks=False)
+
+    tp = tmpdir.join(filename)
+    with tarfile.open(tp.strpath, f'w:{mode}') as tar_file:
+        for name in [
+            'hello.txt', 'directory1', 'directory1/file1.txt', 'directory1/symlink1.txt',
+            'directory1/hardlink1.txt', 'directory2', 'directory2/file2.txt'
+        ]:
+            tar_file.add(sp.join(name).strpath, arcname=name, recursive=False)
+    return tp
+
+
+def test_tar_preserve(tmpdir):
+    sp = build_tar(tmpdir, 'archive.tar', '')
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(path=p.strpath, source=sp.strpath, preserve_mode=True)
+    assert archive.process() == ActionResponse(changed=True)
+
+    assert p.join('hello.txt').read() == 'Hello there'
+    assert oct(p.join('hello.txt').stat().mode)[-4:] == '0644'
+
+    assert p.join('directory1').isdir()
+    assert oct(p.join('directory1').stat().mode)[-4:] == '0755'
+    assert p.join('directory1/file1.txt').read() == 'Hello file1'
+    assert oct(p.join('directory1/file1.txt').stat().mode)[-4:] == '0600'
+    assert p.join('directory1/symlink1.txt').readlink() == 'file1.txt'
+    assert os.path.samefile(
+        p.join('directory1/hardlink1.txt').strpath, p.join('directory1/file1.txt').strpath
+    )
+
+    assert p.join('directory2').isdir()
+    assert oct(p.join('directory2').stat().mode)[-4:] == '0700'
+    assert p.join('directory2/file2.txt').read() == 'Hello file2'
+    assert oct(p.join('directory2/file2.txt').stat().mode)[-4:] == '0666'
+
+
+def test_tar_compressed(tmpdir):
+    for filename, mode in [
+        ('archive.tar.gz', 'gz'), ('archive.tbz2', 'bz2'), ('archive.txz', 'xz')
+    ]:
+        tp = tmpdir.mkdir(mode)
+        sp = build_tar(tp, filename, mode)
+        p = tp.mkdir('directory')
+
+        archive = Archive(path=p.strpath, source=sp.strpath)
+        assert archive.process() == ActionResponse(changed=True)
+        assert p.join('hello.txt').read() == 'Hello there'
+        assert p.join('directory2/file2.txt').read() == 'Hello file2'
+
+
+@pytest.mark.skipif(not shutil.which('zstd'), reason='requires zstd')
+def test_tar_zst(tmpdir):
+    tp = build_tar(tmpdir, 'archive.tar', '')
+    sp = tmpdir.join('archive.tar.zst')
+    subprocess.run(['zstd', '--quiet', tp.strpath, '-o', sp.strpath], check=True)
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(path=p.strpath, source=sp.strpath)
+    assert archive.process() == ActionResponse(changed=True)
+    assert p.join('hello.txt').read() == 'Hello there'
+    assert p.join('directory2/file2.txt').read() == 'Hello file2'
+    assert archive.process() == ActionResponse(changed=False)
+
+
+def test_tar_existing(tmpdir):
+    sp = build_tar(tmpdir, 'archive.tar.gz', 'gz')
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(path=p.strpath, source=sp.strpath)
+    assert archive.process() == ActionResponse(changed=True)
+    assert archive.process() == ActionResponse(changed=False)
+
+    p.join('directory2/file2.txt').write('Hello there')
+    assert archive.process() == ActionResponse(changed=True)
+    assert p.join('directory2/file2.txt').read() == 'Hello file2'
+
+
+def test_tar_ignore_and_base_dir(tmpdir):
+    sp = build_tar(tmpdir, 'archive.tar', '')
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(
+        path=p.strpath, source=sp.strpath, base_dir='directory1', ignore_files=['symlink1.txt']
+    )
+    assert archive.process() == ActionResponse(changed=True)
+    assert sorted(f.basename for f in p.listdir()) == ['file1.txt', 'hardlink1.txt']
+
+
+def test_tar_parent_reference(tmpdir):
+    sp = tmpdir.join('archive.tar')
+    tmpdir.join('evil.txt').write('Evil')
+    p = tmpdir.mkdir('directory')
+
+    with tarfile.open(sp.strpath, 'w') as tar_file:
+        tar_file.add(tmpdir.join('evil.txt').strpath, arcname='../evil')
+
+    archive = Archive(path=p.strpath, source=sp.strpath)
+    with pytest.raises(ActionError):
+        archive.process()
+    assert not tmpdir.join('evil').exists()
+
+
+def test_tar_write_through_symlink(tmpdir):
+    sp = tmpdir.join('archive.tar')
+    tmpdir.join('evil.txt').write('Evil')
+    op = tmpdir.mkdir('outside')
+    p = tmpdir.mkdir('directory')
+
+    with tarfile.open(sp.strpath, 'w') as tar_file:
+        link_info = tarfile.TarInfo('link')
+        link_info.type = tarfile.SYMTYPE
+        link_info.linkname = op.strpath
+        tar_file.addfile(link_info)
+        tar_file.add(tmpdir.join('evil.txt').strpath, arcname='link/evil.txt')
+
+    archive = Archive(path=p.strpath, source=sp.strpath)
+    with pytest.raises(ActionError):
+        archive.process()
+    assert p.join('link').readlink() == op.strpath
+    assert not op.join('evil.txt').exists()
+
+
+def test_tar_archive_contents_invalid(tmpdir):
+    sp = tmpdir.join('archive.tar.gz')
+    sp.write('hmmm')
+    p = tmpdir.mkdir('directory')
+
+    archive = Archive(path=p.strpath, source=sp.strpath)
+    with pytest.raises(ActionError):
+        archive.process()
@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 import pytest
@@ -5,6 +6,7 @@ import vcr
 from elite.actions import ActionError, ActionResponse
 from elite.actions.download import Download
 
+from . import helpers
 from .helpers import build_open_with_permission_error
 
 
@@ -14,7 +16,7 @@ FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
 def test_path_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('data.dmg')
 
-    monkeypatch.setattr('builtins.open', build_open_with_permission_error(p.strpath))
+    monkeypatch.setattr('builtins.open', build_open_with_permission_error(f'{p.strpath}.part'))
 
     download = Download(url='https://www.eventideaudio.com/downloader/1165', path=p.strpath)
     with vcr.use_cassette(os.path.join(FIXTURE_PATH, 'download', 'eventide.yaml')):
@@ -83,3 +85,296 @@ def test_filename_from_url_inexistent(tmpdir):
     with vcr.use_cassette(os.path.join(FIXTURE_PATH, 'download', 'google.yaml')):
         with pytest.raises(ActionError):
             download.process()
+
+
+def test_download_part_file_moved_into_place(tmpdir):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+
+    assert p.read_binary() == content
+    assert not tmpdir.join('data.bin.part').exists()
+
+
+def test_download_interrupted_and_resumed(tmpdir):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}, fail_after=30000) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath)
+        with pytest.raises(ActionError):
+            download.process()
+
+        # The partial download is not considered to be complete
+        assert not p.exists()
+        assert tmpdir.join('data.bin.part').size() == 30000
+
+        server.fail_after = None
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert server.requests[-1][1]['Range'] == 'bytes=30000-99999'
+        assert server.requests[-1][1]['If-Range'] == f'"{hashlib.md5(content).hexdigest()}"'
+
+    assert p.read_binary() == content
+    assert not tmpdir.join('data.bin.part').exists()
+    assert not tmpdir.join('data.bin.part.validator').exists()
+
+
+def test_download_interrupted_and_changed(tmpdir):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}, fail_after=30000) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath)
+        with pytest.raises(ActionError):
+            download.process()
+
+        # The download has changed since it was interrupted, so it's started again
+        content = os.urandom(100000)
+        server.files['/data.bin'] = content
+        server.fail_after = None
+        server.requests.clear()
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert len(server.requests) == 1
+
+    assert p.read_binary() == content
+
+
+def test_download_resume_without_validator(tmpdir):
+    p = tmpdir.join('data.bin')
+    tmpdir.join('data.bin.part').write_binary(b'hmmm')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert len(server.requests) == 1
+
+    assert p.read_binary() == content
+
+
+def test_download_resume_range_ignored(tmpdir, monkeypatch):
+    p = tmpdir.join('data.bin')
+    tmpdir.join('data.bin.part').write_binary(b'hmmm')
+    tmpdir.join('data.bin.part.validator').write('"stale"')
+    content = os.urandom(100000)
+
+    # The download changes after its validator is obtained, so the server ignores the range
+    # and the download is restarted using the initial request
+    monkeypatch.setattr(Download, 'range_validator', lambda self, headers: '"stale"')
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert server.requests[-1][1]['If-Range'] == '"stale"'
+
+    assert p.read_binary() == content
+
+
+def test_download_resume_unsupported(tmpdir):
+    p = tmpdir.join('data.bin')
+    tmpdir.join('data.bin.part').write_binary(b'hmmm')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}, ranges=False) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert len(server.requests) == 1
+
+    assert p.read_binary() == content
+
+
+def test_download_workers(tmpdir, monkeypatch):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    monkeypatch.setattr('elite.actions.download.MIN_RANGE_SIZE', 10000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath, workers=4)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert sorted(headers['Range'] for _path, headers in server.requests[1:]) == [
+            'bytes=0-24999', 'bytes=25000-49999', 'bytes=50000-74999', 'bytes=75000-99999'
+        ]
+
+    assert p.read_binary() == content
+    assert not tmpdir.join('data.bin.part').exists()
+    assert not tmpdir.join('data.bin.part.progress').exists()
+
+
+def test_download_workers_stale_part_file(tmpdir, monkeypatch):
+    p = tmpdir.join('data.bin')
+    tmpdir.join('data.bin.part').write_binary(b'OLD' * 50000)
+    content = os.urandom(100000)
+
+    monkeypatch.setattr('elite.actions.download.MIN_RANGE_SIZE', 10000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath, workers=4)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+
+    assert p.read_binary() == content
+
+
+def test_download_workers_interrupted_and_resumed(tmpdir, monkeypatch):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    monkeypatch.setattr('elite.actions.download.MIN_RANGE_SIZE', 10000)
+    monkeypatch.setattr('elite.actions.download.PROGRESS_SAVE_INTERVAL', 1)
+
+    with helpers.http_server({'/data.bin': content}, fail_after=10000) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath, workers=4)
+        with pytest.raises(ActionError):
+            download.process()
+
+        assert not p.exists()
+        assert tmpdir.join('data.bin.part.progress').exists()
+
+        server.fail_after = None
+        server.requests.clear()
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert sorted(headers['Range'] for _path, headers in server.requests[1:]) == [
+            'bytes=10000-24999', 'bytes=35000-49999', 'bytes=60000-74999', 'bytes=85000-99999'
+        ]
+
+    assert p.read_binary() == content
+    assert not tmpdir.join('data.bin.part.progress').exists()
+
+
+def test_checksum_verified(tmpdir):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+    checksum = f'sha256:{hashlib.sha256(content).hexdigest()}'
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath, checksum=checksum)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+
+    assert p.read_binary() == content
+
+
+def test_checksum_mismatch(tmpdir):
+    p = tmpdir.join('data.bin')
+    checksum = f'sha256:{hashlib.sha256(b"other").hexdigest()}'
+
+    with helpers.http_server({'/data.bin': os.urandom(100000)}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath, checksum=checksum)
+        with pytest.raises(ActionError):
+            download.process()
+
+    assert not p.exists()
+    assert not tmpdir.join('data.bin.part').exists()
+
+
+def test_checksum_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        Download(url='https://example.com/data.bin', path=tmpdir.strpath, checksum='wow:1234')
+
+    with pytest.raises(ValueError):
+        Download(url='https://example.com/data.bin', path=tmpdir.strpath, checksum='sha256:wow')
+
+
+def test_checksum_existing_mismatch_replaced(tmpdir):
+    p = tmpdir.join('data.bin')
+    p.write_binary(b'stale')
+    content = os.urandom(100000)
+    checksum = f'sha256:{hashlib.sha256(content).hexdigest()}'
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(url=f'{server.url}/data.bin', path=p.strpath, checksum=checksum)
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+
+    assert p.read_binary() == content
+
+
+def test_checksum_served_from_cache(tmpdir):
+    cache_dir = tmpdir.mkdir('cache')
+    destination_dir = tmpdir.mkdir('destination')
+    content = os.urandom(100000)
+    checksum = f'sha256:{hashlib.sha256(content).hexdigest()}'
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(
+            url=f'{server.url}/data.bin', path=tmpdir.join('data.bin').strpath,
+            checksum=checksum, persistent_cache_base_dir=cache_dir.strpath
+        )
+        assert download.process().changed
+        assert len(server.requests) == 1
+
+        # Both the filename and contents are known, so no requests are required
+        server.requests.clear()
+        download = Download(
+            url=f'{server.url}/data.bin', path=destination_dir.strpath,
+            checksum=checksum, persistent_cache_base_dir=cache_dir.strpath
+        )
+        p = destination_dir.join('data.bin')
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert len(server.requests) == 1
+
+        server.requests.clear()
+        assert download.process() == ActionResponse(changed=False, data={'path': p.strpath})
+        assert server.requests == []
+
+        # An explicit filepath may be populated from the cache immediately
+        p = tmpdir.join('copy.bin')
+        download = Download(
+            url=f'{server.url}/data.bin', path=p.strpath,
+            checksum=checksum, persistent_cache_base_dir=cache_dir.strpath
+        )
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert server.requests == []
+
+    assert p.read_binary() == content
+
+
+def test_refresh(tmpdir):
+    cache_dir = tmpdir.mkdir('cache')
+    destination_dir = tmpdir.mkdir('destination')
+    p = destination_dir.join('data.bin')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(
+            url=f'{server.url}/data.bin', path=destination_dir.strpath, refresh=True,
+            persistent_cache_base_dir=cache_dir.strpath
+        )
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert 'If-None-Match' not in server.requests[0][1]
+
+        # The server advises that the download is unchanged
+        server.requests.clear()
+        assert download.process() == ActionResponse(changed=False, data={'path': p.strpath})
+        assert server.requests[0][1]['If-None-Match'] == (
+            f'"{hashlib.md5(content).hexdigest()}"'
+        )
+
+        # Only a changed download is transferred again
+        content = os.urandom(100000)
+        server.files['/data.bin'] = content
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+
+    assert p.read_binary() == content
+
+
+def test_refresh_modified_locally(tmpdir):
+    cache_dir = tmpdir.mkdir('cache')
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        download = Download(
+            url=f'{server.url}/data.bin', path=p.strpath, refresh=True,
+            persistent_cache_base_dir=cache_dir.strpath
+        )
+        assert download.process().changed
+
+        # Validators no longer apply once the download is modified
+        p.write_binary(b'modified')
+        server.requests.clear()
+        assert download.process() == ActionResponse(changed=True, data={'path': p.strpath})
+        assert 'If-None-Match' not in server.requests[0][1]
+
+    assert p.read_binary() == content
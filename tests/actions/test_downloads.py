@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+import pytest
+from elite.actions import ActionError, ActionResponse
+from elite.actions.downloads import Downloads
+
+from . import helpers
+
+
+def test_argument_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        Downloads(downloads=[
+            {'url': 'https://example.com/data1.bin', 'path': tmpdir.strpath},
+            {'url': 'https://example.com/data2.bin', 'path': tmpdir.strpath, 'checksum': 'wow'}
+        ])
+
+
+def test_changed(tmpdir):
+    p1 = tmpdir.join('data1.bin')
+    p2 = tmpdir.join('data2.bin')
+    content1 = os.urandom(10000)
+    content2 = os.urandom(10000)
+
+    with helpers.http_server({'/data1.bin': content1, '/data2.bin': content2}) as server:
+        downloads = Downloads(downloads=[
+            {'url': f'{server.url}/data1.bin', 'path': tmpdir.strpath},
+            {
+                'url': f'{server.url}/data2.bin', 'path': p2.strpath,
+                'checksum': f'sha256:{hashlib.sha256(content2).hexdigest()}'
+            }
+        ], workers=2, host_workers=1)
+        assert downloads.process() == ActionResponse(changed=True, data={'results': [
+            {'url': f'{server.url}/data1.bin', 'path': p1.strpath, 'changed': True},
+            {'url': f'{server.url}/data2.bin', 'path': p2.strpath, 'changed': True}
+        ]})
+
+        # Only one download runs at a time for the host, so a single connection is reused
+        assert len(server.requests) == 2
+        assert len(server.connections) == 1
+
+    assert p1.read_binary() == content1
+    assert p2.read_binary() == content2
+
+
+def test_ok(tmpdir):
+    p1 = tmpdir.join('data1.bin')
+    p1.write_binary(b'existing')
+    p2 = tmpdir.join('data2.bin')
+    p2.write_binary(b'existing')
+
+    with helpers.http_server({'/data1.bin': b'existing', '/data2.bin': b'existing'}) as server:
+        downloads = Downloads(downloads=[
+            {'url': f'{server.url}/data1.bin', 'path': p1.strpath},
+            {'url': f'{server.url}/data2.bin', 'path': p2.strpath}
+        ])
+        assert downloads.process() == ActionResponse(changed=False, data={'results': [
+            {'url': f'{server.url}/data1.bin', 'path': p1.strpath, 'changed': False},
+            {'url': f'{server.url}/data2.bin', 'path': p2.strpath, 'changed': False}
+        ]})
+
+
+def test_failed(tmpdir):
+    with helpers.http_server({'/data1.bin': b'data'}) as server:
+        downloads = Downloads(downloads=[
+            {'url': f'{server.url}/data1.bin', 'path': tmpdir.join('data1.bin').strpath},
+            {'url': f'{server.url}/data2.bin', 'path': tmpdir.join('data2.bin').strpath}
+        ])
+        with pytest.raises(ActionError, match='data2.bin'):
+            downloads.process()
+
+    assert tmpdir.join('data1.bin').read_binary() == b'data'
+
+
+def test_failed_many(tmpdir):
+    with helpers.http_server({'/data2.bin': b'data'}) as server:
+        downloads = Downloads(downloads=[
+            {'url': f'{server.url}/data1.bin', 'path': tmpdir.join('data1.bin').strpath},
+            {'url': f'{server.url}/data2.bin', 'path': tmpdir.join('data2.bin').strpath},
+            {'url': f'{server.url}/data3.bin', 'path': tmpdir.join('data3.bin').strpath}
+        ])
+        with pytest.raises(ActionError) as e:
+            downloads.process()
+
+    assert e.value.args[0].startswith('unable to download 2 of 3 URLs: ')
+    assert f'{server.url}/data1.bin' in e.value.args[0]
+    assert f'{server.url}/data3.bin' in e.value.args[0]
+    assert tmpdir.join('data2.bin').read_binary() == b'data'
+
+
+def test_progress(tmpdir):
+    messages = []
+    with helpers.http_server({'/data1.bin': b'data1', '/data2.bin': b'data2'}) as server:
+        downloads = Downloads(downloads=[
+            {'url': f'{server.url}/data1.bin', 'path': tmpdir.join('data1.bin').strpath},
+            {'url': f'{server.url}/data2.bin', 'path': tmpdir.join('data2.bin').strpath}
+        ], progress_fn=messages.append)
+        assert downloads.process().changed
+
+    assert messages == ['1 of 2 downloads complete', '2 of 2 downloads complete']
+
+
+def test_download_workers(tmpdir, monkeypatch):
+    p = tmpdir.join('data.bin')
+    content = os.urandom(100000)
+
+    monkeypatch.setattr('elite.actions.download.MIN_RANGE_SIZE', 10000)
+
+    with helpers.http_server({'/data.bin': content}) as server:
+        downloads = Downloads(downloads=[
+            {'url': f'{server.url}/data.bin', 'path': p.strpath, 'workers': 2}
+        ])
+        assert downloads.process().changed
+        assert len(server.requests) == 3
+
+    assert p.read_binary() == content
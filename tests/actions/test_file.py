@@ -1,5 +1,6 @@
 import os
 import shutil
+from unittest import mock
 
 import pytest
 from elite.actions import ActionError, ActionResponse
@@ -128,22 +129,20 @@ def test_file_source_and_path_not_writable(tmpdir, monkeypatch):
     sp = tmpdir.join('source.txt')
     sp.write('Hello there')
 
-    builtins_open = open
+    os_open = os.open
 
-    def open_(  # pylint: disable=unused-argument
-        file, mode='r', buffering=-1, encoding=None, errors=None, newline=None, closefd=True,
-        opener=None
-    ):
-        if file == dp.strpath and mode == 'wb':
-            raise PermissionError(13, 'Permission denied', file)
+    def open_(path, flags, *args, **kwargs):
+        if os.path.dirname(path) == tmpdir.strpath and flags & os.O_WRONLY:
+            raise PermissionError(13, 'Permission denied', path)
         else:
-            return builtins_open(file, mode, buffering, encoding, errors, newline, closefd, opener)
+            return os_open(path, flags, *args, **kwargs)
 
-    monkeypatch.setattr('builtins.open', open_)
+    monkeypatch.setattr('os.open', open_)
 
     file = File(path=dp.strpath, source=sp.strpath, state='file')
     with pytest.raises(ActionError):
         file.process()
+    assert dp.read() == ''
 
 
 def test_file_source_directory(tmpdir):
@@ -198,6 +197,116 @@ def test_file_source_exists_same(tmpdir):
     assert file.process() == ActionResponse(changed=False, data={'path': dp.strpath})
 
 
+def test_file_source_exists_different_size(tmpdir, monkeypatch):
+    dp = tmpdir.join('testing.txt')
+    dp.write('Goodbye')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    monkeypatch.setattr('elite.libraries.files.compare', mock.Mock(side_effect=AssertionError))
+
+    file = File(path=dp.strpath, source=sp.strpath, state='file')
+    assert file.process() == ActionResponse(changed=True, data={'path': dp.strpath})
+    assert dp.read() == 'Hello there'
+
+
+def test_file_source_exists_same_cached(tmpdir, monkeypatch):
+    dp = tmpdir.join('testing.txt')
+    dp.write('Hello there')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+    pcp = tmpdir.join('persistent_cache')
+
+    file = File(
+        path=dp.strpath, source=sp.strpath, state='file', persistent_cache_base_dir=pcp.strpath
+    )
+    assert file.process() == ActionResponse(changed=False, data={'path': dp.strpath})
+
+    builtins_open = open
+
+    def open_(file, mode='r', *args, **kwargs):
+        if file in [sp.strpath, dp.strpath]:
+            raise AssertionError(f'unexpected read of {file}')
+        return builtins_open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr('builtins.open', open_)
+
+    file = File(
+        path=dp.strpath, source=sp.strpath, state='file', persistent_cache_base_dir=pcp.strpath
+    )
+    assert file.process() == ActionResponse(changed=False, data={'path': dp.strpath})
+
+
+def test_file_source_exists_different_cached(tmpdir):
+    dp = tmpdir.join('testing.txt')
+    dp.write('Hello there')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+    pcp = tmpdir.join('persistent_cache')
+
+    file = File(
+        path=dp.strpath, source=sp.strpath, state='file', persistent_cache_base_dir=pcp.strpath
+    )
+    assert file.process() == ActionResponse(changed=False, data={'path': dp.strpath})
+
+    sp.write('Hello where')
+    os.utime(sp.strpath, ns=(0, 0))
+
+    file = File(
+        path=dp.strpath, source=sp.strpath, state='file', persistent_cache_base_dir=pcp.strpath
+    )
+    assert file.process() == ActionResponse(changed=True, data={'path': dp.strpath})
+    assert dp.read() == 'Hello where'
+
+
+def test_file_source_exists_different_preserves_mode(tmpdir):
+    dp = tmpdir.join('testing.txt')
+    dp.write('Goodbye there')
+    dp.chmod(0o600)
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    file = File(path=dp.strpath, source=sp.strpath, state='file')
+    assert file.process() == ActionResponse(changed=True, data={'path': dp.strpath})
+    assert dp.read() == 'Hello there'
+    assert oct(dp.stat().mode)[-4:] == '0600'
+    assert sorted(tmpdir.listdir()) == [sp, dp]
+
+
+def test_file_source_exists_different_symlink(tmpdir):
+    tp = tmpdir.join('target.txt')
+    tp.write('Goodbye there')
+    dp = tmpdir.join('testing.txt')
+    dp.mksymlinkto(tp)
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    file = File(path=dp.strpath, source=sp.strpath, state='file')
+    assert file.process() == ActionResponse(changed=True, data={'path': dp.strpath})
+    assert dp.islink()
+    assert tp.read() == 'Hello there'
+
+
+def test_file_source_copied_cached(tmpdir, monkeypatch):
+    dp = tmpdir.join('testing.txt')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+    pcp = tmpdir.join('persistent_cache')
+
+    file = File(
+        path=dp.strpath, source=sp.strpath, state='file', persistent_cache_base_dir=pcp.strpath
+    )
+    assert file.process() == ActionResponse(changed=True, data={'path': dp.strpath})
+
+    monkeypatch.setattr('elite.libraries.files.compare', mock.Mock(side_effect=AssertionError))
+    monkeypatch.setattr('elite.libraries.files.digest', mock.Mock(side_effect=AssertionError))
+
+    file = File(
+        path=dp.strpath, source=sp.strpath, state='file', persistent_cache_base_dir=pcp.strpath
+    )
+    assert file.process() == ActionResponse(changed=False, data={'path': dp.strpath})
+
+
 def test_directory_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('directory')
 
@@ -231,6 +340,23 @@ def test_directory_exists(tmpdir):
     assert file.process() == ActionResponse(changed=False, data={'path': p.strpath})
 
 
+def test_directory_exists_recurse(tmpdir):
+    p = tmpdir.mkdir('directory')
+    p.mkdir('subdirectory').join('file1.txt').ensure().chmod(0o600)
+    p.join('file2.txt').ensure().chmod(0o640)
+
+    file = File(path=p.strpath, state='directory', mode='0640', recurse=True)
+    assert file.process() == ActionResponse(
+        changed=True, data={'path': p.strpath, 'changed_entries': 3}
+    )
+    assert oct(p.join('subdirectory/file1.txt').stat().mode)[-4:] == '0640'
+
+    file = File(path=p.strpath, state='directory', mode='0640', recurse=True)
+    assert file.process() == ActionResponse(
+        changed=False, data={'path': p.strpath, 'changed_entries': 0}
+    )
+
+
 def test_symlink_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('testing.txt')
 
@@ -1,8 +1,10 @@
 import os
 import shutil
+from unittest import mock
 
 from elite.actions import ActionResponse
 from elite.actions.file_info import FileInfo
+from tests import helpers
 
 
 FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -95,6 +97,39 @@ def test_alias_exists(tmpdir):
         os.remove('/private/var/tmp/test.txt')
 
 
+def test_alias_exists_recorded_path(tmpdir, monkeypatch):
+    p = tmpdir.join('test.alias')
+    sp = tmpdir.join('test.txt').ensure()
+    p.write_binary(helpers.build_bookmark_file(sp.strpath))
+
+    monkeypatch.setattr('elite.actions.file_info.NSURL', mock.Mock(side_effect=AssertionError))
+
+    file_info = FileInfo(path=p.strpath)
+    assert file_info.process() == ActionResponse(changed=False, data={
+        'exists': True,
+        'file_type': 'alias',
+        'source': sp.strpath,
+        'mount': False,
+        'flags': []
+    })
+
+
+def test_file_with_contents_with_aliases(tmpdir, monkeypatch):
+    p = tmpdir.join('test.txt')
+    p.write('Hello there')
+
+    monkeypatch.setattr('elite.actions.file_info.NSURL', mock.Mock(side_effect=AssertionError))
+
+    file_info = FileInfo(path=p.strpath)
+    assert file_info.process() == ActionResponse(changed=False, data={
+        'exists': True,
+        'file_type': 'file',
+        'source': None,
+        'mount': False,
+        'flags': []
+    })
+
+
 def test_file_flags(tmpdir):
     p = tmpdir.join('test.txt').ensure()
     os.chflags(p.strpath, 0b1000000000000000)
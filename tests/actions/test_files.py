@@ -0,0 +1,124 @@
+import pytest
+from elite.actions import ActionError, ActionResponse
+from elite.actions.files import Files
+
+
+def test_argument_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        Files(files=[
+            {'path': tmpdir.join('testing.txt').strpath},
+            {'path': tmpdir.join('symlink').strpath, 'state': 'symlink'}
+        ])
+
+
+def test_changed(tmpdir):
+    dp1 = tmpdir.join('testing1.txt')
+    dp1.write('Hello there')
+    dp2 = tmpdir.join('testing2.txt')
+    dp3 = tmpdir.join('directory')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    files = Files(files=[
+        {'path': dp1.strpath, 'source': sp.strpath},
+        {'path': dp2.strpath, 'source': sp.strpath, 'mode': '0600'},
+        {'path': dp3.strpath, 'state': 'directory'}
+    ], workers=2)
+    assert files.process() == ActionResponse(changed=True, data={'results': [
+        {'path': dp1.strpath, 'changed': False},
+        {'path': dp2.strpath, 'changed': True},
+        {'path': dp3.strpath, 'changed': True}
+    ]})
+    assert dp2.read() == 'Hello there'
+    assert oct(dp2.stat().mode)[-4:] == '0600'
+    assert dp3.isdir()
+
+
+def test_ok(tmpdir):
+    dp1 = tmpdir.join('testing1.txt')
+    dp1.write('Hello there')
+    dp2 = tmpdir.join('testing2.txt')
+    dp2.write('Hello there')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    files = Files(files=[
+        {'path': dp1.strpath, 'source': sp.strpath},
+        {'path': dp2.strpath, 'source': sp.strpath}
+    ])
+    assert files.process() == ActionResponse(changed=False, data={'results': [
+        {'path': dp1.strpath, 'changed': False},
+        {'path': dp2.strpath, 'changed': False}
+    ]})
+
+
+def test_nested(tmpdir):
+    dp1 = tmpdir.join('directory')
+    dp2 = dp1.join('subdirectory')
+    dp3 = dp2.join('testing.txt')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    # Contents are listed before the directories which contain them
+    files = Files(files=[
+        {'path': dp3.strpath, 'source': sp.strpath},
+        {'path': dp2.strpath, 'state': 'directory'},
+        {'path': tmpdir.join('testing.txt').strpath, 'source': sp.strpath},
+        {'path': dp1.strpath, 'state': 'directory'}
+    ], workers=4)
+    assert files.stages() == [[2, 3], [1], [0]]
+    assert files.process().changed
+    assert dp3.read() == 'Hello there'
+
+
+def test_stages_same_path(tmpdir):
+    dp = tmpdir.join('testing.txt')
+    sp = tmpdir.join('source.txt')
+
+    files = Files(files=[
+        {'path': dp.strpath, 'source': sp.strpath},
+        {'path': tmpdir.join('other.txt').strpath, 'source': sp.strpath},
+        {'path': dp.strpath, 'mode': '0600'}
+    ])
+    assert files.stages() == [[0, 1], [2]]
+
+
+def test_failed(tmpdir):
+    dp1 = tmpdir.join('testing1.txt')
+    dp2 = tmpdir.join('testing2.txt')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    files = Files(files=[
+        {'path': dp1.strpath, 'source': sp.strpath},
+        {'path': dp2.strpath, 'source': tmpdir.join('inexistent.txt').strpath}
+    ])
+    with pytest.raises(ActionError) as e:
+        files.process()
+    assert e.value.args[0] == (
+        f'unable to process the path {dp2.strpath}: '
+        'the source provided could not be found or is not a file'
+    )
+    assert dp1.read() == 'Hello there'
+
+
+def test_failed_many(tmpdir):
+    dp1 = tmpdir.join('testing1.txt')
+    dp2 = tmpdir.join('testing2.txt')
+    dp3 = tmpdir.join('testing3.txt')
+    sp = tmpdir.join('source.txt')
+    sp.write('Hello there')
+
+    files = Files(files=[
+        {'path': dp1.strpath, 'source': tmpdir.join('inexistent1.txt').strpath},
+        {'path': dp2.strpath, 'source': sp.strpath},
+        {'path': dp3.strpath, 'source': tmpdir.join('inexistent3.txt').strpath}
+    ])
+    with pytest.raises(ActionError) as e:
+        files.process()
+    assert e.value.args[0] == (
+        f'unable to process 2 of 3 paths: '
+        f'{dp1.strpath}: the source provided could not be found or is not a file; '
+        f'{dp3.strpath}: the source provided could not be found or is not a file'
+    )
+    assert dp2.read() == 'Hello there'
@@ -33,10 +33,42 @@ def build_directory(p):
     d2.join('filec3.yaml').ensure()
 
 
-os_stat = os.stat
+os_scandir = os.scandir
 
 
-def directory_stat(path, *, dir_fd=None, follow_symlinks=True):
+class DirEntry:
+    """A directory entry whose stat details are determined using directory_stat."""
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, *, follow_symlinks=True):
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self.entry.is_symlink()
+
+    def stat(self, *, follow_symlinks=True):
+        return directory_stat(self.path, follow_symlinks=follow_symlinks)
+
+
+class ScandirIterator:
+    def __init__(self, path):
+        self.iterator = os_scandir(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.iterator.close()
+
+    def __iter__(self):
+        return (DirEntry(entry) for entry in self.iterator)
+
+
+def directory_stat(path, *, follow_symlinks=True):
     if path.endswith('filea3.txt'):
         return os.stat_result(
             (33188, 4254835, 16777220, 1, 502, 20, 0, 1533464722, 1533464722, 1533464722)
@@ -54,7 +86,7 @@ def directory_stat(path, *, dir_fd=None, follow_symlinks=True):
             (33188, 4254845, 16777220, 1, 501, 0, 0, 1533464722, 1533464722, 1533464722)
         )
     else:
-        return os_stat(path, dir_fd=dir_fd, follow_symlinks=follow_symlinks)
+        return os.stat(path, follow_symlinks=follow_symlinks)
 
 
 def test_path_inexistent(tmpdir):
@@ -87,6 +119,24 @@ def test_all(tmpdir):
     })
 
 
+def test_workers(tmpdir):
+    build_directory(tmpdir)
+    find = Find(path=tmpdir.strpath, workers=3)
+    assert find.process() == Find(path=tmpdir.strpath).process()
+
+    find = Find(path=tmpdir.strpath, max_depth=2, types=['file'], aliases=False, workers=3)
+    assert find.process() == ActionResponse(changed=False, data={
+        'paths': [
+            tmpdir.join('filea1.yaml').strpath,
+            tmpdir.join('filea2.json').strpath,
+            tmpdir.join('filea3.txt').strpath,
+            tmpdir.join('test/fileb1.txt').strpath,
+            tmpdir.join('test/fileb2.json').strpath,
+            tmpdir.join('test/fileb3.txt').strpath
+        ]
+    })
+
+
 def test_min_depth(tmpdir):
     build_directory(tmpdir)
     find = Find(path=tmpdir.strpath, min_depth=2)
@@ -173,6 +223,19 @@ def test_types_file_without_aliases(tmpdir):
     })
 
 
+def test_types_alias(tmpdir):
+    build_directory(tmpdir)
+    tmpdir.join('test/alias').write_binary(
+        helpers.build_bookmark_file(tmpdir.join('test/fileb1.txt').strpath)
+    )
+    find = Find(path=tmpdir.strpath, types=['alias'])
+    assert find.process() == ActionResponse(changed=False, data={
+        'paths': [
+            tmpdir.join('test/alias').strpath
+        ]
+    })
+
+
 def test_types_symlink(tmpdir):
     build_directory(tmpdir)
     find = Find(path=tmpdir.strpath, types=['symlink'])
@@ -200,7 +263,7 @@ def test_owner_inexistent(tmpdir, monkeypatch):
     build_directory(tmpdir)
     monkeypatch.setattr('pwd.getpwnam', helpers.getpwnam)
     monkeypatch.setattr('grp.getgrnam', helpers.getgrnam)
-    monkeypatch.setattr('os.stat', directory_stat)
+    monkeypatch.setattr('os.scandir', ScandirIterator)
 
     find = Find(path=tmpdir.strpath, owner='wow')
     with pytest.raises(ActionError):
@@ -211,7 +274,7 @@ def test_owner(tmpdir, monkeypatch):
     build_directory(tmpdir)
     monkeypatch.setattr('pwd.getpwnam', helpers.getpwnam)
     monkeypatch.setattr('grp.getgrnam', helpers.getgrnam)
-    monkeypatch.setattr('os.stat', directory_stat)
+    monkeypatch.setattr('os.scandir', ScandirIterator)
 
     find = Find(path=tmpdir.strpath, owner='happy')
     assert find.process() == ActionResponse(changed=False, data={
@@ -226,7 +289,7 @@ def test_group_inexistent(tmpdir, monkeypatch):
     build_directory(tmpdir)
     monkeypatch.setattr('pwd.getpwnam', helpers.getpwnam)
     monkeypatch.setattr('grp.getgrnam', helpers.getgrnam)
-    monkeypatch.setattr('os.stat', directory_stat)
+    monkeypatch.setattr('os.scandir', ScandirIterator)
 
     find = Find(path=tmpdir.strpath, group='wow')
     with pytest.raises(ActionError):
@@ -237,7 +300,7 @@ def test_group(tmpdir, monkeypatch):
     build_directory(tmpdir)
     monkeypatch.setattr('pwd.getpwnam', helpers.getpwnam)
     monkeypatch.setattr('grp.getgrnam', helpers.getgrnam)
-    monkeypatch.setattr('os.stat', directory_stat)
+    monkeypatch.setattr('os.scandir', ScandirIterator)
 
     find = Find(path=tmpdir.strpath, group='wheel')
     assert find.process() == ActionResponse(changed=False, data={
@@ -248,6 +311,19 @@ def test_group(tmpdir, monkeypatch):
     })
 
 
+def test_patterns(tmpdir):
+    build_directory(tmpdir)
+    find = Find(path=tmpdir.strpath, patterns=['*.json', '*/wow/*.yaml'])
+    assert find.process() == ActionResponse(changed=False, data={
+        'paths': [
+            tmpdir.join('filea2.json').strpath,
+            tmpdir.join('test/fileb2.json').strpath,
+            tmpdir.join('test/symlinkb2.json').strpath,
+            tmpdir.join('test/wow/filec3.yaml').strpath
+        ]
+    })
+
+
 def test_flags_invalid(tmpdir):
     build_directory(tmpdir)
     find = Find(path=tmpdir.strpath, flags=['hmmm'])
@@ -264,3 +340,87 @@ def test_flags(tmpdir):
             tmpdir.join('test/fileb2.json').strpath
         ]
     })
+
+
+def test_argument_aggregate_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        Find(path=tmpdir.strpath, aggregate='hmmm')
+
+
+def test_aggregate_count(tmpdir):
+    build_directory(tmpdir)
+    find = Find(path=tmpdir.strpath, types=['file'], aliases=False, aggregate='count')
+    assert find.process() == ActionResponse(changed=False, data={'count': 9})
+
+
+def test_aggregate_extensions(tmpdir):
+    build_directory(tmpdir)
+    find = Find(path=tmpdir.strpath, min_depth=2, aggregate='extensions')
+    assert find.process() == ActionResponse(changed=False, data={
+        'extensions': {'.txt': 5, '.json': 2, '': 1, '.zip': 1, '.yaml': 1}
+    })
+
+
+def test_aggregate_newest(tmpdir):
+    build_directory(tmpdir)
+    for index, p in enumerate(sorted(tmpdir.visit(), key=str)):
+        os.utime(p.strpath, ns=(index, index), follow_symlinks=False)
+
+    find = Find(path=tmpdir.strpath, patterns=['*.txt'], aggregate='newest', limit=2)
+    assert find.process() == ActionResponse(changed=False, data={
+        'newest': [
+            tmpdir.join('test/wow/filec2.txt').strpath,
+            tmpdir.join('test/symlinkb3.txt').strpath
+        ]
+    })
+
+
+def test_index(tmpdir):
+    p = tmpdir.mkdir('tree')
+    build_directory(p)
+    pcp = tmpdir.join('cache')
+
+    for _attempt in range(2):
+        find = Find(
+            path=p.strpath, types=['file'], patterns=['*.txt'], aliases=False, index=True,
+            persistent_cache_base_dir=pcp.strpath
+        )
+        assert find.process() == ActionResponse(changed=False, data={
+            'paths': [
+                p.join('filea3.txt').strpath,
+                p.join('test/fileb1.txt').strpath,
+                p.join('test/fileb3.txt').strpath,
+                p.join('test/wow/filec2.txt').strpath
+            ]
+        })
+        assert pcp.join('Find/index.sqlite').isfile()
+
+    p.join('test/wow/filec2.txt').remove()
+    find = Find(
+        path=p.strpath, types=['file'], patterns=['*.txt'], aliases=False, index=True,
+        persistent_cache_base_dir=pcp.strpath
+    )
+    assert find.process() == ActionResponse(changed=False, data={
+        'paths': [
+            p.join('filea3.txt').strpath,
+            p.join('test/fileb1.txt').strpath,
+            p.join('test/fileb3.txt').strpath
+        ]
+    })
+
+
+def test_index_invalid(tmpdir):
+    p = tmpdir.mkdir('tree')
+    build_directory(p)
+    pcp = tmpdir.join('cache')
+    pcp.join('Find/index.sqlite').write('hmmm', ensure=True)
+
+    find = Find(
+        path=p.strpath, max_depth=1, types=['directory'], index=True,
+        persistent_cache_base_dir=pcp.strpath
+    )
+    assert find.process() == ActionResponse(changed=False, data={
+        'paths': [
+            p.join('test').strpath
+        ]
+    })
@@ -1,11 +1,27 @@
 import textwrap
 
-from elite.actions import ActionResponse
+import pytest
+from elite.actions import ActionError, ActionResponse
 from elite.actions.git import Git
 
 from .helpers import CommandMapping, build_run
 
 
+def build_repository(p, url, remote='origin', branch='master'):
+    p.join('.git', 'config').ensure().write(textwrap.dedent(f'''\
+        [core]
+        \trepositoryformatversion = 0
+        \tbare = false
+        [remote "{remote}"]
+        \turl = {url}
+        \tfetch = +refs/heads/*:refs/remotes/{remote}/*
+        [branch "{branch}"]
+        \tremote = {remote}
+        \tmerge = refs/heads/{branch}
+    '''))
+    p.join('.git', 'HEAD').write(f'ref: refs/heads/{branch}\n')
+
+
 def test_path_inexistent(tmpdir, monkeypatch):
     p = tmpdir.join('painter')
 
@@ -27,7 +43,7 @@ def test_path_inexistent(tmpdir, monkeypatch):
 
 def test_different_remote_existing(tmpdir, monkeypatch):
     p = tmpdir.mkdir('painter')
-    p.join('.git/config').ensure()
+    build_repository(p, 'https://github.com/fgimian/paramiko-expect.git', remote='github')
 
     repo = 'https://github.com/fgimian/painter.git'
     path = p.strpath
@@ -35,12 +51,6 @@ def test_different_remote_existing(tmpdir, monkeypatch):
     monkeypatch.setattr(Git, 'run', build_run(
         fixture_subpath='git',
         command_mappings=[
-            CommandMapping(
-                stdout=textwrap.dedent('''\
-                    https://github.com/fgimian/paramiko-expect.git
-                '''),
-                command=['git', 'remote', 'get-url', 'github']
-            ),
             CommandMapping(
                 command=['git', 'clone', '--quiet', '-b', 'master', repo, path]
             )
@@ -56,26 +66,14 @@ def test_different_remote_existing(tmpdir, monkeypatch):
 
 def test_different_branch_existing(tmpdir, monkeypatch):
     p = tmpdir.mkdir('painter')
-    p.join('.git/config').ensure()
 
     repo = 'https://github.com/fgimian/painter.git'
     path = p.strpath
+    build_repository(p, repo)
 
     monkeypatch.setattr(Git, 'run', build_run(
         fixture_subpath='git',
         command_mappings=[
-            CommandMapping(
-                stdout=textwrap.dedent('''\
-                    https://github.com/fgimian/painter.git
-                '''),
-                command=['git', 'remote', 'get-url', 'origin']
-            ),
-            CommandMapping(
-                stdout=textwrap.dedent('''\
-                    master
-                '''),
-                command=['git', 'symbolic-ref', '--short', 'HEAD']
-            ),
             CommandMapping(
                 command=['git', 'checkout', '--quiet', 'some-feature-branch']
             )
@@ -88,28 +86,49 @@ def test_different_branch_existing(tmpdir, monkeypatch):
 
 def test_same_existing(tmpdir, monkeypatch):
     p = tmpdir.join('painter')
-    p.join('.git/config').ensure()
 
     repo = 'https://github.com/fgimian/painter.git'
     path = p.strpath
+    build_repository(p, repo)
 
-    monkeypatch.setattr(Git, 'run', build_run(
-        fixture_subpath='git',
-        command_mappings=[
-            CommandMapping(
-                stdout=textwrap.dedent('''\
-                    https://github.com/fgimian/painter.git
-                '''),
-                command=['git', 'remote', 'get-url', 'origin']
-            ),
-            CommandMapping(
-                stdout=textwrap.dedent('''\
-                    master
-                '''),
-                command=['git', 'symbolic-ref', '--short', 'HEAD']
-            )
-        ]
-    ))
+    # No commands should be run when the repository is already in the requested state
+    monkeypatch.setattr(Git, 'run', build_run(fixture_subpath='git', command_mappings=[]))
 
     git = Git(repo=repo, path=path)
     assert git.process() == ActionResponse(changed=False)
+
+
+def test_same_existing_worktree(tmpdir, monkeypatch):
+    repo = 'https://github.com/fgimian/painter.git'
+    build_repository(tmpdir.mkdir('painter'), repo)
+
+    # Linked worktrees reference their own Git directory which shares the main config
+    worktree_git_dir = tmpdir.join('painter', '.git', 'worktrees', 'feature').ensure(dir=True)
+    worktree_git_dir.join('commondir').write('../..\n')
+    worktree_git_dir.join('HEAD').write('ref: refs/heads/some-feature-branch\n')
+    p = tmpdir.mkdir('painter-feature')
+    p.join('.git').write(f'gitdir: {worktree_git_dir.strpath}\n')
+
+    monkeypatch.setattr(Git, 'run', build_run(fixture_subpath='git', command_mappings=[]))
+
+    git = Git(repo=repo, path=p.strpath, branch='some-feature-branch')
+    assert git.process() == ActionResponse(changed=False)
+
+
+def test_remote_missing_existing(tmpdir):
+    p = tmpdir.mkdir('painter')
+    build_repository(p, 'https://github.com/fgimian/painter.git')
+
+    git = Git(repo='https://github.com/fgimian/painter.git', path=p.strpath, remote='github')
+    with pytest.raises(ActionError):
+        git.process()
+
+
+def test_invalid_config_existing(tmpdir):
+    p = tmpdir.mkdir('painter')
+    build_repository(p, 'https://github.com/fgimian/painter.git')
+    p.join('.git', 'config').write('[remote "origin"\n')
+
+    git = Git(repo='https://github.com/fgimian/painter.git', path=p.strpath)
+    with pytest.raises(ActionError):
+        git.process()
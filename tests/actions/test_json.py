@@ -4,7 +4,12 @@ import pytest
 from elite.actions import ActionError, ActionResponse
 from elite.actions.json import JSON
 
-from .helpers import build_open_with_permission_error
+from .helpers import build_replace_with_permission_error
+
+
+def test_argument_list_merge_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        JSON(path=tmpdir.join('test.json').strpath, values={'name': 'Fots'}, list_merge='boo')
 
 
 def test_same(tmpdir):
@@ -39,7 +44,9 @@ def test_different(tmpdir):
     '''))
 
     json = JSON(path=p.strpath, values={'python_lover': False})
-    assert json.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert json.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
     assert p.read() == textwrap.dedent('''\
         {
           "name": "Fots",
@@ -62,7 +69,9 @@ def test_values_inexistent(tmpdir):
     '''))
 
     json = JSON(path=p.strpath, values={'python_lover': False})
-    assert json.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert json.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
     assert p.read() == textwrap.dedent('''\
         {
           "name": "Fots",
@@ -75,7 +84,9 @@ def test_path_inexistent(tmpdir):
     p = tmpdir.join('test.json')
 
     json = JSON(path=p.strpath, values={'python_lover': False})
-    assert json.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert json.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
     assert p.read() == textwrap.dedent('''\
         {
           "python_lover": false
@@ -83,6 +94,37 @@ def test_path_inexistent(tmpdir):
     ''')
 
 
+def test_nested_and_list_merge_prepend(tmpdir):
+    p = tmpdir.join('test.json')
+    p.write(textwrap.dedent('''\
+        {
+            "name": "Fots",
+            "details": {"age": 33, "interests": ["chickens"]}
+        }
+    '''))
+
+    json = JSON(
+        path=p.strpath, values={'details': {'interests': ['music'], 'country': 'Australia'}},
+        list_merge='prepend'
+    )
+    assert json.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('details', 'interests'), ('details', 'country')]
+    })
+    assert p.read() == textwrap.dedent('''\
+        {
+          "name": "Fots",
+          "details": {
+            "age": 33,
+            "interests": [
+              "music",
+              "chickens"
+            ],
+            "country": "Australia"
+          }
+        }
+    ''')
+
+
 def test_file_parsing_invalid(tmpdir):
     p = tmpdir.join('test.json')
     p.write(textwrap.dedent('''\
@@ -97,7 +139,7 @@ def test_file_parsing_invalid(tmpdir):
 def test_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('test.json')
 
-    monkeypatch.setattr('builtins.open', build_open_with_permission_error(p.strpath))
+    monkeypatch.setattr('os.replace', build_replace_with_permission_error(p.strpath))
 
     json = JSON(path=p.strpath, values={'name': 'Fots'})
     with pytest.raises(ActionError):
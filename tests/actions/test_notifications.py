@@ -7,6 +7,8 @@ import pytest
 from elite.actions import ActionError, ActionResponse
 from elite.actions.notifications import Notifications, get_ncprefs_plist_path
 
+from .helpers import build_replace_with_permission_error
+
 
 FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
 
@@ -320,19 +322,8 @@ def test_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('com.apple.ncprefs.plist')
     shutil.copy(os.path.join(FIXTURE_PATH, 'notifications', 'com.apple.ncprefs.plist'), p.strpath)
 
-    builtins_open = open
-
-    def open_(  # pylint: disable=unused-argument
-        file, mode='r', buffering=-1, encoding=None, errors=None, newline=None, closefd=True,
-        opener=None
-    ):
-        if file == p.strpath and mode == 'wb':
-            raise PermissionError(13, 'Permission denied', file)
-        else:
-            return builtins_open(file, mode, buffering, encoding, errors, newline, closefd, opener)
-
     monkeypatch.setattr('elite.actions.notifications.get_ncprefs_plist_path', lambda: p.strpath)
-    monkeypatch.setattr('builtins.open', open_)
+    monkeypatch.setattr('os.replace', build_replace_with_permission_error(p.strpath))
 
     notifications = Notifications(path='/Applications/Dropbox.app', sound=False)
     with pytest.raises(ActionError):
@@ -1,5 +1,7 @@
 import os
+import plistlib
 import shutil
+import struct
 import textwrap
 
 import pytest
@@ -243,6 +245,51 @@ def test_installed(tmpdir, monkeypatch):
     assert package.process() == ActionResponse(changed=False)
 
 
+def test_not_installed_then_installed(tmpdir, monkeypatch):
+    kp = tmpdir.join('West Africa 1.3.0 Installer Mac.pkg').ensure()
+    pp = tmpdir.join('package')
+    shutil.copytree(os.path.join(FIXTURE_PATH, 'package', 'pkg'), pp.strpath)
+    rp = tmpdir.mkdir('receipts')
+
+    def install():
+        # Simulate the installer adding its receipts
+        for filename in os.listdir(os.path.join(FIXTURE_PATH, 'package', 'receipts')):
+            shutil.copy(os.path.join(FIXTURE_PATH, 'package', 'receipts', filename), rp.strpath)
+
+    monkeypatch.setattr(Package, 'run', build_run(
+        fixture_subpath='cask',
+        command_mappings=[
+            CommandMapping(
+                command=[
+                    'xar', '-xf', kp.strpath,
+                    '-C', pp.strpath,
+                    '^Distribution$', '^PackageInfo$', '/PackageInfo$'
+                ],
+                returncode=0
+            ),
+            CommandMapping(
+                command=[
+                    'installer',
+                    '-package', kp.strpath,
+                    '-target', '/'
+                ],
+                returncode=0
+            )
+        ]
+    ))
+    monkeypatch.setattr('tempfile.mkdtemp', lambda: pp.strpath)
+    monkeypatch.setattr('os.geteuid', lambda: 0)
+    Package.receipts_dirs = [rp.strpath]
+
+    package = Package(path=kp.strpath)
+    assert package.process() == ActionResponse(changed=True)
+    install()
+
+    # A subsequent package action in the same run observes the receipts installed
+    package = Package(path=kp.strpath)
+    assert package.process() == ActionResponse(changed=False)
+
+
 def test_choices(tmpdir, monkeypatch):
     kp = tmpdir.join('West Africa 1.3.0 Installer Mac.pkg').ensure()
     pp = tmpdir.join('package')
@@ -303,3 +350,83 @@ def test_choices(tmpdir, monkeypatch):
         </array>
         </plist>
     '''.replace(' ' * 4, '\t'))
+
+
+def test_installed_outdated_upgrade(tmpdir, monkeypatch):
+    kp = tmpdir.join('West Africa 1.3.0 Installer Mac.pkg').ensure()
+    pp = tmpdir.join('package')
+    shutil.copytree(os.path.join(FIXTURE_PATH, 'package', 'pkg'), pp.strpath)
+    rp = tmpdir.join('receipts')
+    shutil.copytree(os.path.join(FIXTURE_PATH, 'package', 'receipts'), rp.strpath)
+    receipt = rp.join('com.native-instruments.WestAfrica.FactoryContent.plist')
+    with open(receipt.strpath, 'rb') as fp:
+        receipt_plist = plistlib.load(fp)
+    receipt_plist['PackageVersion'] = '1.2.0.1'
+    with open(receipt.strpath, 'wb') as fp:
+        plistlib.dump(receipt_plist, fp)
+
+    monkeypatch.setattr(Package, 'run', build_run(
+        fixture_subpath='cask',
+        command_mappings=[
+            CommandMapping(
+                command=[
+                    'xar', '-xf', kp.strpath,
+                    '-C', pp.strpath,
+                    '^Distribution$', '^PackageInfo$', '/PackageInfo$'
+                ],
+                returncode=0
+            ),
+            CommandMapping(
+                command=[
+                    'installer',
+                    '-package', kp.strpath,
+                    '-target', '/'
+                ],
+                returncode=0
+            )
+        ]
+    ))
+    monkeypatch.setattr('tempfile.mkdtemp', lambda: pp.strpath)
+    monkeypatch.setattr('os.geteuid', lambda: 0)
+    Package.receipts_dirs = [rp.strpath]
+
+    package = Package(path=kp.strpath)
+    assert package.process() == ActionResponse(changed=False)
+
+    package = Package(path=kp.strpath, upgrade=True)
+    assert package.process() == ActionResponse(changed=True)
+
+
+def test_installed_cached(tmpdir, monkeypatch):
+    kp = tmpdir.join('West Africa 1.3.0 Installer Mac.pkg')
+    kp.write_binary(struct.pack('>4sHHQQI', b'xar!', 28, 1, 3, 3, 1) + b'toc')
+    pp = tmpdir.join('package')
+    shutil.copytree(os.path.join(FIXTURE_PATH, 'package', 'pkg'), pp.strpath)
+    rp = tmpdir.join('receipts')
+    shutil.copytree(os.path.join(FIXTURE_PATH, 'package', 'receipts'), rp.strpath)
+    pcp = tmpdir.join('persistent_cache')
+
+    monkeypatch.setattr(Package, 'run', build_run(
+        fixture_subpath='cask',
+        command_mappings=[
+            CommandMapping(
+                command=[
+                    'xar', '-xf', kp.strpath,
+                    '-C', pp.strpath,
+                    '^Distribution$', '^PackageInfo$', '/PackageInfo$'
+                ],
+                returncode=0
+            )
+        ]
+    ))
+    monkeypatch.setattr('tempfile.mkdtemp', lambda: pp.strpath)
+    monkeypatch.setattr('os.geteuid', lambda: 0)
+    Package.receipts_dirs = [rp.strpath]
+
+    package = Package(path=kp.strpath, persistent_cache_base_dir=pcp.strpath)
+    assert package.process() == ActionResponse(changed=False)
+
+    monkeypatch.setattr(Package, 'run', build_run(fixture_subpath='cask', command_mappings=[]))
+
+    package = Package(path=kp.strpath, persistent_cache_base_dir=pcp.strpath)
+    assert package.process() == ActionResponse(changed=False)
@@ -1,3 +1,6 @@
+import os
+import struct
+
 import pytest
 from elite.actions import ActionError, ActionResponse
 from elite.actions.package_choices import PackageChoices
@@ -29,11 +32,14 @@ def test_xml_invalid(tmpdir, monkeypatch):
             )
         ]
     ))
-    monkeypatch.setattr('tempfile.mkstemp', lambda: (11, cp.strpath))
+    monkeypatch.setattr(
+        'tempfile.mkstemp', lambda: (os.open(cp.strpath, os.O_CREAT | os.O_WRONLY), cp.strpath)
+    )
 
     package_choices = PackageChoices(kp.strpath)
     with pytest.raises(ActionError):
         package_choices.process()
+    assert not cp.exists()
 
 
 def test_normal(tmpdir, monkeypatch):
@@ -52,7 +58,9 @@ def test_normal(tmpdir, monkeypatch):
             )
         ]
     ))
-    monkeypatch.setattr('tempfile.mkstemp', lambda: (11, cp.strpath))
+    monkeypatch.setattr(
+        'tempfile.mkstemp', lambda: (os.open(cp.strpath, os.O_CREAT | os.O_WRONLY), cp.strpath)
+    )
 
     package_choices = PackageChoices(kp.strpath)
     assert package_choices.process() == ActionResponse(changed=False, data={
@@ -94,3 +102,38 @@ def test_normal(tmpdir, monkeypatch):
             }
         ]
     })
+    assert not cp.exists()
+
+
+def test_cached(tmpdir, monkeypatch):
+    kp = tmpdir.join('Damage 1.5.0 Installer Mac.pkg')
+    kp.write_binary(struct.pack('>4sHHQQI', b'xar!', 28, 1, 3, 3, 1) + b'toc')
+    cp = tmpdir.join('choices')
+    pcp = tmpdir.join('persistent_cache')
+
+    monkeypatch.setattr(PackageChoices, 'run', build_run(
+        fixture_subpath='package_choices',
+        command_mappings=[
+            CommandMapping(
+                command=[
+                    'installer', '-showChoicesAfterApplyingChangesXML', cp.strpath,
+                    '-package', kp.strpath, '-target', '/'
+                ],
+                stdout_filename='installer_show_choices_xml.stdout'
+            )
+        ]
+    ))
+    monkeypatch.setattr(
+        'tempfile.mkstemp', lambda: (os.open(cp.strpath, os.O_CREAT | os.O_WRONLY), cp.strpath)
+    )
+
+    package_choices = PackageChoices(kp.strpath, persistent_cache_base_dir=pcp.strpath)
+    choices = package_choices.process().data['choices']
+    assert len(choices) == 7
+
+    monkeypatch.setattr(PackageChoices, 'run', build_run(
+        fixture_subpath='package_choices', command_mappings=[]
+    ))
+
+    package_choices = PackageChoices(kp.strpath, persistent_cache_base_dir=pcp.strpath)
+    assert package_choices.process() == ActionResponse(changed=False, data={'choices': choices})
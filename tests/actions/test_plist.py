@@ -1,10 +1,12 @@
+import plistlib
 import textwrap
 
 import pytest
 from elite.actions import ActionError, ActionResponse
 from elite.actions.plist import Plist
+from elite.libraries.documents import DocumentStore
 
-from .helpers import build_open_with_permission_error
+from .helpers import build_replace_with_permission_error
 
 
 PLIST_HEADER = (
@@ -109,6 +111,45 @@ def test_argument_fmt_after_init_invalid():
         plist.fmt = 'boo'
 
 
+def test_argument_list_merge_invalid():
+    with pytest.raises(ValueError):
+        Plist(values={'ShowOverlayStatusBar': True}, domain='com.apple.Safari', list_merge='boo')
+
+
+def test_plist_list_merge_append(tmpdir):
+    p = tmpdir.join('test.plist')
+    p.write(PLIST_HEADER + textwrap.dedent('''\
+        <plist version="1.0">
+        <dict>
+            <key>interests</key>
+            <array>
+                <string>chickens</string>
+                <string>coding</string>
+            </array>
+        </dict>
+        </plist>
+    '''))
+
+    plist = Plist(path=p.strpath, values={'interests': ['coding', 'music']}, list_merge='append')
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('interests',)]
+    })
+    assert p.read() == PLIST_HEADER + textwrap.dedent('''\
+        <plist version="1.0">
+        <dict>
+            <key>interests</key>
+            <array>
+                <string>chickens</string>
+                <string>coding</string>
+                <string>music</string>
+            </array>
+        </dict>
+        </plist>
+    ''').replace(' ' * 4, '\t')
+
+    assert plist.process() == ActionResponse(changed=False, data={'path': p.strpath})
+
+
 def test_plist_binary_fmt(tmpdir):
     p = tmpdir.join('test.plist')
     p.write(PLIST_HEADER + textwrap.dedent('''\
@@ -129,8 +170,71 @@ def test_plist_binary_fmt(tmpdir):
     '''))
 
     plist = Plist(path=p.strpath, values={'python_lover': False}, fmt='binary')
-    assert plist.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
+    assert p.read_binary().startswith(b'bplist00')
+
+
+def test_plist_binary_fmt_preserved(tmpdir):
+    p = tmpdir.join('test.plist')
+    p.write_binary(plistlib.dumps({'name': 'Fots', 'python_lover': True}, fmt=plistlib.FMT_BINARY))
+
+    plist = Plist(path=p.strpath, values={'python_lover': False})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
+    assert p.read_binary().startswith(b'bplist00')
+    assert plistlib.loads(p.read_binary()) == {'name': 'Fots', 'python_lover': False}
+
+
+def test_plist_binary_fmt_preserved_document_store(tmpdir):
+    p = tmpdir.join('test.plist')
+    store = DocumentStore()
+
+    # The format of a pending update is preserved as the plist hasn't been written yet
+    plist = Plist(path=p.strpath, values={'name': 'Fots'}, fmt='binary', document_store=store)
+    assert plist.process().changed
+    plist = Plist(path=p.strpath, values={'python_lover': True}, document_store=store)
+    assert plist.process().changed
+    assert store.flush() == []
+
+    assert p.read_binary().startswith(b'bplist00')
+    assert plistlib.loads(p.read_binary()) == {'name': 'Fots', 'python_lover': True}
+
+    # The format of an existing plist is preserved across updates made through the store
+    plist = Plist(path=p.strpath, values={'python_lover': False}, document_store=store)
+    assert plist.process().changed
+    plist = Plist(path=p.strpath, values={'age': 33}, document_store=store)
+    assert plist.process().changed
+    assert store.flush() == []
+
+    assert p.read_binary().startswith(b'bplist00')
+    assert plistlib.loads(p.read_binary()) == {'name': 'Fots', 'python_lover': False, 'age': 33}
+
+
+def test_plist_binary_large_lazy(tmpdir, monkeypatch):
+    monkeypatch.setattr('elite.actions.plist.LAZY_PLIST_SIZE', 0)
+    p = tmpdir.join('test.plist')
+    p.write_binary(plistlib.dumps({
+        'name': 'Fots',
+        'settings': {'theme': 'dark', 'history': ['a'] * 100},
+        'python_lover': True
+    }, fmt=plistlib.FMT_BINARY))
+
+    plist = Plist(path=p.strpath, values={'settings': {'theme': 'dark'}, 'python_lover': True})
+    assert plist.process() == ActionResponse(changed=False, data={'path': p.strpath})
+
+    plist = Plist(path=p.strpath, values={'settings': {'theme': 'light'}})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('settings', 'theme')]
+    })
     assert p.read_binary().startswith(b'bplist00')
+    assert plistlib.loads(p.read_binary()) == {
+        'name': 'Fots',
+        'settings': {'theme': 'light', 'history': ['a'] * 100},
+        'python_lover': True
+    }
 
 
 def test_plist_same(tmpdir):
@@ -192,7 +296,9 @@ def test_plist_different(tmpdir):
     '''))
 
     plist = Plist(path=p.strpath, values={'python_lover': False})
-    assert plist.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
     assert p.read() == PLIST_HEADER + textwrap.dedent('''\
         <plist version="1.0">
         <dict>
@@ -223,7 +329,9 @@ def test_plist_values_inexistent(tmpdir):
     '''))
 
     plist = Plist(path=p.strpath, values={'python_lover': False})
-    assert plist.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
     assert p.read() == PLIST_HEADER + textwrap.dedent('''\
         <plist version="1.0">
         <dict>
@@ -240,7 +348,9 @@ def test_plist_path_inexistent(tmpdir):
     p = tmpdir.join('test.plist')
 
     plist = Plist(path=p.strpath, values={'python_lover': False})
-    assert plist.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('python_lover',)]
+    })
     assert p.read() == PLIST_HEADER + textwrap.dedent('''\
         <plist version="1.0">
         <dict>
@@ -288,7 +398,9 @@ def test_plist_source(tmpdir):
     '''))
 
     plist = Plist(path=p.strpath, source=s.strpath, values={'python_lover': False})
-    assert plist.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert plist.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('name',), ('happy',), ('python_lover',)]
+    })
     assert p.read() == PLIST_HEADER + textwrap.dedent('''\
         <plist version="1.0">
         <dict>
@@ -327,7 +439,7 @@ def test_plist_source_invalid(tmpdir):
 def test_plist_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('test.json')
 
-    monkeypatch.setattr('builtins.open', build_open_with_permission_error(p.strpath))
+    monkeypatch.setattr('os.replace', build_replace_with_permission_error(p.strpath))
 
     plist = Plist(path=p.strpath, values={'name': 'Fots'})
     with pytest.raises(ActionError):
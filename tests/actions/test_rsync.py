@@ -1,7 +1,44 @@
-from elite.actions import ActionResponse
+import os
+import textwrap
+
+import pytest
+from elite.actions import ActionError, ActionResponse
 from elite.actions.rsync import Rsync
 
 
+def build_rsync_executable(tmpdir, script):
+    executable = tmpdir.join('rsync')
+    executable.write('#!/bin/sh\n' + textwrap.dedent(script))
+    executable.chmod(0o755)
+    return executable.strpath
+
+
+def test_argument_max_changes_invalid():
+    with pytest.raises(ValueError):
+        Rsync('/tmp/destination', '/tmp/source', max_changes=-1)
+
+
+def test_argument_backend_invalid():
+    with pytest.raises(ValueError):
+        Rsync('/tmp/destination', '/tmp/source', backend='boo')
+
+
+def test_argument_backend_native_archive_invalid():
+    with pytest.raises(ValueError):
+        Rsync('/tmp/destination', '/tmp/source', archive=False, backend='native')
+
+
+def test_argument_backend_native_options_invalid():
+    with pytest.raises(ValueError):
+        Rsync('/tmp/destination', '/tmp/source', options=['--compress'], backend='native')
+
+
+def test_argument_options_after_init_invalid():
+    rsync = Rsync('/tmp/destination', '/tmp/source', backend='native')
+    with pytest.raises(ValueError):
+        rsync.options = ['--compress']
+
+
 def test_archive_same(tmpdir):
     dp = tmpdir.mkdir('destination')
     sp = tmpdir.mkdir('source')
@@ -21,7 +58,7 @@ def test_archive_different(tmpdir):
     assert rsync.process() == ActionResponse(changed=True, data={'changes': [
         ('send', 'file2.txt'),
         ('send', 'file3.txt')
-    ]})
+    ], 'counts': {'send': 2}})
 
 
 def test_archive_different_options(tmpdir):
@@ -36,4 +73,163 @@ def test_archive_different_options(tmpdir):
         ('del.', 'file1.txt'),
         ('send', 'file2.txt'),
         ('send', 'file3.txt')
-    ]})
+    ], 'counts': {'del.': 1, 'send': 2}})
+
+
+def test_output_escaped_filenames(tmpdir):
+    executable = build_rsync_executable(tmpdir, r'''\
+        printf 'send it'"'"'s (quoted).txt\n'
+        printf 'send new\\#012line.txt\n'
+        printf 'send back\\#134slash.txt\n'
+    ''')
+
+    rsync = Rsync('/tmp/destination', '/tmp/source', executable=executable)
+    assert rsync.process() == ActionResponse(changed=True, data={'changes': [
+        ('send', "it's (quoted).txt"),
+        ('send', 'new\nline.txt'),
+        ('send', 'back\\slash.txt')
+    ], 'counts': {'send': 3}})
+
+
+def test_output_max_changes_and_progress(tmpdir, monkeypatch):
+    monkeypatch.setattr('elite.actions.rsync.RSYNC_PROGRESS_INTERVAL', 0)
+    executable = build_rsync_executable(tmpdir, '''\
+        for i in 1 2 3 4 5; do echo "send file$i.txt"; done
+        echo "del. old.txt"
+    ''')
+    messages = []
+
+    rsync = Rsync(
+        '/tmp/destination', '/tmp/source', executable=executable, max_changes=2,
+        progress_fn=messages.append
+    )
+    assert rsync.process() == ActionResponse(changed=True, data={'changes': [
+        ('send', 'file1.txt'),
+        ('send', 'file2.txt')
+    ], 'counts': {'send': 5, 'del.': 1}})
+    assert messages[-1] == '6 files processed'
+
+
+def test_failed(tmpdir):
+    executable = build_rsync_executable(tmpdir, '''\
+        echo "send file1.txt"
+        echo "rsync: change_dir failed" >&2
+        exit 23
+    ''')
+
+    rsync = Rsync('/tmp/destination', '/tmp/source', executable=executable)
+    with pytest.raises(ActionError) as e:
+        rsync.process()
+    assert e.value.args[0] == (
+        'rsync failed to sync the requested source to path: rsync: change_dir failed'
+    )
+
+
+def test_executable_missing(tmpdir):
+    rsync = Rsync('/tmp/destination', '/tmp/source', executable=tmpdir.join('rsync').strpath)
+    with pytest.raises(ActionError):
+        rsync.process()
+
+
+def test_native_same(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    sp = tmpdir.mkdir('source')
+
+    rsync = Rsync(dp.strpath, sp.strpath + sp.sep, backend='native')
+    assert rsync.process() == ActionResponse(changed=False)
+
+
+def test_native_different_options(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    dp.join('file1.txt').ensure()
+    sp = tmpdir.mkdir('source')
+    sp.join('file2.txt').write('hello')
+    sp.join('file3.txt').ensure().chmod(0o600)
+    sp.mkdir('subdirectory').join('file4.txt').ensure()
+    sp.join('link').mksymlinkto('file2.txt')
+    os.utime(sp.join('file2.txt').strpath, (1000000000, 1000000000))
+
+    rsync = Rsync(dp.strpath, sp.strpath + sp.sep, options=['--delete'], backend='native')
+    assert rsync.process() == ActionResponse(changed=True, data={'changes': [
+        ('del.', 'file1.txt'),
+        ('send', 'file2.txt'),
+        ('send', 'file3.txt'),
+        ('send', 'link'),
+        ('send', 'subdirectory/'),
+        ('send', 'subdirectory/file4.txt')
+    ], 'counts': {'del.': 1, 'send': 5}})
+
+    assert not dp.join('file1.txt').exists()
+    assert dp.join('file2.txt').read() == 'hello'
+    assert dp.join('file2.txt').mtime() == 1000000000
+    assert dp.join('file3.txt').stat().mode & 0o777 == 0o600
+    assert dp.join('link').readlink() == 'file2.txt'
+    assert dp.join('subdirectory').join('file4.txt').exists()
+
+    # A subsequent sync finds that everything is identical
+    assert rsync.process() == ActionResponse(changed=False)
+
+
+def test_native_source_without_trailing_slash(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    sp = tmpdir.mkdir('source')
+    sp.join('file1.txt').ensure()
+
+    rsync = Rsync(dp.strpath, sp.strpath, backend='native', max_changes=1)
+    assert rsync.process() == ActionResponse(changed=True, data={'changes': [
+        ('send', 'source/')
+    ], 'counts': {'send': 2}})
+    assert dp.join('source').join('file1.txt').exists()
+
+
+def test_native_changes_not_limited_by_default(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    sp = tmpdir.mkdir('source')
+    for index in range(1500):
+        sp.join(f'file{index}.txt').ensure()
+
+    rsync = Rsync(dp.strpath, sp.strpath + sp.sep, backend='native')
+    response = rsync.process()
+    assert len(response.data['changes']) == 1500
+    assert response.data['counts'] == {'send': 1500}
+
+
+def test_native_checksum(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    dp.join('file1.txt').write('hello')
+    sp = tmpdir.mkdir('source')
+    sp.join('file1.txt').write('howdy')
+    os.utime(dp.join('file1.txt').strpath, (1000000000, 1000000000))
+    os.utime(sp.join('file1.txt').strpath, (1000000000, 1000000000))
+
+    # The size and modification time match so the file is only copied when using checksums
+    rsync = Rsync(dp.strpath, sp.strpath + sp.sep, backend='native')
+    assert rsync.process() == ActionResponse(changed=False)
+    assert dp.join('file1.txt').read() == 'hello'
+
+    rsync = Rsync(dp.strpath, sp.strpath + sp.sep, options=['--checksum'], backend='native')
+    assert rsync.process() == ActionResponse(changed=True, data={'changes': [
+        ('send', 'file1.txt')
+    ], 'counts': {'send': 1}})
+    assert dp.join('file1.txt').read() == 'howdy'
+
+
+def test_native_type_changed(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    dp.mkdir('entry').join('file1.txt').ensure()
+    sp = tmpdir.mkdir('source')
+    sp.join('entry').write('hello')
+
+    rsync = Rsync(dp.strpath, sp.strpath + sp.sep, backend='native')
+    assert rsync.process() == ActionResponse(changed=True, data={'changes': [
+        ('send', 'entry')
+    ], 'counts': {'send': 1}})
+    assert dp.join('entry').read() == 'hello'
+
+
+def test_native_source_missing(tmpdir):
+    rsync = Rsync(
+        tmpdir.join('destination').strpath, tmpdir.join('source').strpath, backend='native'
+    )
+    with pytest.raises(ActionError):
+        rsync.process()
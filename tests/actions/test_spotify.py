@@ -4,7 +4,7 @@ import pytest
 from elite.actions import ActionError, ActionResponse
 from elite.actions.spotify import Spotify
 
-from .helpers import build_open_with_permission_error
+from .helpers import build_replace_with_permission_error
 
 
 def test_determine_pref_path():
@@ -78,7 +78,9 @@ def test_spotify_boolean_different(tmpdir, monkeypatch):
     monkeypatch.setattr(Spotify, 'determine_pref_path', lambda self: p.strpath)
 
     spotify = Spotify(values={'ui.show_friend_feed': False})
-    assert spotify.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert spotify.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('ui.show_friend_feed',)]
+    })
     assert p.read() == textwrap.dedent('''\
         audio.sync_bitrate_enumeration=3
         audio.play_bitrate_enumeration=0
@@ -95,7 +97,9 @@ def test_spotify_boolean_inexistent(tmpdir, monkeypatch):
     monkeypatch.setattr(Spotify, 'determine_pref_path', lambda self: p.strpath)
 
     spotify = Spotify(values={'ui.show_friend_feed': False})
-    assert spotify.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert spotify.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('ui.show_friend_feed',)]
+    })
     assert p.read() == textwrap.dedent('''\
         ui.show_friend_feed=false
     ''')
@@ -146,7 +150,10 @@ def test_spotify_integer_different(tmpdir, monkeypatch):
         },
         username='fots'
     )
-    assert spotify.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert spotify.process() == ActionResponse(changed=True, data={
+        'path': p.strpath,
+        'changed_keys': [('audio.sync_bitrate_enumeration',), ('audio.play_bitrate_enumeration',)]
+    })
     assert p.read() == textwrap.dedent('''\
         audio.sync_bitrate_enumeration=4
         audio.play_bitrate_enumeration=4
@@ -163,7 +170,9 @@ def test_spotify_integer_inexistent(tmpdir, monkeypatch):
     monkeypatch.setattr(Spotify, 'determine_pref_path', lambda self: p.strpath)
 
     spotify = Spotify(values={'audio.sync_bitrate_enumeration': 4}, username='fots')
-    assert spotify.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert spotify.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('audio.sync_bitrate_enumeration',)]
+    })
     assert p.read() == textwrap.dedent('''\
         audio.sync_bitrate_enumeration=4
     ''')
@@ -218,7 +227,10 @@ def test_spotify_string_different(tmpdir, monkeypatch):
             'autologin.username': 'fots'
         }
     )
-    assert spotify.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert spotify.process() == ActionResponse(changed=True, data={
+        'path': p.strpath,
+        'changed_keys': [('autologin.canonical_username',), ('autologin.username',)]
+    })
     assert p.read() == textwrap.dedent('''\
         autologin.canonical_username="fots"
         autologin.username="fots"
@@ -235,7 +247,9 @@ def test_spotify_string_inexistent(tmpdir, monkeypatch):
     monkeypatch.setattr(Spotify, 'determine_pref_path', lambda self: p.strpath)
 
     spotify = Spotify(values={'autologin.username': 'fots'})
-    assert spotify.process() == ActionResponse(changed=True, data={'path': p.strpath})
+    assert spotify.process() == ActionResponse(changed=True, data={
+        'path': p.strpath, 'changed_keys': [('autologin.username',)]
+    })
     assert p.read() == textwrap.dedent('''\
         autologin.username="fots"
     ''')
@@ -276,7 +290,7 @@ def test_spotify_file_value_invalid(tmpdir, monkeypatch):
 def test_spotify_not_writable(tmpdir, monkeypatch):
     p = tmpdir.join('test.json')
 
-    monkeypatch.setattr('builtins.open', build_open_with_permission_error(p.strpath))
+    monkeypatch.setattr('os.replace', build_replace_with_permission_error(p.strpath))
     monkeypatch.setattr(Spotify, 'determine_pref_path', lambda self: p.strpath)
 
     spotify = Spotify(values={'autologin.username': 'fots'})
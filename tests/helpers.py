@@ -1,5 +1,6 @@
 import grp
 import pwd
+import struct
 
 
 def getpwuid(uidobj):
@@ -51,3 +52,28 @@ def patch_root_runtime(monkeypatch):
     monkeypatch.setenv('USERNAME', 'root')
     monkeypatch.setenv('SHELL', '/bin/sh')
     monkeypatch.setenv('MAIL', '/var/mail/root')
+
+
+def build_bookmark_file(path):
+    """Builds a minimal bookmark file which points to the path provided."""
+    data = b''
+    offsets = []
+    for component in path.strip('/').split('/'):
+        component_bytes = component.encode('utf-8')
+        offsets.append(4 + len(data))
+        data += struct.pack('<II', len(component_bytes), 0x0101) + component_bytes
+        data += b'\0' * (-len(component_bytes) % 4)
+
+    array_offset = 4 + len(data)
+    data += struct.pack(f'<II{len(offsets)}I', len(offsets) * 4, 0x0601, *offsets)
+
+    toc_offset = 4 + len(data)
+    data += struct.pack('<IIIIIIII', 32, 0xfffffffe, 1, 0, 1, 0x1004, array_offset, 0)
+
+    header_size = 48
+    return (
+        b'book\0\0\0\0mark\0\0\0\0' +
+        struct.pack('<IIII', header_size, header_size, len(data) + 4, 0x10040000) +
+        b'\0' * (header_size - 32) +
+        struct.pack('<I', toc_offset) + data
+    )
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+from elite.libraries import alias
+from tests import helpers
+
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def test_is_bookmark_file(tmpdir):
+    ap = tmpdir.join('test.alias')
+    ap.write_binary(helpers.build_bookmark_file('/Users/fots/test.txt'))
+    fp = tmpdir.join('test.txt')
+    fp.write('Hello there')
+    ep = tmpdir.join('empty.txt').ensure()
+
+    assert alias.is_bookmark_file(os.path.join(FIXTURE_PATH, 'alias', 'test.alias'))
+    assert alias.is_bookmark_file(ap.strpath)
+    assert alias.is_bookmark_file(fp.strpath) is False
+    assert alias.is_bookmark_file(ep.strpath) is None
+    assert alias.is_bookmark_file(tmpdir.join('inexistent').strpath) is None
+
+
+def test_target_path():
+    with open(os.path.join(FIXTURE_PATH, 'alias', 'test.alias'), 'rb') as fp:
+        assert alias.target_path(fp.read()) == '/private/var/tmp/test.txt'
+
+    assert alias.target_path(helpers.build_bookmark_file('/Users/fots/Ünïcode file.txt')) == (
+        '/Users/fots/Ünïcode file.txt'
+    )
+
+
+def test_target_path_invalid():
+    with pytest.raises(alias.BookmarkError):
+        alias.target_path(b'hello there')
+
+    with pytest.raises(alias.BookmarkError):
+        alias.target_path(alias.BOOKMARK_FILE_MAGIC + b'\xff\xff\0\0')
+
+    with pytest.raises(alias.BookmarkError):
+        alias.target_path(helpers.build_bookmark_file('/Users/fots/test.txt')[:-40])
+
+
+def test_bookmark_file_target_path(tmpdir):
+    ap = tmpdir.join('test.alias')
+    ap.write_binary(helpers.build_bookmark_file('/Users/fots/test.txt'))
+    fp = tmpdir.join('test.txt')
+    fp.write('Hello there')
+
+    assert alias.bookmark_file_target_path(ap.strpath) == '/Users/fots/test.txt'
+    assert alias.bookmark_file_target_path(fp.strpath) is None
+    assert alias.bookmark_file_target_path(tmpdir.join('inexistent').strpath) is None
@@ -0,0 +1,91 @@
+import datetime
+import plistlib
+
+import pytest
+from elite.libraries.bplist import BinaryPlist, BinaryPlistError, LazyDict, UID, is_binary, load
+
+
+DATA = {
+    'name': 'Fots',
+    'greeting': 'Καλημέρα',
+    'python_lover': True,
+    'perl_lover': False,
+    'age': 33,
+    'large': 2 ** 40,
+    'negative': -5,
+    'height': 1.85,
+    'birthday': datetime.datetime(1985, 3, 11, 9, 30),
+    'avatar': b'\x00\x01\x02',
+    'uid': UID(7),
+    'interests': ['chickens', 'coding', {'music': ['guitar'] * 20}],
+    'friends': {'happy': {'name': 'Happy Man'}, 'sad': {'name': 'Sad Man'}},
+    'long_string': 'x' * 300,
+    'empty': {}
+}
+
+
+def test_decode_full():
+    plist = BinaryPlist(plistlib.dumps(DATA, fmt=plistlib.FMT_BINARY))
+    top = plist.top(lazy=False)
+    assert isinstance(top, dict)
+    assert top == DATA
+
+
+def test_decode_lazy():
+    plist = BinaryPlist(plistlib.dumps(DATA, fmt=plistlib.FMT_BINARY))
+    top = plist.top()
+    assert isinstance(top, LazyDict)
+    assert not top._values  # pylint: disable=protected-access
+
+    assert isinstance(top['friends'], LazyDict)
+    assert top['friends']['happy'] == {'name': 'Happy Man'}
+    assert list(top._values) == ['friends']  # pylint: disable=protected-access
+    assert top['friends'] is top['friends']
+
+    assert len(top) == len(DATA)
+    assert dict(top) == DATA
+    assert 'missing' not in top
+
+
+def test_decode_invalid():
+    with pytest.raises(BinaryPlistError):
+        BinaryPlist(b'<?xml version="1.0" encoding="UTF-8"?>')
+
+    data = bytearray(plistlib.dumps(DATA, fmt=plistlib.FMT_BINARY))
+    with pytest.raises(BinaryPlistError):
+        BinaryPlist(bytes(data[:-1]))
+
+    # Point the offset of the top object beyond the end of the data
+    plist = BinaryPlist(bytes(data))
+    offset = plist.offset_table_offset + plist.top_object * plist.offset_size
+    data[offset:offset + plist.offset_size] = b'\xff' * plist.offset_size
+    with pytest.raises(BinaryPlistError):
+        BinaryPlist(bytes(data)).top()
+
+
+def test_is_binary(tmpdir):
+    binary = tmpdir.join('binary.plist')
+    binary.write_binary(plistlib.dumps(DATA, fmt=plistlib.FMT_BINARY))
+    xml = tmpdir.join('xml.plist')
+    xml.write_binary(plistlib.dumps({'name': 'Fots'}, fmt=plistlib.FMT_XML))
+
+    assert is_binary(binary.strpath)
+    assert not is_binary(xml.strpath)
+    assert not is_binary(tmpdir.join('missing.plist').strpath)
+
+
+def test_load(tmpdir):
+    p = tmpdir.join('test.plist')
+    p.write_binary(plistlib.dumps(DATA, fmt=plistlib.FMT_BINARY))
+
+    top = load(p.strpath)
+    assert isinstance(top, LazyDict)
+    assert top == DATA
+
+
+def test_load_empty(tmpdir):
+    p = tmpdir.join('test.plist')
+    p.write_binary(b'')
+
+    with pytest.raises(BinaryPlistError):
+        load(p.strpath)
@@ -0,0 +1,102 @@
+import json
+import os
+
+from elite.libraries.documents import DocumentStore
+
+
+def load_json(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return {}
+
+
+def dump_json(data):
+    return json.dumps(data).encode()
+
+
+def test_load_once(tmpdir):
+    p = tmpdir.join('test.json')
+    p.write('{"name": "Fots"}')
+    loads = []
+
+    def load(path):
+        loads.append(path)
+        return load_json(path)
+
+    store = DocumentStore()
+    assert store.load(p.strpath, load) == {'name': 'Fots'}
+    assert store.load(p.strpath, load) is store.load(p.strpath, load)
+    assert loads == [p.strpath]
+
+
+def test_load_modified_externally(tmpdir):
+    p = tmpdir.join('test.json')
+    p.write('{"name": "Fots"}')
+
+    store = DocumentStore()
+    assert store.load(p.strpath, load_json) == {'name': 'Fots'}
+
+    p.write('{"name": "Happy Man"}')
+    os.utime(p.strpath, ns=(0, 0))
+    assert store.load(p.strpath, load_json) == {'name': 'Happy Man'}
+
+
+def test_save_and_flush(tmpdir):
+    p = tmpdir.join('test.json')
+
+    store = DocumentStore()
+    data = store.load(p.strpath, load_json)
+    data['name'] = 'Fots'
+    store.save(p.strpath, data, dump_json)
+    data['age'] = 33
+    store.save(p.strpath, data, dump_json)
+    assert not p.exists()
+
+    assert store.flush() == []
+    assert json.loads(p.read()) == {'name': 'Fots', 'age': 33}
+
+    # Unmodified documents aren't written again and the written document remains loaded
+    p.remove()
+    assert store.flush() == []
+    assert not p.exists()
+    assert store.load(p.strpath, load_json) == {}
+
+
+def test_format(tmpdir):
+    p = tmpdir.join('test.json')
+    p.write('{"name": "Fots"}')
+
+    store = DocumentStore()
+    data = store.load(p.strpath, load_json, lambda path: 'compact')
+    assert store.fmt(p.strpath) == 'compact'
+
+    store.save(p.strpath, data, dump_json, 'pretty')
+    assert store.fmt(p.strpath) == 'pretty'
+    assert store.fmt(tmpdir.join('missing.json').strpath) is None
+
+
+def test_flush_single_path(tmpdir):
+    p1 = tmpdir.join('test1.json')
+    p2 = tmpdir.join('test2.json')
+
+    store = DocumentStore()
+    store.save(p1.strpath, {'name': 'Fots'}, dump_json)
+    store.save(p2.strpath, {'name': 'Happy Man'}, dump_json)
+
+    assert store.flush(p1.strpath) == []
+    assert p1.exists()
+    assert not p2.exists()
+
+
+def test_flush_failed(tmpdir):
+    p = tmpdir.join('directory', 'test.json')
+
+    store = DocumentStore()
+    store.save(p.strpath, {'name': 'Fots'}, dump_json)
+
+    failures = store.flush()
+    assert [path for path, _error in failures] == [p.strpath]
+    assert isinstance(failures[0][1], FileNotFoundError)
+    assert store.documents == {}
@@ -0,0 +1,213 @@
+import errno
+import hashlib
+import os
+import zlib
+from unittest import mock
+
+import pytest
+from elite.libraries import files
+
+
+def test_digest(tmpdir):
+    p = tmpdir.join('file.bin')
+    p.write_binary(b'Hello there' * 1000)
+
+    assert files.digest(p.strpath, buffer_size=64) == hashlib.blake2b(
+        b'Hello there' * 1000
+    ).hexdigest()
+
+
+def test_crc32(tmpdir):
+    p = tmpdir.join('file.bin')
+    p.write_binary(b'Hello there' * 1000)
+
+    assert files.crc32(p.strpath, buffer_size=64) == zlib.crc32(b'Hello there' * 1000)
+
+
+def test_compare_identical(tmpdir):
+    p1 = tmpdir.join('file1.bin')
+    p1.write_binary(b'Hello there' * 1000)
+    p2 = tmpdir.join('file2.bin')
+    p2.write_binary(b'Hello there' * 1000)
+
+    digest = hashlib.blake2b(b'Hello there' * 1000).hexdigest()
+    assert files.compare(p1.strpath, p2.strpath, buffer_size=64) == (True, digest, digest)
+
+
+def test_compare_empty(tmpdir):
+    p1 = tmpdir.join('file1.bin').ensure()
+    p2 = tmpdir.join('file2.bin').ensure()
+
+    digest = hashlib.blake2b().hexdigest()
+    assert files.compare(p1.strpath, p2.strpath) == (True, digest, digest)
+
+
+def test_compare_different(tmpdir):
+    p1 = tmpdir.join('file1.bin')
+    p1.write_binary(b'Hello there' * 1000)
+    p2 = tmpdir.join('file2.bin')
+    p2.write_binary(b'Hello there' * 999 + b'Hello where')
+    p3 = tmpdir.join('file3.bin')
+    p3.write_binary(b'Hello there' * 999)
+
+    assert files.compare(p1.strpath, p2.strpath, buffer_size=64) == (False, None, None)
+    assert files.compare(p1.strpath, p3.strpath, buffer_size=64) == (False, None, None)
+
+
+def test_compare_known_digests(tmpdir):
+    p1 = tmpdir.join('file1.bin')
+    p1.write_binary(b'Hello there' * 1000)
+    p2 = tmpdir.join('file2.bin')
+    p2.write_binary(b'Hello there' * 1000)
+    digest = hashlib.blake2b(b'Hello there' * 1000).hexdigest()
+
+    # Known digests are trusted in place of reading the files
+    assert files.compare(
+        p1.strpath, p2.strpath, source_digest='abc', destination_digest='def'
+    ) == (False, None, None)
+    assert files.compare(
+        p1.strpath, p2.strpath, source_digest='abc', destination_digest='abc'
+    ) == (True, 'abc', 'abc')
+
+    # Only the file whose digest is unknown is hashed
+    assert files.compare(p1.strpath, p2.strpath, source_digest=digest) == (True, digest, digest)
+    assert files.compare(p1.strpath, p2.strpath, destination_digest='abc') == (False, None, None)
+
+
+def test_compare_size_differs(tmpdir, monkeypatch):
+    p1 = tmpdir.join('file1.bin')
+    p1.write_binary(b'Hello there' * 1000)
+    p2 = tmpdir.join('file2.bin')
+    p2.write_binary(b'Hello there')
+
+    def compare_contents(*args):
+        raise AssertionError('the contents should not be compared')
+
+    monkeypatch.setattr(files, '_compare_contents', compare_contents)
+    assert files.compare(p1.strpath, p2.strpath) == (False, None, None)
+
+
+def test_compare_digest_not_required(tmpdir):
+    p1 = tmpdir.join('file1.bin')
+    p1.write_binary(b'Hello there' * 1000)
+    p2 = tmpdir.join('file2.bin')
+    p2.write_binary(b'Hello there' * 1000)
+
+    assert files.compare(p1.strpath, p2.strpath, digest_required=False) == (True, None, None)
+
+
+def test_stat_signature(tmpdir):
+    p = tmpdir.join('file.bin')
+    p.write_binary(b'Hello there')
+    stat = os.stat(p.strpath)
+
+    assert files.stat_signature(stat) == (stat.st_dev, stat.st_ino, 11, stat.st_mtime_ns)
+
+
+def test_copy(tmpdir):
+    sp = tmpdir.join('source.bin')
+    sp.write_binary(b'Hello there' * 1000)
+    dp = tmpdir.join('destination.bin')
+
+    digest = files.copy(sp.strpath, dp.strpath, buffer_size=64)
+    assert digest == hashlib.blake2b(b'Hello there' * 1000).hexdigest()
+    assert dp.read_binary() == b'Hello there' * 1000
+    assert sorted(tmpdir.listdir()) == [dp, sp]
+
+
+def test_copy_source_digest(tmpdir):
+    sp = tmpdir.join('source.bin')
+    sp.write_binary(b'Hello there' * 1000)
+    dp = tmpdir.join('destination.bin')
+    dp.write_binary(b'Goodbye')
+    dp.chmod(0o640)
+
+    assert files.copy(sp.strpath, dp.strpath, source_digest='abc') == 'abc'
+    assert dp.read_binary() == b'Hello there' * 1000
+    assert oct(dp.stat().mode)[-4:] == '0640'
+    assert sorted(tmpdir.listdir()) == [dp, sp]
+
+
+def test_copy_digest_not_required(tmpdir):
+    sp = tmpdir.join('source.bin')
+    sp.write_binary(b'Hello there' * 1000)
+    dp = tmpdir.join('destination.bin')
+
+    assert files.copy(sp.strpath, dp.strpath, digest_required=False) is None
+    assert dp.read_binary() == b'Hello there' * 1000
+    assert sorted(tmpdir.listdir()) == [dp, sp]
+
+
+def test_copy_kernel_copy_unsupported(tmpdir, monkeypatch):
+    sp = tmpdir.join('source.bin')
+    sp.write_binary(b'Hello there' * 1000)
+    dp = tmpdir.join('destination.bin')
+
+    def unsupported(*args, **kwargs):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+    monkeypatch.setattr(files, '_clonefile', None)
+    monkeypatch.setattr('os.copy_file_range', unsupported, raising=False)
+    monkeypatch.setattr('os.sendfile', unsupported, raising=False)
+
+    digest = files.copy(sp.strpath, dp.strpath, source_digest='abc')
+    assert digest == hashlib.blake2b(b'Hello there' * 1000).hexdigest()
+    assert dp.read_binary() == b'Hello there' * 1000
+
+
+def test_copy_kernel_copy_short(tmpdir, monkeypatch):
+    sp = tmpdir.join('source.bin')
+    sp.write_binary(b'Hello there' * 1000)
+    dp = tmpdir.join('destination.bin')
+
+    def short_copy(source_fd, destination_fd, count):
+        # Copy part of the file and then report that the end of the source was reached
+        if os.lseek(source_fd, 0, os.SEEK_CUR):
+            return 0
+        return os.write(destination_fd, os.read(source_fd, 100))
+
+    monkeypatch.setattr(files, '_clonefile', None)
+    monkeypatch.setattr('os.copy_file_range', short_copy, raising=False)
+
+    # The partial copy is discarded and the file is copied through a buffer instead, so the
+    # digest returned is that of the contents actually copied
+    digest = files.copy(sp.strpath, dp.strpath, source_digest='abc')
+    assert digest == hashlib.blake2b(b'Hello there' * 1000).hexdigest()
+    assert dp.read_binary() == b'Hello there' * 1000
+
+
+def test_copy_failed(tmpdir, monkeypatch):
+    sp = tmpdir.join('source.bin')
+    sp.write_binary(b'Hello there' * 1000)
+    dp = tmpdir.join('destination.bin')
+    dp.write_binary(b'Goodbye')
+
+    monkeypatch.setattr('os.replace', mock.Mock(side_effect=OSError))
+
+    with pytest.raises(OSError):
+        files.copy(sp.strpath, dp.strpath)
+    assert dp.read_binary() == b'Goodbye'
+    assert sorted(tmpdir.listdir()) == [dp, sp]
+
+
+def test_write(tmpdir):
+    p = tmpdir.join('test.txt')
+    p.write('Goodbye')
+    p.chmod(0o640)
+
+    files.write(p.strpath, b'Hello there')
+    assert p.read() == 'Hello there'
+    assert oct(p.stat().mode)[-4:] == '0640'
+    assert tmpdir.listdir() == [p]
+
+
+def test_write_failed(tmpdir, monkeypatch):
+    p = tmpdir.join('test.txt')
+    p.write('Goodbye')
+
+    monkeypatch.setattr('os.replace', mock.Mock(side_effect=OSError))
+
+    with pytest.raises(OSError):
+        files.write(p.strpath, b'Hello there')
+    assert p.read() == 'Goodbye'
+    assert tmpdir.listdir() == [p]
@@ -0,0 +1,225 @@
+import os
+import pwd
+
+import pytest
+from elite.libraries import find
+
+
+def build_directory(p):
+    p.join('filea1.yaml').write('a' * 10)
+    p.join('filea2.json').write('a' * 20)
+    d1 = p.mkdir('test')
+    d1.join('fileb1.txt').write('a' * 30)
+    d1.join('fileb2.JSON').write('a' * 40)
+    d1.join('symlinkb1.txt').mksymlinkto('fileb1.txt')
+    d2 = d1.mkdir('wow')
+    d2.join('filec1').write('a' * 50)
+
+    for index, path in enumerate(sorted(p.visit(), key=str)):
+        os.utime(path.strpath, ns=(index, index), follow_symlinks=False)
+
+
+def test_walk(tmpdir):
+    build_directory(tmpdir)
+    entries = find.walk(tmpdir.strpath, types=['file'])
+    assert not isinstance(entries, list)
+    assert sorted(entry.path for entry in entries) == [
+        tmpdir.join('filea1.yaml').strpath,
+        tmpdir.join('filea2.json').strpath,
+        tmpdir.join('test/fileb1.txt').strpath,
+        tmpdir.join('test/fileb2.JSON').strpath,
+        tmpdir.join('test/wow/filec1').strpath
+    ]
+
+
+def test_walk_aliases(tmpdir):
+    build_directory(tmpdir)
+    entries = find.walk(
+        tmpdir.strpath, types=['alias'], is_alias=lambda path: path.endswith('.json')
+    )
+    assert [entry.path for entry in entries] == [tmpdir.join('filea2.json').strpath]
+
+
+def test_walk_flags_invalid(tmpdir):
+    build_directory(tmpdir)
+    with pytest.raises(ValueError):
+        list(find.walk(tmpdir.strpath, flags=['hmmm']))
+
+
+def test_aggregate_count(tmpdir):
+    build_directory(tmpdir)
+    assert find.aggregate(find.walk(tmpdir.strpath), 'count') == 8
+
+
+def test_aggregate_size(tmpdir):
+    build_directory(tmpdir)
+    assert find.aggregate(find.walk(tmpdir.strpath, types=['file']), 'size') == 150
+    assert find.aggregate(find.walk(tmpdir.strpath, types=['symlink']), 'size') == 10
+
+
+def test_aggregate_extensions(tmpdir):
+    build_directory(tmpdir)
+    assert find.aggregate(find.walk(tmpdir.strpath), 'extensions') == {
+        '': 3, '.json': 2, '.txt': 2, '.yaml': 1
+    }
+
+
+def getpwuid(known_uid, uid):
+    if uid == known_uid:
+        return pwd.struct_passwd(
+            ('fots', '********', uid, 20, 'Fotis Gimian', '/Users/fots', '/bin/bash')
+        )
+    else:
+        raise KeyError(f'getpwuid(): uid not found: {uid}')
+
+
+def test_aggregate_owners(tmpdir, monkeypatch):
+    build_directory(tmpdir)
+    uid = os.getuid()
+
+    monkeypatch.setattr('pwd.getpwuid', lambda uid_: getpwuid(uid, uid_))
+    assert find.aggregate(find.walk(tmpdir.strpath), 'owners') == {'fots': 8}
+
+    monkeypatch.setattr('pwd.getpwuid', lambda uid_: getpwuid(None, uid_))
+    assert find.aggregate(find.walk(tmpdir.strpath), 'owners') == {str(uid): 8}
+
+
+def test_aggregate_newest_oldest(tmpdir):
+    build_directory(tmpdir)
+    assert find.aggregate(find.walk(tmpdir.strpath, types=['file']), 'newest', limit=2) == [
+        tmpdir.join('test/wow/filec1').strpath,
+        tmpdir.join('test/fileb2.JSON').strpath
+    ]
+    assert find.aggregate(find.walk(tmpdir.strpath, types=['file']), 'oldest', limit=2) == [
+        tmpdir.join('filea1.yaml').strpath,
+        tmpdir.join('filea2.json').strpath
+    ]
+
+
+def test_aggregate_invalid(tmpdir):
+    build_directory(tmpdir)
+    with pytest.raises(ValueError):
+        find.aggregate(find.walk(tmpdir.strpath), 'hmmm')
+
+
+def test_index_walk(tmpdir):
+    build_directory(tmpdir)
+    with find.Index(tmpdir.join('index.sqlite').strpath) as index:
+        d = tmpdir.join('test').strpath
+        index.update(d)
+
+        for kwargs in [
+            {},
+            {'types': ['file']},
+            {'types': ['directory', 'symlink']},
+            {'min_depth': 2},
+            {'max_depth': 1},
+            {'patterns': ['*.txt', '*/wow*']},
+            {'mode': oct(os.stat(tmpdir.join('test/fileb1.txt').strpath).st_mode)[-4:]},
+            {'uid': os.getuid(), 'gid': os.getgid()}
+        ]:
+            assert (
+                sorted(entry.path for entry in index.walk(d, **kwargs)) ==
+                sorted(entry.path for entry in find.walk(d, **kwargs))
+            )
+
+        assert find.aggregate(index.walk(d, types=['file']), 'size') == 120
+        assert find.aggregate(index.walk(d, types=['file']), 'newest', limit=1) == [
+            tmpdir.join('test/wow/filec1').strpath
+        ]
+
+
+def test_index_walk_symlinked_directory(tmpdir):
+    build_directory(tmpdir)
+    d = tmpdir.join('test')
+    d.join('symlinkwow').mksymlinkto('wow')
+
+    with find.Index(tmpdir.join('index.sqlite').strpath) as index:
+        index.update(d.strpath)
+
+        for kwargs in [{}, {'types': ['directory']}, {'types': ['symlink']}, {'min_depth': 2}]:
+            assert (
+                sorted(entry.path for entry in index.walk(d.strpath, **kwargs)) ==
+                sorted(entry.path for entry in find.walk(d.strpath, **kwargs))
+            )
+
+        # Symlinked directories are typed as directories but their contents aren't indexed
+        assert d.join('symlinkwow/filec1').strpath not in [
+            entry.path for entry in index.walk(d.strpath)
+        ]
+        assert find.aggregate(index.walk(d.strpath), 'count') == find.aggregate(
+            find.walk(d.strpath), 'count'
+        )
+
+
+def test_index_update(tmpdir, monkeypatch):
+    build_directory(tmpdir)
+    with find.Index(tmpdir.join('index.sqlite').strpath) as index:
+        d = tmpdir.join('test')
+        index.update(d.strpath)
+
+        d.join('wow/filec2').write('a' * 60)
+        d.join('fileb2.JSON').remove()
+
+        # Only the directories which have changed are scanned again
+        scandir = os.scandir
+        scanned = []
+
+        def scandir_spy(path):
+            scanned.append(path)
+            return scandir(path)
+
+        monkeypatch.setattr('os.scandir', scandir_spy)
+        index.update(d.strpath)
+        assert scanned == [d.strpath, d.join('wow').strpath]
+
+        scanned.clear()
+        index.update(d.strpath)
+        assert scanned == []
+
+        assert sorted(entry.path for entry in index.walk(d.strpath, types=['file'])) == [
+            d.join('fileb1.txt').strpath,
+            d.join('wow/filec1').strpath,
+            d.join('wow/filec2').strpath
+        ]
+
+        # Removed directories are removed from the index along with their contents
+        d.join('wow').remove()
+        index.update(d.strpath)
+        assert sorted(entry.path for entry in index.walk(d.strpath)) == [
+            d.join('fileb1.txt').strpath,
+            d.join('symlinkb1.txt').strpath
+        ]
+
+
+def test_index_aliases(tmpdir):
+    p = tmpdir.mkdir('tree')
+    build_directory(p)
+    checked = []
+
+    def is_alias(path):
+        checked.append(path)
+        return path.endswith('.json')
+
+    with find.Index(tmpdir.join('index.sqlite').strpath) as index:
+        d = p.join('test').strpath
+        index.update(d)
+
+        for _attempt in range(2):
+            entries = index.walk(d, types=['alias'], is_alias=is_alias)
+            assert [entry.path for entry in entries] == []
+            entries = index.walk(p.strpath, types=['alias'], is_alias=is_alias)
+            assert [entry.path for entry in entries] == []
+
+        index.update(p.strpath)
+        entries = index.walk(p.strpath, types=['alias'], is_alias=is_alias)
+        assert [entry.path for entry in entries] == [p.join('filea2.json').strpath]
+
+    # Each file is only checked once as the result is recorded in the index
+    assert sorted(checked) == [
+        p.join('filea1.yaml').strpath,
+        p.join('filea2.json').strpath,
+        p.join('test/fileb1.txt').strpath,
+        p.join('test/fileb2.JSON').strpath,
+        p.join('test/wow/filec1').strpath
+    ]
@@ -0,0 +1,106 @@
+import textwrap
+
+import pytest
+from elite.libraries.git_state import GitRepository, GitStateError, parse_config
+
+
+def test_parse_config():
+    config = parse_config(textwrap.dedent('''\
+        # A comment
+        [core]
+        \tbare = false
+        \tignorecase
+        [remote "origin"]
+        \turl = "https://github.com/fgimian/painter.git" ; a comment
+        \turl = https://gitlab.com/fgimian/painter.git
+        [Branch.Master]
+        \tdescription = "a \\"quoted\\" # description" \\
+        over  two lines
+        [alias "Spaced \\"Name\\""] lg = log --oneline
+    '''))
+    assert config == {
+        ('core', None): {'bare': ['false'], 'ignorecase': [True]},
+        ('remote', 'origin'): {'url': [
+            'https://github.com/fgimian/painter.git', 'https://gitlab.com/fgimian/painter.git'
+        ]},
+        ('branch', 'master'): {'description': ['a "quoted" # description over  two lines']},
+        ('alias', 'Spaced "Name"'): {'lg': ['log --oneline']}
+    }
+
+
+def test_parse_config_invalid():
+    with pytest.raises(GitStateError):
+        parse_config('[remote "origin"\n')
+    with pytest.raises(GitStateError):
+        parse_config('url = https://github.com/fgimian/painter.git\n')
+    with pytest.raises(GitStateError):
+        parse_config('[core]\n\teditor = "vim \\q"\n')
+
+
+def test_repository_inexistent(tmpdir):
+    repository = GitRepository(tmpdir.strpath)
+    assert not repository.exists
+
+
+def test_repository_state(tmpdir):
+    git_dir = tmpdir.mkdir('.git')
+    git_dir.join('config').write(
+        '[remote "origin"]\n\turl = https://github.com/fgimian/painter.git\n'
+    )
+    git_dir.join('HEAD').write('ref: refs/heads/master\n')
+    git_dir.join('refs', 'heads', 'feature').ensure().write('b' * 40 + '\n')
+    git_dir.join('packed-refs').write(
+        '# pack-refs with: peeled fully-peeled sorted \n' +
+        'a' * 40 + ' refs/heads/master\n' +
+        'c' * 40 + ' refs/tags/v1.0\n' +
+        '^' + 'd' * 40 + '\n'
+    )
+
+    repository = GitRepository(tmpdir.strpath)
+    assert repository.exists
+    assert repository.remote_url('origin') == 'https://github.com/fgimian/painter.git'
+    assert repository.remote_url('github') is None
+    assert repository.symbolic_ref() == 'refs/heads/master'
+    assert repository.branch() == 'master'
+    assert repository.resolve() == 'a' * 40
+    assert repository.resolve('refs/heads/feature') == 'b' * 40
+    assert repository.resolve('refs/tags/v1.0') == 'c' * 40
+    assert repository.resolve('refs/heads/missing') is None
+
+
+def test_repository_detached(tmpdir):
+    git_dir = tmpdir.mkdir('.git')
+    git_dir.join('HEAD').write('a' * 40 + '\n')
+
+    repository = GitRepository(tmpdir.strpath)
+    assert repository.config == {}
+    assert repository.symbolic_ref() is None
+    assert repository.branch() is None
+    assert repository.resolve() == 'a' * 40
+
+
+def test_repository_worktree(tmpdir):
+    main_git_dir = tmpdir.mkdir('main').mkdir('.git')
+    main_git_dir.join('config').write('[remote "origin"]\n\turl = /srv/painter.git\n')
+    main_git_dir.join('HEAD').write('ref: refs/heads/master\n')
+    main_git_dir.join('refs', 'heads', 'feature').ensure().write('b' * 40 + '\n')
+
+    worktree_git_dir = main_git_dir.join('worktrees', 'feature').ensure(dir=True)
+    worktree_git_dir.join('commondir').write('../..\n')
+    worktree_git_dir.join('HEAD').write('ref: refs/heads/feature\n')
+
+    worktree = tmpdir.mkdir('feature')
+    worktree.join('.git').write('gitdir: ../main/.git/worktrees/feature\n')
+
+    repository = GitRepository(worktree.strpath)
+    assert repository.exists
+    assert repository.common_dir == main_git_dir.strpath
+    assert repository.remote_url('origin') == '/srv/painter.git'
+    assert repository.branch() == 'feature'
+    assert repository.resolve() == 'b' * 40
+
+
+def test_repository_invalid_git_file(tmpdir):
+    tmpdir.join('.git').write('hello\n')
+    with pytest.raises(GitStateError):
+        GitRepository(tmpdir.strpath)
@@ -0,0 +1,80 @@
+import http.server
+import threading
+from contextlib import contextmanager
+
+from elite.libraries.http_pool import ConnectionPool, build_opener
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections.append(self.client_address)
+
+    def do_GET(self):  # noqa: N802 pylint: disable=invalid-name
+        self.send_response(200)
+        self.send_header('Content-Length', '5')
+        self.end_headers()
+        self.wfile.write(b'hello')
+
+        # Drop the connection without advising the client to simulate a keep-alive timeout
+        self.close_connection = self.server.drop_connections
+
+    def log_message(self, format, *args):  # noqa: A002 pylint: disable=redefined-builtin
+        pass
+
+
+@contextmanager
+def http_server(drop_connections=False):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+    server.connections = []
+    server.drop_connections = drop_connections
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_connections_reused():
+    pool = ConnectionPool()
+    opener = build_opener(pool)
+
+    with http_server() as server:
+        for _attempt in range(3):
+            with opener.open(server.url) as response:
+                assert response.read() == b'hello'
+
+        assert len(server.connections) == 1
+
+    pool.close()
+    assert not pool.connections
+
+
+def test_incomplete_response_not_reused():
+    pool = ConnectionPool()
+    opener = build_opener(pool)
+
+    with http_server() as server:
+        for _attempt in range(2):
+            with opener.open(server.url) as response:
+                assert response.read(1) == b'h'
+
+        assert len(server.connections) == 2
+
+
+def test_stale_connection_retried():
+    pool = ConnectionPool()
+    opener = build_opener(pool)
+
+    with http_server(drop_connections=True) as server:
+        for _attempt in range(2):
+            with opener.open(server.url) as response:
+                assert response.read() == b'hello'
+
+        assert len(server.connections) == 2
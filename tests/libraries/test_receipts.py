@@ -0,0 +1,66 @@
+import os
+import plistlib
+
+from elite.libraries.receipts import ReceiptsIndex, parse_version
+
+
+def write_receipt(directory, identifier, version):
+    with open(directory.join(f'{identifier}.plist').strpath, 'wb') as fp:
+        plistlib.dump({'PackageIdentifier': identifier, 'PackageVersion': version}, fp)
+    directory.join(f'{identifier}.bom').ensure()
+
+
+def test_parse_version():
+    assert parse_version('1.3.0.3') == (1, 3, 0, 3)
+    assert parse_version('2.10b1') == (2, 10, 1)
+    assert parse_version(None) == ()
+    assert parse_version('1.10') > parse_version('1.9')
+
+
+def test_index(tmpdir):
+    rp1 = tmpdir.mkdir('receipts1')
+    rp2 = tmpdir.mkdir('receipts2')
+    write_receipt(rp1, 'com.company.first', '1.0')
+    write_receipt(rp2, 'com.company.first', '2.0')
+    write_receipt(rp2, 'com.company.second', '1.5')
+    rp2.join('com.company.nobom.plist').ensure()
+
+    receipts_index = ReceiptsIndex([rp1.strpath, rp2.strpath, tmpdir.join('inexistent').strpath])
+    assert 'com.company.first' in receipts_index
+    assert 'com.company.second' in receipts_index
+    assert 'com.company.nobom' not in receipts_index
+    assert receipts_index.version('com.company.first') == '1.0'
+    assert receipts_index.version('com.company.second') == '1.5'
+    assert receipts_index.version('com.company.third') is None
+
+
+def test_version_invalid_plist(tmpdir):
+    rp = tmpdir.mkdir('receipts')
+    rp.join('com.company.first.plist').write('boo')
+    rp.join('com.company.first.bom').ensure()
+
+    receipts_index = ReceiptsIndex([rp.strpath])
+    assert receipts_index.version('com.company.first') is None
+    assert not receipts_index.outdated('com.company.first', '1.0')
+
+
+def test_outdated(tmpdir):
+    rp = tmpdir.mkdir('receipts')
+    write_receipt(rp, 'com.company.first', '1.2.9')
+
+    receipts_index = ReceiptsIndex([rp.strpath])
+    assert receipts_index.outdated('com.company.first', '1.3.0')
+    assert not receipts_index.outdated('com.company.first', '1.2.9')
+    assert not receipts_index.outdated('com.company.first', '1.2')
+    assert not receipts_index.outdated('com.company.first', None)
+    assert not receipts_index.outdated('com.company.second', '1.0')
+
+
+def test_stale(tmpdir):
+    rp = tmpdir.mkdir('receipts')
+    receipts_index = ReceiptsIndex([rp.strpath, tmpdir.join('inexistent').strpath])
+    assert not receipts_index.stale()
+
+    write_receipt(rp, 'com.company.first', '1.0')
+    os.utime(rp.strpath, ns=(0, 0))
+    assert receipts_index.stale()
@@ -0,0 +1,57 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from elite.libraries.tree_sync import scan, sync
+
+
+def test_scan(tmpdir):
+    p = tmpdir.mkdir('tree')
+    p.join('file1.txt').write('hello')
+    p.mkdir('subdirectory').join('file2.txt').ensure()
+    p.join('link').mksymlinkto('file1.txt')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        entries = scan(p.strpath, executor, workers=2)
+        assert scan(tmpdir.join('missing').strpath, executor, workers=2) == {}
+
+    assert sorted(entries) == [
+        'file1.txt', 'link', 'subdirectory', os.path.join('subdirectory', 'file2.txt')
+    ]
+    assert entries['file1.txt'].st_size == 5
+    assert entries['link'].st_ino == os.lstat(p.join('link').strpath).st_ino
+
+
+def test_sync_delete_nested(tmpdir):
+    dp = tmpdir.mkdir('destination')
+    dp.mkdir('old').mkdir('nested').join('file1.txt').ensure()
+    dp.join('keep.txt').ensure()
+    sp = tmpdir.mkdir('source')
+    sp.mkdir('directory').join('file2.txt').ensure()
+
+    # Deleted entries are reported deepest first before the entries sent
+    assert sync(sp.strpath, dp.strpath, delete=True, workers=2) == [
+        ('del.', 'old/nested/file1.txt'),
+        ('del.', 'old/nested/'),
+        ('del.', 'old/'),
+        ('del.', 'keep.txt'),
+        ('send', 'directory/'),
+        ('send', 'directory/file2.txt')
+    ]
+    assert sorted(os.listdir(dp.strpath)) == ['directory']
+
+
+def test_sync_preserves_directory_attributes(tmpdir):
+    dp = tmpdir.join('destination')
+    sp = tmpdir.mkdir('source')
+    d = sp.mkdir('directory')
+    d.join('file1.txt').ensure()
+    d.chmod(0o750)
+    os.utime(d.strpath, (1000000000, 1000000000))
+
+    assert sync(sp.strpath, dp.strpath) == [
+        ('send', 'directory/'),
+        ('send', 'directory/file1.txt')
+    ]
+    assert dp.join('directory').stat().mode & 0o777 == 0o750
+    assert dp.join('directory').mtime() == 1000000000
+    assert sync(sp.strpath, dp.strpath) == []
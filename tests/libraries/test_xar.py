@@ -0,0 +1,54 @@
+import os
+import struct
+
+import pytest
+from elite.libraries import xar
+
+
+def build_xar(toc):
+    return struct.pack('>4sHHQQI', b'xar!', 28, 1, len(toc), len(toc) * 2, 1) + toc + b'heap'
+
+
+def test_toc_checksum(tmpdir):
+    p1 = tmpdir.join('package1.pkg')
+    p1.write_binary(build_xar(b'toc1'))
+    p2 = tmpdir.join('package2.pkg')
+    p2.write_binary(build_xar(b'toc1'))
+    p3 = tmpdir.join('package3.pkg')
+    p3.write_binary(build_xar(b'toc2'))
+
+    assert xar.toc_checksum(p1.strpath) == xar.toc_checksum(p2.strpath)
+    assert xar.toc_checksum(p1.strpath) != xar.toc_checksum(p3.strpath)
+
+
+def test_toc_checksum_invalid(tmpdir):
+    p = tmpdir.join('package.pkg')
+
+    with pytest.raises(xar.XarError):
+        xar.toc_checksum(p.strpath)
+
+    p.write_binary(b'xar!')
+    with pytest.raises(xar.XarError):
+        xar.toc_checksum(p.strpath)
+
+    p.write_binary(build_xar(b'toc').replace(b'xar!', b'rar!'))
+    with pytest.raises(xar.XarError):
+        xar.toc_checksum(p.strpath)
+
+    p.write_binary(build_xar(b'toc')[:30])
+    with pytest.raises(xar.XarError):
+        xar.toc_checksum(p.strpath)
+
+
+def test_signature(tmpdir):
+    p = tmpdir.join('package.pkg')
+    p.write_binary(build_xar(b'toc'))
+
+    path, size, mtime_ns, toc_checksum = xar.signature(p.strpath)
+    assert path == p.strpath
+    assert size == 35
+    assert mtime_ns == os.stat(p.strpath).st_mtime_ns
+    assert toc_checksum == xar.toc_checksum(p.strpath)
+
+    p.write_binary(b'boo')
+    assert xar.signature(p.strpath) is None
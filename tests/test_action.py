@@ -20,6 +20,16 @@ def test_action_changed():
     )
 
 
+def test_action_progress():
+    messages = []
+    action = Action(progress_fn=messages.append)
+    action.progress('50% complete')
+    assert messages == ['50% complete']
+
+    # Progress is simply discarded when no function is provided
+    Action().progress('50% complete')
+
+
 def test_action_run_ok():
     action = Action()
     process = action.run(['echo', '-n', 'hi'])
@@ -335,6 +345,75 @@ def test_file_action_set_file_attributes_change_flags_not_writable(tmpdir, monke
         assert file_action.set_file_attributes(p.strpath)
 
 
+def build_tree(p):
+    p.chmod(0o755)
+    p.join('file1.txt').ensure().chmod(0o644)
+    p.join('file2.txt').ensure().chmod(0o600)
+    d = p.mkdir('directory')
+    d.chmod(0o700)
+    d.join('file3.txt').ensure().chmod(0o644)
+    d.join('symlink.txt').mksymlinkto('file3.txt')
+
+
+def test_file_action_set_file_attributes_recursive_mode(tmpdir):
+    p = tmpdir.mkdir('tree')
+    build_tree(p)
+
+    file_action = FileAction(mode='0644', recurse=True)
+    assert file_action.set_file_attributes_recursive(p.strpath) == 3
+    for path in ['', 'file1.txt', 'file2.txt', 'directory', 'directory/file3.txt']:
+        assert oct(p.join(path).stat().mode)[-4:] == '0644'
+
+    assert file_action.set_file_attributes_recursive(p.strpath) == 0
+    assert file_action.set_file_attributes(p.strpath) is False
+
+
+def test_file_action_set_file_attributes_recursive_disabled(tmpdir):
+    p = tmpdir.mkdir('tree')
+    build_tree(p)
+
+    file_action = FileAction(mode='0700')
+    assert file_action.set_file_attributes_recursive(p.strpath) == 1
+    assert oct(p.stat().mode)[-4:] == '0700'
+    assert oct(p.join('file1.txt').stat().mode)[-4:] == '0644'
+
+
+def test_file_action_set_file_attributes_recursive_owner(tmpdir, monkeypatch):
+    p = tmpdir.mkdir('tree')
+    build_tree(p)
+
+    getpwnam = mock.Mock(side_effect=helpers.getpwnam)
+    monkeypatch.setattr('pwd.getpwnam', getpwnam)
+
+    with mock.patch('os.chown') as chown_mock, mock.patch('os.lchown') as lchown_mock:
+        file_action = FileAction(owner='fots', recurse=True)
+        assert file_action.set_file_attributes(p.strpath) is True
+
+        # The owner is only resolved once and symlinks themselves are updated
+        assert getpwnam.call_count == 1
+        assert sorted(call[0] for call in chown_mock.call_args_list) == [
+            (p.strpath, 501, -1),
+            (p.join('directory').strpath, 501, -1),
+            (p.join('directory/file3.txt').strpath, 501, -1),
+            (p.join('file1.txt').strpath, 501, -1),
+            (p.join('file2.txt').strpath, 501, -1)
+        ]
+        assert lchown_mock.call_args_list == [
+            mock.call(p.join('directory/symlink.txt').strpath, 501, -1)
+        ]
+
+
+def test_file_action_set_file_attributes_recursive_owner_inexistent(tmpdir, monkeypatch):
+    p = tmpdir.mkdir('tree')
+    build_tree(p)
+
+    monkeypatch.setattr('pwd.getpwnam', helpers.getpwnam)
+
+    file_action = FileAction(owner='hmmm', recurse=True)
+    with pytest.raises(ActionError):
+        file_action.set_file_attributes(p.strpath)
+
+
 def test_file_action_remove_inexistent(tmpdir):
     p = tmpdir.join('test')
 
@@ -409,3 +488,34 @@ def test_file_action_remove_directory_not_writable(tmpdir, monkeypatch):
     file_action = FileAction()
     with pytest.raises(ActionError):
         file_action.remove(p.strpath)
+
+
+def test_action_persistent_cache(tmpdir):
+    pcp = tmpdir.join('persistent_cache')
+
+    action = Action(persistent_cache_base_dir=pcp.strpath)
+    assert action.persistent_cache_dir == pcp.join('Action').strpath
+    assert action.persistent_cache_get(('/Users/fots/file.txt', 1024)) is None
+
+    action.persistent_cache_set(('/Users/fots/file.txt', 1024), {'data': 'cached'})
+    assert action.persistent_cache_get(('/Users/fots/file.txt', 1024)) == {'data': 'cached'}
+    assert action.persistent_cache_get(('/Users/fots/file.txt', 2048)) is None
+    assert action.changed() == ActionResponse(changed=True)
+    assert action.persistent_cache_get(('/Users/fots/file.txt', 1024)) == {'data': 'cached'}
+    assert len(pcp.join('Action').listdir()) == 1
+
+
+def test_action_persistent_cache_disabled():
+    action = Action()
+    assert action.persistent_cache_dir is None
+    action.persistent_cache_set(('/Users/fots/file.txt', 1024), {'data': 'cached'})
+    assert action.persistent_cache_get(('/Users/fots/file.txt', 1024)) is None
+
+
+def test_action_persistent_cache_invalid(tmpdir):
+    pcp = tmpdir.join('persistent_cache')
+
+    action = Action(persistent_cache_base_dir=pcp.strpath)
+    action.persistent_cache_set(('/Users/fots/file.txt', 1024), {'data': 'cached'})
+    pcp.join('Action').listdir()[0].write('boo')
+    assert action.persistent_cache_get(('/Users/fots/file.txt', 1024)) is None
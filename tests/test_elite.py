@@ -3,13 +3,13 @@ from unittest import mock
 
 import pytest
 from elite.actions import Action, ActionError
-from elite.elite import Elite, EliteError, EliteResponse, demote
+from elite.elite import Elite, EliteError, EliteResponse, EliteState, demote
 
 from . import helpers
 
 
 class Printer:
-    def action(self, state, action, args, response=None):
+    def action(self, state, action, args, response=None, progress=None):
         pass
 
     def summary(self, actions):
@@ -178,6 +178,62 @@ def test_elite_options_env(monkeypatch, printer):
         })
 
 
+@mock.patch('os.setegid', mock.Mock())
+@mock.patch('os.seteuid', mock.Mock())
+def test_elite_documents_written_once(tmpdir, monkeypatch, printer):
+    helpers.patch_root_runtime(monkeypatch)
+    p = tmpdir.join('test.json')
+    writes = []
+
+    elite = Elite(printer)
+    monkeypatch.setattr('elite.libraries.documents.files.write', lambda *args: writes.append(args))
+
+    assert elite.json(path=p.strpath, values={'name': 'Fots'}).changed
+    assert elite.json(path=p.strpath, values={'name': 'Fots'}) == EliteResponse(
+        changed=False, ok=True, data={'path': p.strpath}
+    )
+    assert elite.json(path=p.strpath, values={'age': 33}).changed
+    assert writes == []
+
+    elite.flush_documents()
+    assert writes == [(p.strpath, b'{\n  "name": "Fots",\n  "age": 33\n}\n')]
+
+
+@mock.patch('os.setegid', mock.Mock())
+@mock.patch('os.seteuid', mock.Mock())
+def test_elite_documents_written_before_other_actions(tmpdir, monkeypatch, printer):
+    helpers.patch_root_runtime(monkeypatch)
+    p = tmpdir.join('test.json')
+
+    class MyAction(Action):
+        def process(self):
+            return self.ok(contents=p.read())
+
+    elite = Elite(printer)
+    elite.register_action('my_action', MyAction)
+    elite.json(path=p.strpath, values={'name': 'Fots'})
+    assert elite.my_action().data == {'contents': '{\n  "name": "Fots"\n}\n'}
+
+
+@mock.patch('os.setegid', mock.Mock())
+@mock.patch('os.seteuid', mock.Mock())
+def test_elite_documents_not_writable(tmpdir, monkeypatch, printer):
+    helpers.patch_root_runtime(monkeypatch)
+    p = tmpdir.join('test.json')
+
+    elite = Elite(printer)
+    assert elite.json(path=p.strpath, values={'name': 'Fots'}).changed
+
+    monkeypatch.setattr('os.replace', mock.Mock(side_effect=PermissionError(13, 'Denied')))
+    with pytest.raises(EliteError):
+        elite.flush_documents()
+
+    assert not p.exists()
+    assert [
+        (action, args) for action, args, _response in elite.completed_actions[EliteState.FAILED]
+    ] == [('write', {'path': p.strpath})]
+
+
 @mock.patch('os.setegid')
 @mock.patch('os.seteuid')
 @mock.patch('os.setgid')
@@ -61,6 +61,30 @@ def test_action_ok(capsys, printer):
     )
 
 
+def test_action_progress(capsys, printer):
+    args = {'path': '/tmp/destination', 'source': '/tmp/source'}
+    printer.action(EliteState.RUNNING, 'rsync', args=args)
+    printer.action(EliteState.RUNNING, 'rsync', args=args, progress='100 files processed')
+    printer.action(
+        EliteState.CHANGED, 'rsync', args=args, response=EliteResponse(changed=True, ok=True)
+    )
+    out, _err = capsys.readouterr()
+    assert out == (
+        ansi.WHITE + ' running  ' + ansi.ENDC +
+        ansi.BLUE + 'rsync: ' + ansi.ENDC +
+        ansi.YELLOW + "path='/tmp/destination' source='/tmp/source'" + ansi.ENDC +
+        '\r' + ansi.CLEAR_SCREEN_DOWN +
+        ansi.WHITE + ' running  ' + ansi.ENDC +
+        ansi.BLUE + 'rsync: ' + ansi.ENDC +
+        ansi.YELLOW + "path='/tmp/destination' source='/tmp/source'" + ansi.ENDC +
+        ansi.WHITE + ' (100 files processed)' + ansi.ENDC +
+        '\r' + ansi.move_up(1) + ansi.CLEAR_SCREEN_DOWN +
+        ansi.YELLOW + ' changed  ' + ansi.ENDC +
+        ansi.BLUE + 'rsync: ' + ansi.ENDC +
+        ansi.YELLOW + "path='/tmp/destination' source='/tmp/source'" + ansi.ENDC + '\n'
+    )
+
+
 def test_action_changed(capsys, printer):
     printer.action(EliteState.RUNNING, 'brew', args={'name': 'htop', 'state': 'latest'})
     printer.action(
@@ -1,5 +1,7 @@
 import pytest
-from elite.utils import ReversibleDict, batch, deep_equal, deep_merge, generate_uuid
+from elite.utils import (
+    Change, ReversibleDict, apply_changes, batch, deep_diff, deep_equal, deep_merge, generate_uuid
+)
 
 
 def test_reversible_dict_lookup():
@@ -129,6 +131,84 @@ def test_deep_merge():
     }
 
 
+def test_deep_diff_same():
+    source = {
+        'name': 'fots',
+        'deeper': {
+            'and_deeper': {'key': 'value'}
+        }
+    }
+    destination = {
+        'name': 'fots',
+        'age': 20,
+        'deeper': {
+            'and_deeper': {'key': 'value', 'bleh': 'blah'}
+        }
+    }
+
+    assert deep_diff(source, destination) == []
+
+
+def test_deep_diff_and_apply_changes():
+    source = {
+        'name': 'fots',
+        'things': {'a': 'b'},
+        'deeper': {
+            'and_deeper': {'key': 'value'}
+        },
+        'replaced': {'new': True},
+        'interests': ['coding']
+    }
+    destination = {
+        'name': 'pablo',
+        'age': 20,
+        'things': {'b': 'c'},
+        'deeper': {
+            'and_deeper': {'key': 'old', 'bleh': 'blah'}
+        },
+        'replaced': 'old',
+        'interests': ['chickens']
+    }
+
+    changes = deep_diff(source, destination)
+    assert changes == [
+        Change(('name',), 'pablo', 'fots'),
+        Change(('replaced',), 'old', {'new': True}),
+        Change(('interests',), ['chickens'], ['coding']),
+        Change(('things', 'a'), None, 'b'),
+        Change(('deeper', 'and_deeper', 'key'), 'old', 'value')
+    ]
+
+    apply_changes(destination, changes)
+    assert destination == {
+        'name': 'fots',
+        'age': 20,
+        'things': {'a': 'b', 'b': 'c'},
+        'deeper': {
+            'and_deeper': {'key': 'value', 'bleh': 'blah'}
+        },
+        'replaced': {'new': True},
+        'interests': ['coding']
+    }
+
+    # The values applied are copies of those in the source
+    destination['replaced']['new'] = False
+    assert source['replaced'] == {'new': True}
+
+
+def test_deep_diff_list_merge():
+    source = {'interests': ['coding', 'music']}
+    destination = {'interests': ['chickens', 'music']}
+
+    assert deep_diff(source, destination, list_merge='append') == [
+        Change(('interests',), ['chickens', 'music'], ['chickens', 'music', 'coding'])
+    ]
+    assert deep_diff(source, destination, list_merge='prepend') == [
+        Change(('interests',), ['chickens', 'music'], ['coding', 'chickens', 'music'])
+    ]
+    assert deep_diff({'interests': ['music']}, destination, list_merge='append') == []
+
+
 def test_batch_exact_split():
     assert list(batch(items=[1, 2, 3, 4], batch_size=2)) == [[1, 2], [3, 4]]
 